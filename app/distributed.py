@@ -0,0 +1,503 @@
+"""
+Scene-sharded dubbing of long videos across worker processes and hosts.
+
+The coordinator cuts the extracted audio into shards at scene cuts that fall in
+a quiet stretch (otherwise at the quietest point near the even split), and
+queues the shards in a SQLite task queue (utils/shard_queue.py). Workers on this
+or other hosts claim shards and run them in two phases:
+
+1. diarize: denoise and diarize the shard, estimate each local speaker's F0.
+2. dub: once the coordinator has linked local speakers across shards by their
+   embeddings and inferred gender and pitch range once per global speaker,
+   dub every segment of the shard with the same voice per person.
+
+The coordinator places the dubbed segments of all shards on the original
+timeline, so a long video takes roughly 1/N of the single-process time on N
+workers. Paths in the queue are absolute: the work directory and the queue
+database must be on a filesystem shared by every host (e.g. NFS).
+
+Run:
+    # On every worker host; models are loaded once per worker
+    python -m app.distributed worker --queue /mnt/shared/shards.sqlite
+
+    # Coordinator
+    python -m app.distributed run input.mp4 hindi --queue /mnt/shared/shards.sqlite \\
+        --work-dir /mnt/shared/jobs/film --shards 8
+
+    # Single host, with local worker processes
+    python -m app.distributed run input.mp4 hindi --work-dir output/film --local-workers 4
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import multiprocessing
+from collections import defaultdict
+import numpy as np
+import soundfile as sf
+from modules.preprocessing.audio_extractor import extract_audio
+from modules.preprocessing.video_segmenter import extract_scenes, load_scene_timestamps
+from modules.audio_analysis.speaker_linking import link_speakers
+from modules.audio_analysis.speaker_attributes import classify_speaker
+from modules.generation.progressive_output import ProgressiveOutput
+from utils.artifact_store import load_artifact
+from utils.shard_queue import ShardQueue, default_worker_id
+from utils.tracing import trace_job, span
+from utils.languages import get_language_code
+
+SHARD_SECONDS = float(os.getenv("SUBHASHIT_SHARD_SECONDS", "300"))  # shard length when no count is given
+MIN_SHARD_SECONDS = 60.0
+CUT_SEARCH_SECONDS = 15.0  # how far a cut may move from the even split
+ENERGY_HOP_SECONDS = 0.05
+QUIET_RATIO = 2.0  # a scene cut is usable within 6 dB of the quietest point around it
+POLL_SECONDS = 1.0
+
+
+# ---------------------------
+# Shard planning
+# ---------------------------
+def _frame_energy(audio_path, hop_seconds=ENERGY_HOP_SECONDS):
+    """
+    RMS energy per hop of a recording, read block by block.
+
+    Returns:
+        tuple: (energy array, duration in seconds)
+    """
+    info = sf.info(audio_path)
+    hop = max(int(info.samplerate * hop_seconds), 1)
+    energy = []
+    for block in sf.blocks(audio_path, blocksize=hop * 1200, dtype="float32", always_2d=True):
+        mono = block.mean(axis=1)
+        frames = len(mono) // hop
+        if frames:
+            energy.append(np.sqrt(np.mean(mono[:frames * hop].reshape(frames, hop) ** 2, axis=1)))
+    energy = np.concatenate(energy) if energy else np.zeros(0, dtype=np.float32)
+    return energy, info.duration
+
+
+def plan_shards(audio_path, num_shards=None, scene_cuts=(), search_seconds=CUT_SEARCH_SECONDS,
+                min_shard_seconds=MIN_SHARD_SECONDS):
+    """
+    Splits a recording into about num_shards pieces of similar length.
+
+    Each cut starts at an even split point and moves to the nearest scene cut
+    within search_seconds that falls in a quiet stretch, otherwise to the
+    quietest point in that range, so shards do not start in the middle of a line.
+    A scene cut counts as quiet within QUIET_RATIO of the lowest energy in range.
+
+    Args:
+        audio_path (str): Extracted audio of the video.
+        num_shards (int): Target count; defaults to one shard per SHARD_SECONDS.
+        scene_cuts (Iterable[float]): Scene boundaries in seconds.
+
+    Returns:
+        List[tuple]: (start, end) in seconds, covering the whole recording.
+    """
+    energy, duration = _frame_energy(audio_path)
+    if num_shards is None:
+        num_shards = int(np.ceil(duration / SHARD_SECONDS))
+    num_shards = max(1, min(int(num_shards), int(duration // min_shard_seconds)))
+    if num_shards == 1 or len(energy) == 0:
+        return [(0.0, duration)]
+
+    # Half-second moving average, so a cut lands in a pause rather than between two syllables
+    width = max(int(0.5 / ENERGY_HOP_SECONDS), 1)
+    smooth = np.convolve(energy, np.ones(width) / width, mode="same")
+    scene_cuts = np.asarray(sorted(scene_cuts), dtype=np.float64)
+
+    def frame(t):
+        return int(np.clip(round(t / ENERGY_HOP_SECONDS), 0, len(smooth) - 1))
+
+    cuts = [0.0]
+    for i in range(1, num_shards):
+        target = duration * i / num_shards
+        low = max(target - search_seconds, cuts[-1] + min_shard_seconds)
+        high = min(target + search_seconds, duration - min_shard_seconds)
+        if low >= high:
+            continue
+
+        first, last = frame(low), frame(high)
+        quietest = first + int(np.argmin(smooth[first:last + 1]))
+        nearby = scene_cuts[(scene_cuts >= low) & (scene_cuts <= high)]
+        quiet_cuts = [t for t in nearby if smooth[frame(t)] <= smooth[quietest] * QUIET_RATIO + 1e-6]
+        if quiet_cuts:
+            cut = min(quiet_cuts, key=lambda t: abs(t - target))
+        else:
+            cut = quietest * ENERGY_HOP_SECONDS
+        cuts.append(round(float(cut), 3))
+
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _write_shard_audio(audio_path, start, end, output_path):
+    sr = sf.info(audio_path).samplerate
+    audio, _ = sf.read(audio_path, start=int(round(start * sr)), stop=int(round(end * sr)), dtype="float32")
+    sf.write(output_path, audio, sr)
+    return output_path
+
+
+# ---------------------------
+# Speaker reconciliation
+# ---------------------------
+def reconcile_speakers(shard_results):
+    """
+    Maps the local speakers of every shard to global speakers.
+
+    Local speakers are linked across shards by their embeddings, with the same
+    clustering that links diarization windows. Gender and pitch range are then
+    inferred once per global speaker, from the duration-weighted mean embedding
+    and F0 of its local speakers.
+
+    Args:
+        shard_results (List[dict]): Results of the diarize tasks, in shard order.
+
+    Returns:
+        List[dict]: Per shard, local speaker id -> {'speaker': global speaker id,
+        'attributes': classify_speaker result or None}.
+    """
+    local_speakers, stats, models = [], [], set()
+    for shard, result in enumerate(shard_results):
+        arrays, manifest = load_artifact(result["speaker_data"], names=["embeddings"], mmap=False)
+        for speaker_id, embedding, duration, model in zip(manifest["speakers"], arrays["embeddings"],
+                                                          manifest["durations"], manifest["embedding_models"]):
+            local_speakers.append((shard, speaker_id, embedding))
+            stats.append((duration, result["mean_f0"].get(speaker_id, 0.0)))
+            models.add(model)
+    if len(models) > 1:
+        raise ValueError(f"Shards were embedded with different models {sorted(models)}; "
+                         f"run every worker with the same SUBHASHIT_EMBEDDING_BACKEND.")
+
+    threshold = shard_results[0]["link_threshold"] if shard_results else 0.0
+    cluster_ids = link_speakers(local_speakers, threshold)
+
+    members = defaultdict(list)
+    for (_, _, embedding), (duration, f0), cluster in zip(local_speakers, stats, cluster_ids):
+        members[cluster].append((embedding, max(duration, 1e-3), f0))
+
+    model = next(iter(models), None)
+    attributes = {}
+    for cluster, entries in members.items():
+        embedding = np.average(np.stack([e for e, _, _ in entries]), axis=0, weights=[d for _, d, _ in entries])
+        voiced = [(f0, d) for _, d, f0 in entries if f0 > 0]
+        f0 = float(np.average([f for f, _ in voiced], weights=[d for _, d in voiced])) if voiced else 0.0
+        attributes[cluster] = classify_speaker(embedding, f0, embedding_model=model)
+
+    mapping = [{} for _ in shard_results]
+    for (shard, speaker_id, _), cluster in zip(local_speakers, cluster_ids):
+        mapping[shard][speaker_id] = {"speaker": f"speaker_SPEAKER_{cluster:02d}", "attributes": attributes[cluster]}
+
+    print(f"[INFO] Linked {len(local_speakers)} local speakers across {len(shard_results)} shards "
+          f"into {len(members)} speakers")
+    return mapping
+
+
+# ---------------------------
+# Worker side
+# ---------------------------
+def diarize_shard(payload):
+    """
+    Phase 1 of a shard: denoising, diarization and the mean F0 of every local speaker,
+    from the prosody contours of its diarized turns.
+    """
+    from pydub import AudioSegment
+    from app.routes.voice_analysis import segment_contours
+    from modules.preprocessing.noise_reducer import clean_audio
+    from modules.audio_analysis.diarization import diarize_and_extract_speakers, SPEAKER_LINK_THRESHOLD
+    from modules.audio_analysis.speaker_attributes import speaker_mean_f0
+
+    shard_dir = payload["shard_dir"]
+    cleaned_audio_path = clean_audio(payload["audio"], output_path=os.path.join(shard_dir, "cleaned_audio.wav"))
+    if cleaned_audio_path is None:
+        raise RuntimeError(f"Could not denoise {payload['audio']}")
+
+    speaker_dir = os.path.join(shard_dir, "speakers")
+    with span("diarization"):
+        speaker_data = diarize_and_extract_speakers(cleaned_audio_path, output_dir=speaker_dir)
+
+    with span("speaker_f0"):
+        turns = [
+            (int(segment["start"] * 1000), int(segment["end"] * 1000), f"{speaker_id}_{index}", speaker_id)
+            for speaker_id, data in speaker_data.items() if speaker_id != "pause_segments"
+            for index, segment in enumerate(data["segments"])
+        ]
+        contours = segment_contours(AudioSegment.from_wav(cleaned_audio_path), turns)
+        mean_f0 = {
+            speaker_id: speaker_mean_f0([contours[key] for _, _, key, turn_speaker in turns
+                                         if turn_speaker == speaker_id and key in contours])
+            for speaker_id in speaker_data if speaker_id != "pause_segments"
+        }
+
+    return {
+        "cleaned_audio": cleaned_audio_path,
+        "speaker_data": os.path.join(speaker_dir, "speaker_data"),
+        "mean_f0": mean_f0,
+        "link_threshold": float(SPEAKER_LINK_THRESHOLD),
+    }
+
+
+def dub_shard(payload):
+    """
+    Phase 2 of a shard: dubs every segment under its global speaker and writes the
+    shard's slots (times on the original timeline) to slots.json.
+    """
+    from pydub import AudioSegment
+    from app.routes.pipeline import build_timeline, iter_dubbed_segments
+    from modules.audio_analysis.diarization import load_speaker_data
+    from modules.audio_analysis.segment_normalizer import normalize_segments
+
+    shard_dir = payload["shard_dir"]
+    local_data = load_speaker_data(payload["speaker_data"])
+
+    # Global speaker ids, with the attributes inferred across all shards
+    speaker_data = {"pause_segments": local_data.pop("pause_segments")}
+    for speaker_id, data in local_data.items():
+        mapped = payload["speakers"][speaker_id]
+        if mapped["attributes"]:
+            data["attributes"] = mapped["attributes"]
+        speaker_data[mapped["speaker"]] = data
+
+    with span("segment_normalization"):
+        speaker_data = normalize_segments(speaker_data)
+    timeline = build_timeline(speaker_data)
+
+    segment_dir = os.path.join(shard_dir, "segments")
+    os.makedirs(segment_dir, exist_ok=True)
+    base_audio = AudioSegment.from_wav(payload["cleaned_audio"])
+    dubbed = {
+        key: (output_path, chunks)
+        for key, output_path, chunks in iter_dubbed_segments(
+            timeline, base_audio, payload["target_language"], segment_dir, speaker_data)
+    }
+
+    offset_ms = payload["offset_ms"]
+    slots = []
+    for start_ms, end_ms, key, speaker_id in timeline:
+        output_path, chunks = dubbed.get(key, (None, []))
+        slots.append({
+            "key": f"shard{payload['shard']:03d}_{key}",
+            "start_ms": start_ms + offset_ms,
+            "end_ms": end_ms + offset_ms,
+            "speaker": speaker_id,
+            "audio": output_path,
+            "subtitles": [dict(cue, start_ms=cue["start_ms"] + offset_ms, end_ms=cue["end_ms"] + offset_ms)
+                          for cue in chunks],
+        })
+
+    slots_path = os.path.join(shard_dir, "slots.json")
+    with open(slots_path, "w", encoding="utf-8") as f:
+        json.dump(slots, f, ensure_ascii=False)
+    return {"slots": slots_path, "segments": len(dubbed)}
+
+
+SHARD_TASKS = {"diarize": diarize_shard, "dub": dub_shard}
+
+
+def run_task(queue, task, worker_id):
+    """
+    Runs one claimed task, renewing its lease in the background.
+    """
+    stop = threading.Event()
+
+    def keep_lease():
+        while not stop.wait(queue.lease_seconds / 3):
+            if not queue.heartbeat(task["id"], worker_id):
+                print(f"⚠️  Lost the lease on task {task['id']} to another worker")
+                return
+
+    heartbeat = threading.Thread(target=keep_lease, name=f"lease-{task['id']}", daemon=True)
+    heartbeat.start()
+    try:
+        with trace_job(f"{task['job_id']}.shard{task['shard']:03d}.{task['kind']}"):
+            result = SHARD_TASKS[task["kind"]](task["payload"])
+        queue.complete(task["id"], result, worker_id)
+    except Exception as e:
+        print(f"❌ {task['kind']} shard {task['shard']} of job {task['job_id']} failed: {e}")
+        queue.fail(task["id"], e, worker_id)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def run_worker(queue_path, worker_id=None, poll_interval=POLL_SECONDS, stop_event=None, max_tasks=None):
+    """
+    Claims and runs shard tasks until stop_event is set or max_tasks have run.
+
+    Returns:
+        int: Number of tasks run.
+    """
+    # Importing the pipeline loads every model; once per worker, not per shard
+    from app.routes import pipeline
+    pipeline.warm_up_models()
+
+    queue = ShardQueue(queue_path)
+    worker_id = worker_id or default_worker_id()
+    print(f"[INFO] Shard worker {worker_id} polling {queue.db_path}")
+
+    done = 0
+    while (stop_event is None or not stop_event.is_set()) and (max_tasks is None or done < max_tasks):
+        task = queue.claim(worker_id, kinds=SHARD_TASKS)
+        if task is None:
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        print(f"[INFO] {worker_id}: {task['kind']} shard {task['shard']} of job {task['job_id']} "
+              f"(attempt {task['attempts']})")
+        run_task(queue, task, worker_id)
+        done += 1
+    return done
+
+
+# ---------------------------
+# Coordinator
+# ---------------------------
+def _start_local_workers(queue_path, count):
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    workers = [context.Process(target=run_worker, args=(queue_path,), kwargs={"stop_event": stop_event})
+               for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers, stop_event
+
+
+def complete_pipeline_sharded(file_path, target_language, queue_path=None, job_id=None, work_dir=".",
+                              num_shards=None, local_workers=0, profile=False, progress_callback=None,
+                              timeout=None):
+    """
+    Dubs a video in scene shards processed in parallel by shard workers.
+
+    Args:
+        file_path (str): Input video.
+        target_language (str): Language name, e.g. 'hindi'.
+        queue_path (str): Queue database shared with the workers; defaults to
+            <work_dir>/shards.sqlite.
+        job_id (str): Name for the trace files; defaults to a timestamp.
+        work_dir (str): Directory for shards and final files, shared with the workers.
+        num_shards (int): Target shard count; defaults to one per SHARD_SECONDS of audio.
+        local_workers (int): Worker processes to start on this host for the job
+            (0: rely on workers already polling the queue).
+        progress_callback (callable): Called as progress_callback(stage, fraction).
+        timeout (float): Seconds to wait for each phase; None waits indefinitely.
+
+    Returns:
+        tuple: (final_audio_path, final_srt_path), as complete_pipeline.
+    """
+    work_dir = os.path.abspath(work_dir)
+    queue = ShardQueue(queue_path or os.path.join(work_dir, "shards.sqlite"))
+    report = progress_callback or (lambda stage, fraction: None)
+
+    workers, stop_event = _start_local_workers(queue.db_path, local_workers)
+    try:
+        with trace_job(job_id, profile=profile):
+            # Each run gets its own tasks, even when a job id is reused
+            run_id = f"{job_id or 'job'}-{uuid.uuid4().hex[:8]}"
+            return _run_sharded(file_path, target_language, queue, run_id, work_dir, num_shards, report, timeout)
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+
+
+def _run_sharded(file_path, target_language, queue, run_id, work_dir, num_shards, report, timeout):
+    target_language = get_language_code(target_language)
+    output_dir = os.path.join(work_dir, 'output')
+
+    report("extraction", 0.0)
+    with span("extraction"):
+        audio_path = extract_audio(file_path, audio_path=os.path.join(output_dir, 'audio.wav'))
+    if audio_path is None:
+        raise RuntimeError(f"Could not extract audio from {file_path}")
+
+    report("scene_detection", 0.0)
+    with span("scene_detection"):
+        scenes = load_scene_timestamps(extract_scenes(file_path, output_path=os.path.join(output_dir, 'scene_timestamps')))
+    scene_cuts = [scene["start_time"] for scene in scenes[1:]]
+
+    with span("sharding.plan"):
+        shards = plan_shards(audio_path, num_shards, scene_cuts)
+    print(f"[INFO] Job {run_id}: {len(shards)} shard(s) at "
+          + ", ".join(f"{start:.1f}-{end:.1f}s" for start, end in shards))
+
+    with span("sharding.split"):
+        for index, (start, end) in enumerate(shards):
+            shard_dir = os.path.join(work_dir, 'shards', f'shard_{index:03d}')
+            os.makedirs(shard_dir, exist_ok=True)
+            shard_audio = _write_shard_audio(audio_path, start, end, os.path.join(shard_dir, 'audio.wav'))
+            queue.enqueue(run_id, "diarize", index, {"audio": shard_audio, "shard_dir": shard_dir})
+
+    report("diarization", 0.0)
+    with span("sharding.diarize", shards=len(shards)):
+        diarized = queue.wait(run_id, "diarize", timeout=timeout,
+                              on_progress=lambda done, total: report("diarization", done / max(total, 1)))
+
+    with span("sharding.link_speakers"):
+        speakers = reconcile_speakers([task["result"] for task in diarized])
+
+    for task, (start, _) in zip(diarized, shards):
+        result = task["result"]
+        queue.enqueue(run_id, "dub", task["shard"], {
+            "shard": task["shard"],
+            "shard_dir": task["payload"]["shard_dir"],
+            "cleaned_audio": result["cleaned_audio"],
+            "speaker_data": result["speaker_data"],
+            "speakers": speakers[task["shard"]],
+            "offset_ms": int(round(start * 1000)),
+            "target_language": target_language,
+        })
+
+    report("segments", 0.0)
+    with span("sharding.dub", shards=len(shards)):
+        dubbed = queue.wait(run_id, "dub", timeout=timeout,
+                            on_progress=lambda done, total: report("segments", done / max(total, 1)))
+
+    report("mixing", 0.0)
+    final_dir = os.path.join(work_dir, 'final_output')
+    final_audio_path = os.path.join(final_dir, 'final_audio_file.wav')
+    final_srt_path = os.path.join(final_dir, 'final_audio_file.srt')
+    with span("mixing", audio_seconds=shards[-1][1]):
+        slots = []
+        for task in dubbed:
+            with open(task["result"]["slots"], "r", encoding="utf-8") as f:
+                slots.extend(json.load(f))
+
+        output = ProgressiveOutput([(slot["start_ms"], slot["end_ms"], slot["key"]) for slot in slots],
+                                   os.path.join(final_dir, 'stream'), final_audio_path, final_srt_path)
+        for slot in slots:
+            output.add(slot["key"], slot["audio"], slot["subtitles"])
+        output.close()
+
+    report("done", 1.0)
+    return final_audio_path, final_srt_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scene-sharded dubbing across worker processes and hosts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = commands.add_parser("worker", help="Claim and run shard tasks")
+    worker_parser.add_argument("--queue", required=True, help="Queue database shared with the coordinator")
+    worker_parser.add_argument("--max-tasks", type=int, help="Exit after this many tasks")
+
+    run_parser = commands.add_parser("run", help="Coordinate the dubbing of one video")
+    run_parser.add_argument("input", help="Input video")
+    run_parser.add_argument("target_language", help="Language name, e.g. hindi")
+    run_parser.add_argument("--queue", help="Queue database (default: <work-dir>/shards.sqlite)")
+    run_parser.add_argument("--work-dir", default=".", help="Shared directory for shards and outputs")
+    run_parser.add_argument("--shards", type=int, help="Target number of shards")
+    run_parser.add_argument("--local-workers", type=int, default=0, help="Worker processes to start on this host")
+    run_parser.add_argument("--job-id", help="Name for the trace files")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.queue, max_tasks=args.max_tasks)
+    else:
+        final_audio, final_srt = complete_pipeline_sharded(
+            args.input, args.target_language, queue_path=args.queue, job_id=args.job_id, work_dir=args.work_dir,
+            num_shards=args.shards, local_workers=args.local_workers
+        )
+        print(f"✅ Done: {final_audio}, {final_srt}")
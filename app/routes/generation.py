@@ -2,14 +2,19 @@ import os
 from modules.generation.aligner import align_sentences
 from modules.generation.prosody_mapper import map_target_to_prosodic_features
 from modules.generation.speech_synthesizer import generate_tts_audio
+from utils.tracing import span
 
-def generate_output(src_text, tgt_text, prosodic_features_json, sentiment, emotion, original_duration, target_language, output_path):
+def generate_output(src_text, tgt_text, prosodic_features_json, sentiment, emotion, original_duration, target_language, output_path,
+                    gender="Male", pitch_range="natural", contours=None):
 
     src_json = [entry["word"] for entry in prosodic_features_json if "word" in entry and entry["word"].strip()]
 
-    alignment_json = align_sentences(src_json, tgt_text)
+    with span("generation.align"):
+        alignment_json = align_sentences(src_json, tgt_text)
     print(alignment_json)
-    target_json = map_target_to_prosodic_features(alignment_json, prosodic_features_json, tgt_text)
+    with span("generation.prosody_map"):
+        target_json = map_target_to_prosodic_features(alignment_json, prosodic_features_json, tgt_text,
+                                                      contours=contours)
 
     # target_json = [
     #     {
@@ -22,11 +27,13 @@ def generate_output(src_text, tgt_text, prosodic_features_json, sentiment, emoti
     # ]
 
     # final_audio_path = generate_emotional_speech(target_json, emotion, target_language, output_path)
-    gender = "Male"
+    # gender and pitch_range come from speaker_attributes (inferred once per diarized speaker)
 
-    final_audio_path = generate_tts_audio(
-        tgt_text, original_duration, sentiment, emotion, target_language, gender, output_path
-    )
+    with span("generation.tts", audio_seconds=original_duration):
+        final_audio_path = generate_tts_audio(
+            tgt_text, original_duration, sentiment, emotion, target_language, gender, output_path,
+            pitch_range=pitch_range
+        )
 
     return final_audio_path
 
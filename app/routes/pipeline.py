@@ -1,138 +1,291 @@
 import os
+import time
 from pydub import AudioSegment
-from pydub.utils import mediainfo
-from .text_analysis import text_file_analysis
-from .voice_analysis import voice_file_analysis
+from .text_analysis import analyzer, text_file_analysis, text_source_analysis, translate_texts
+from .voice_analysis import voice_file_analysis, iter_segment_emotions, segment_contours
 from .generation import generate_output
 from modules.preprocessing.video_segmenter import extract_scenes
 from modules.preprocessing.noise_reducer import clean_audio
 from modules.preprocessing.audio_splitter import split_audio_by_scenes
 from modules.preprocessing.audio_extractor import extract_audio
 from modules.audio_analysis.diarization import diarize_and_extract_speakers
-from difflib import get_close_matches
-from modules.generation.subtitle_generation import generate_srt_entries_from_text
-# Language name to short code mapping
-LANGUAGE_MAP = {
-    'hindi': 'hi', 'bengali': 'bn', 'telugu': 'te', 'marathi': 'mr', 'tamil': 'ta',
-    'urdu': 'ur', 'gujarati': 'gu', 'kannada': 'kn', 'malayalam': 'ml',
-    'punjabi': 'pa', 'odia': 'or', 'oriya': 'or', 'assamese': 'as',
-}
-
-
-def write_srt(subtitles, output_path='final_output/final_audio_file.srt'):
-    def format_time(ms):
-        seconds, milliseconds = divmod(ms, 1000)
-        minutes, seconds = divmod(seconds, 60)
-        hours, minutes = divmod(minutes, 60)
-        return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for idx, (start_ms, end_ms, text) in enumerate(subtitles, start=1):
-            f.write(f"{idx}\n")
-            f.write(f"{format_time(start_ms)} --> {format_time(end_ms)}\n")
-            f.write(f"{text}\n\n")
-
-
-def get_language_code(input_language):
-    input_language = input_language.strip().lower()
-    if input_language in LANGUAGE_MAP:
-        return LANGUAGE_MAP[input_language]
-
-    match = get_close_matches(input_language, LANGUAGE_MAP.keys(), n=1, cutoff=0.6)
-    if match:
-        return LANGUAGE_MAP[match[0]]
-
-    raise ValueError(f"Language '{input_language}' is not supported or misspelled.")
-
-
-def get_audio_duration(filepath):
-    info = mediainfo(filepath)
-    duration_str = info.get('duration', '0')
-
-    try:
-        return float(duration_str)
-    except ValueError:
-        print(f"⚠️  Warning: Could not get duration for {filepath}. Falling back to 0.")
-        return 0.0
-
+from modules.audio_analysis.segment_normalizer import normalize_segments
+from modules.audio_analysis.speaker_attributes import infer_speaker_attributes, speaker_attributes
+from modules.generation.segment_timeline import (get_audio_duration, build_timeline, segment_sub_turns,
+                                                 speech_duration, fit_dubbed_segment)
+from modules.generation.progressive_output import ProgressiveOutput
+from modules.generation.speech_synthesizer import warm_up_tts
+from modules.text_analysis.asr_transcriber import warm_up_asr
+from models.compiled_generation import COMPILED_GENERATION
+from utils.tracing import trace_job, span
+from utils.languages import get_language_code
+
+
+def warm_up_models():
+    """
+    Compiles Whisper, NLLB and the TTS generator for their common input shapes,
+    so worker start pays for compilation instead of a job's first segment.
+    Does nothing unless compiled generation is enabled.
+    """
+    if not COMPILED_GENERATION:
+        return
+    with span("warm_up"):
+        warm_up_asr()
+        analyzer.warm_up()
+        warm_up_tts()
+
+
+def iter_dubbed_segments(timeline, base_audio, target_language, segment_dir, speaker_data=None,
+                         prosody_contours=None):
+    """
+    Dubs the speaker segments in timeline order and yields each one as soon as it is done.
+    The TTS voice follows each speaker's inferred gender and pitch range, and
+    merged segments are laid over their original turns. Speech emotion is
+    classified for blocks of upcoming segments in one batched pass; prosody
+    contours already computed per segment key (segment_contours) are reused.
+
+    Yields:
+        tuple: (key, output_path, subtitle_entries)
+    """
+    sub_turns = segment_sub_turns(speaker_data)
+    prosody_contours = prosody_contours or {}
+    speech_slots = [slot for slot in timeline if slot[3] is not None]
+    for (start_ms, end_ms, key, speaker_id), audio_emotions in iter_segment_emotions(base_audio, speech_slots):
+        original_duration = (end_ms - start_ms) / 1000.0
+
+        with span("segment", audio_seconds=original_duration, speaker=speaker_id, start_ms=start_ms):
+            segment_audio = base_audio[start_ms:end_ms]
+            segment_path = os.path.join(segment_dir, f'{key}.wav')
+            segment_audio.export(segment_path, format='wav')
 
-def adjust_audio_speed(audio, original_duration, processed_duration):
-    if processed_duration > original_duration and original_duration > 0:
-        speed_factor = processed_duration / original_duration
-        audio = audio.speedup(playback_speed=speed_factor)
-    return audio
+            # Analyze and generate new audio
+            with span("segment.voice_analysis", audio_seconds=original_duration):
+                emotions, prosodic_features, contours = voice_file_analysis(segment_path, audio_emotions,
+                                                                            prosody_contours.get(key))
+            with span("segment.text_analysis", audio_seconds=original_duration):
+                sentiment, emotions, translated_text, source_text = text_file_analysis(segment_path, target_language)
+            attributes = speaker_attributes(speaker_data, speaker_id)
+
+            output_path = os.path.join(segment_dir, f'processed_{key}.wav')
+            chunks = synthesize_segment(source_text, translated_text, prosodic_features, sentiment, emotions,
+                                        start_ms, end_ms, target_language, output_path, attributes,
+                                        sub_turns.get(key), contours)
+
+        yield key, output_path, chunks
+
+
+def synthesize_segment(source_text, translated_text, prosodic_features, sentiment, emotion, start_ms, end_ms,
+                       target_language, output_path, attributes=None, sub_turns=None, contours=None):
+    """
+    Language-dependent tail of a segment: TTS, then fit_dubbed_segment (speed
+    adjustment, placement over sub_turns of a merged segment, subtitle entries).
+    attributes (from speaker_attributes) select the voice gender and pitch range;
+    contours (from voice_file_analysis) give the prosody mapping per-word shifts.
+
+    Returns:
+        list: Subtitle entries for the segment.
+    """
+    original_duration = (end_ms - start_ms) / 1000.0
+    with span("segment.generation", audio_seconds=original_duration, language=target_language):
+        voice = attributes or {}
+        generate_output(source_text, translated_text, prosodic_features, sentiment, emotion,
+                        speech_duration(start_ms, end_ms, sub_turns), target_language, output_path,
+                        gender=voice.get("gender", "Male"), pitch_range=voice.get("pitch_range", "natural"),
+                        contours=contours)
+
+    with span("segment.speed_adjust", audio_seconds=original_duration):
+        return fit_dubbed_segment(output_path, translated_text, start_ms, end_ms, sub_turns)
+
+
+def complete_pipeline(file_path, target_language, job_id=None, profile=False, work_dir=".", progress_callback=None,
+                      incremental=False):
+    """
+    Dubs a video into the target language.
+
+    Every stage and every per-segment call is recorded as a span; the Chrome trace
+    and metrics summary are written to utils.tracing.TRACE_DIR as <job_id>.*.
+
+    The final WAV and SRT are written on the original timeline as each prefix of
+    it completes. With incremental=True the same prefix is also published as HLS
+    audio chunks (final_output/stream/playlist.m3u8) and a growing WebVTT file,
+    so playback can start after the first segments instead of at the end.
+
+    Args:
+        file_path (str): Input video.
+        target_language (str): Language name, e.g. 'hindi'.
+        job_id (str): Name for the trace files; defaults to a timestamp.
+        profile (bool): Run the sampling profiler for this job.
+        work_dir (str): Directory for intermediate and final files, so concurrent
+            jobs do not overwrite each other.
+        progress_callback (callable): Called as progress_callback(stage, fraction)
+            when a stage starts and after every segment.
+        incremental (bool): Publish the rolling HLS/VTT output.
+
+    Returns:
+        tuple: (final_audio_path, final_srt_path)
+    """
+    with trace_job(job_id, profile=profile):
+        return _run_pipeline(file_path, target_language, work_dir, progress_callback or (lambda stage, fraction: None),
+                             incremental)
+
+
+def _prepare_timeline(file_path, work_dir, report):
+    """
+    Language-independent front half: extraction, denoising, diarization, segment
+    normalization, the timeline, per-segment prosody contours and speaker attributes
+    (mean F0 from those contours).
+
+    Returns:
+        tuple: (audio_seconds, base_audio, timeline, speaker_data, contours by segment key)
+    """
+    report("extraction", 0.0)
+    with span("extraction"):
+        audio_path = extract_audio(file_path, audio_path=os.path.join(work_dir, 'output', 'audio.wav'))
+    audio_seconds = get_audio_duration(audio_path)
+    report("denoise", 0.0)
+    with span("denoise", audio_seconds=audio_seconds):
+        cleaned_audio_path = clean_audio(audio_path, output_path=os.path.join(work_dir, 'output', 'cleaned_audio.wav'))
+    report("diarization", 0.0)
+    with span("diarization", audio_seconds=audio_seconds):
+        speaker_dir = os.path.join(work_dir, 'output', 'speakers')
+        speaker_data_json = diarize_and_extract_speakers(cleaned_audio_path, output_dir=speaker_dir)
+    with span("segment_normalization"):
+        speaker_data_json = normalize_segments(speaker_data_json)
 
+    base_audio = AudioSegment.from_wav(cleaned_audio_path)
+    timeline = build_timeline(speaker_data_json)
+    with span("prosody_contours", audio_seconds=audio_seconds):
+        contours = segment_contours(base_audio, [slot for slot in timeline if slot[3] is not None])
+    with span("speaker_attributes"):
+        infer_speaker_attributes(speaker_data_json, timeline, contours)
+    return audio_seconds, base_audio, timeline, speaker_data_json, contours
 
 
-def complete_pipeline(file_path, target_language):
+def _run_pipeline(file_path, target_language, work_dir, report, incremental):
     target_language = get_language_code(target_language)
+    started = time.perf_counter()
+
+    audio_seconds, base_audio, timeline, speaker_data, prosody_contours = _prepare_timeline(file_path, work_dir,
+                                                                                             report)
+
+    segment_dir = os.path.join(work_dir, 'temp_segments')
+    os.makedirs(segment_dir, exist_ok=True)
+
+    final_dir = os.path.join(work_dir, 'final_output')
+    final_audio_path = os.path.join(final_dir, 'final_audio_file.wav')
+    final_srt_path = os.path.join(final_dir, 'final_audio_file.srt')
+
+    output = ProgressiveOutput(
+        [(start_ms, end_ms, key) for start_ms, end_ms, key, _ in timeline],
+        os.path.join(final_dir, 'stream'), final_audio_path, final_srt_path, stream=incremental
+    )
+
+    # Pauses are silence and ready immediately
+    for _, _, key, speaker_id in timeline:
+        if speaker_id is None:
+            output.add(key)
+
+    total_segments = sum(1 for slot in timeline if slot[3] is not None)
+    report("segments", 0.0)
+    first_audio = None
+    for done, (key, output_path, chunks) in enumerate(
+            iter_dubbed_segments(timeline, base_audio, target_language, segment_dir, speaker_data,
+                                 prosody_contours), start=1):
+        with span("mixing.append"):
+            output.add(key, output_path, chunks)
+        if first_audio is None and output.ready_ms > 0 and incremental:
+            first_audio = time.perf_counter() - started
+            print(f"[INFO] First playable audio after {first_audio:.1f}s: {output.playlist_path}")
+        report("segments", done / max(total_segments, 1))
+
+    report("mixing", 0.0)
+    with span("mixing", audio_seconds=audio_seconds):
+        output.close()
+    report("done", 1.0)
 
-    audio_path = extract_audio(file_path)
-    cleaned_audio_path = clean_audio(audio_path)
-    speaker_data_json = diarize_and_extract_speakers(cleaned_audio_path)
-
-    base_audio = AudioSegment.from_wav(cleaned_audio_path)
-    output_segments = []
-
-    os.makedirs('temp_segments', exist_ok=True)
-
-    subtitle_entries = []
+    return final_audio_path, final_srt_path
 
-    # Iterate through each speaker
-    for speaker_id, data in speaker_data_json.items():
-        if speaker_id == "pause_segments":
-            continue
 
-        for seg in data['segments']:
-            start_ms = int(seg['start'] * 1000)
-            end_ms = int(seg['end'] * 1000)
+def complete_pipeline_multi(file_path, target_languages, job_id=None, profile=False, work_dir=".",
+                            progress_callback=None):
+    """
+    Dubs a video into several languages, sharing all language-independent work.
+
+    Extraction, denoising, diarization, ASR, phrase swapping, prosody and emotion
+    analysis run once. The translations for all targets are batched together,
+    then only TTS, mixing and subtitles run per language.
+
+    Args:
+        file_path (str): Input video.
+        target_languages (List[str]): Language names, e.g. ['hindi', 'tamil'].
+
+    Returns:
+        dict: language code -> (final_audio_path, final_srt_path), files under
+        final_output/<code>/.
+    """
+    report = progress_callback or (lambda stage, fraction: None)
+    with trace_job(job_id, profile=profile):
+        languages = list(dict.fromkeys(get_language_code(lang) for lang in target_languages))
+        audio_seconds, base_audio, timeline, speaker_data, prosody_contours = _prepare_timeline(file_path, work_dir,
+                                                                                                 report)
+
+        segment_dir = os.path.join(work_dir, 'temp_segments')
+        os.makedirs(segment_dir, exist_ok=True)
+
+        # Shared source analysis, once per segment
+        speech_slots = [slot for slot in timeline if slot[3] is not None]
+        sub_turns = segment_sub_turns(speaker_data)
+        sources = []
+        report("source_analysis", 0.0)
+        for done, ((start_ms, end_ms, key, speaker_id), audio_emotions) in enumerate(
+                iter_segment_emotions(base_audio, speech_slots), start=1):
             original_duration = (end_ms - start_ms) / 1000.0
-
-            segment_audio = base_audio[start_ms:end_ms]
-            segment_path = f'temp_segments/{speaker_id}_{start_ms}_{end_ms}.wav'
-            segment_audio.export(segment_path, format='wav')
-
-            # Analyze and generate new audio
-            emotions, prosodic_features = voice_file_analysis(segment_path)
-            sentiment, emotions, translated_text, source_text = text_file_analysis(segment_path, target_language)
-
-            output_path = f'temp_segments/processed_{speaker_id}_{start_ms}_{end_ms}.wav'
-            generate_output(source_text, translated_text, prosodic_features, sentiment, emotions, original_duration, target_language, output_path)
-
-            processed_duration = get_audio_duration(output_path)
-            processed_audio = AudioSegment.from_wav(output_path)
-            adjusted_audio = adjust_audio_speed(processed_audio, original_duration, processed_duration)
-            adjusted_audio.export(output_path, format='wav')
-
-            output_segments.append((start_ms, output_path))
-
-            # 📝 Save subtitle info
-            chunks = generate_srt_entries_from_text(translated_text, start_ms, end_ms, max_words_per_line=6)
-            subtitle_entries.extend(chunks)
-
-    # Process pause segments
-    for pause in speaker_data_json.get("pause_segments", []):
-        start_ms = int(pause['start'] * 1000)
-        end_ms = int(pause['end'] * 1000)
-        duration = end_ms - start_ms
-        pause_audio = AudioSegment.silent(duration=duration)
-        pause_path = f'temp_segments/pause_{start_ms}_{end_ms}.wav'
-        pause_audio.export(pause_path, format='wav')
-        output_segments.append((start_ms, pause_path))
-
-    # Combine all segments in order
-    output_segments.sort(key=lambda x: x[0])
-    final_audio = AudioSegment.empty()
-    for _, path in output_segments:
-        final_audio += AudioSegment.from_wav(path)
-
-    # Export final output
-    os.makedirs('final_output', exist_ok=True)
-    final_audio_path = 'final_output/final_audio_file.wav'
-    final_audio.export(final_audio_path, format='wav')
-
-    # Generate SRT subtitles
-    final_srt_path = 'final_output/final_audio_file.srt'
-    write_srt(subtitle_entries, output_path=final_srt_path)
-
-    return final_audio_path, final_srt_path
+            with span("segment.source", audio_seconds=original_duration, speaker=speaker_id, start_ms=start_ms):
+                segment_path = os.path.join(segment_dir, f'{key}.wav')
+                base_audio[start_ms:end_ms].export(segment_path, format='wav')
+                with span("segment.voice_analysis", audio_seconds=original_duration):
+                    _, prosodic_features, contours = voice_file_analysis(segment_path, audio_emotions,
+                                                                         prosody_contours.get(key))
+                with span("segment.text_analysis", audio_seconds=original_duration):
+                    sentiment, emotion, source_text, phrase_swap_text = text_source_analysis(segment_path)
+            sources.append((prosodic_features, contours, sentiment, emotion, source_text, phrase_swap_text))
+            report("source_analysis", done / max(len(speech_slots), 1))
+
+        # One batched translation pass for every target
+        report("translation", 0.0)
+        translations = translate_texts([source[5] for source in sources], languages)
+
+        results = {}
+        for lang_index, language in enumerate(languages):
+            report(f"synthesis_{language}", 0.0)
+            language_dir = os.path.join(work_dir, 'final_output', language)
+            language_segment_dir = os.path.join(segment_dir, language)
+            os.makedirs(language_segment_dir, exist_ok=True)
+            final_audio_path = os.path.join(language_dir, 'final_audio_file.wav')
+            final_srt_path = os.path.join(language_dir, 'final_audio_file.srt')
+
+            output = ProgressiveOutput(
+                [(start_ms, end_ms, key) for start_ms, end_ms, key, _ in timeline],
+                os.path.join(language_dir, 'stream'), final_audio_path, final_srt_path
+            )
+            for _, _, key, speaker_id in timeline:
+                if speaker_id is None:
+                    output.add(key)
+
+            for done, ((start_ms, end_ms, key, speaker_id), source, translated_text) in enumerate(
+                    zip(speech_slots, sources, translations[language]), start=1):
+                prosodic_features, contours, sentiment, emotion, source_text, _ = source
+                output_path = os.path.join(language_segment_dir, f'processed_{key}.wav')
+                chunks = synthesize_segment(source_text, translated_text, prosodic_features, sentiment, emotion,
+                                            start_ms, end_ms, language, output_path,
+                                            speaker_attributes(speaker_data, speaker_id), sub_turns.get(key),
+                                            contours)
+                output.add(key, output_path, chunks)
+                report(f"synthesis_{language}", done / max(len(speech_slots), 1))
+
+            with span("mixing", audio_seconds=audio_seconds, language=language):
+                results[language] = output.close()
+            print(f"✅ [{lang_index + 1}/{len(languages)}] {language} done: {final_audio_path}")
+
+        report("done", 1.0)
+        return results
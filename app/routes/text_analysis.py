@@ -1,22 +1,38 @@
 import os
 import asyncio
+import threading
 from modules.text_analysis.asr_transcriber import transcribe_audio
 from modules.text_analysis.text_sentiment_analysis import UnifiedTextAnalysis
 # from modules.text_analysis.asr_transcriber import transcribe_audio
-import asyncio
 from modules.text_analysis.phrase_swapping import process_text
+from utils.tracing import span
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """
+    One event loop per process, running in a daemon thread, shared by every job.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="text-analysis-loop", daemon=True).start()
+    return _loop
+
 
 def safe_async_call(coro):
-    try:
-        return asyncio.run(coro)
-    except RuntimeError as e:
-        if "already running" in str(e):
-            import nest_asyncio
-            nest_asyncio.apply()
-            loop = asyncio.get_event_loop()
-            return loop.run_until_complete(coro)
-        else:
-            raise
+    """
+    Runs a coroutine to completion from synchronous code, from any thread.
+
+    Instead of creating a fresh event loop per call with asyncio.run, every call
+    is scheduled on the persistent background loop, so requests from concurrent
+    jobs are in flight together (and can be micro-batched). The task runs in a
+    copy of the caller's context, so the current trace span is kept.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
 
 # Usage
 analyzer = UnifiedTextAnalysis(translation_backend="nllb")
@@ -31,11 +47,14 @@ def text_file_analysis(audio_path, target_language):
     Returns:
         List[dict]: List of analysis results for each scene.
     """
-    source_text, source_segments = transcribe_audio(audio_path)
+    with span("text.asr"):
+        source_text, source_segments = transcribe_audio(audio_path)
 
-    phrase_swap_text = process_text(source_text)
+    with span("text.phrase_swap"):
+        phrase_swap_text = process_text(source_text)
 
-    target_text = safe_async_call(analyzer.analyze(phrase_swap_text, target_language))
+    with span("text.analyze"):
+        target_text = safe_async_call(analyzer.analyze(phrase_swap_text, target_language))
 
     sentiment = target_text.get("sentiment")
     emotions = target_text.get("emotions")
@@ -46,3 +65,36 @@ def text_file_analysis(audio_path, target_language):
 
 
 
+
+
+def text_source_analysis(audio_path):
+    """
+    Language-independent part of text_file_analysis: ASR, phrase swapping and
+    source-text sentiment/emotion. Run once per segment, whatever the number of targets.
+
+    Returns:
+        tuple: (sentiment, major_emotion, source_text, phrase_swap_text)
+    """
+    with span("text.asr"):
+        source_text, source_segments = transcribe_audio(audio_path)
+
+    with span("text.phrase_swap"):
+        phrase_swap_text = process_text(source_text)
+
+    with span("text.analyze_source"):
+        source_analysis = analyzer.analyze_source(phrase_swap_text)
+
+    emotions = source_analysis.get("emotions")
+    major_emotion = max(emotions, key=lambda x: x['score'])['label'] if emotions else "neutral"
+    return source_analysis.get("sentiment"), major_emotion, source_text, phrase_swap_text
+
+
+def translate_texts(texts, target_languages, batch_size=16):
+    """
+    Batched translation of many segment texts into all target languages at once.
+
+    Returns:
+        dict: target language code -> list of translations aligned with texts.
+    """
+    with span("text.translate_batch", texts=len(texts), targets=len(target_languages)):
+        return analyzer.translate_batch(texts, target_languages, batch_size=batch_size)
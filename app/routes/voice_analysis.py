@@ -1,24 +1,99 @@
 import os
-from modules.audio_analysis.emotion_classifier import perform_emotion_analysis
-from modules.audio_analysis.prosodic_feature_extractor import extract_word_level_features
+import numpy as np
+from modules.audio_analysis.emotion_classifier import perform_emotion_analysis, perform_emotion_analysis_batch
+from modules.audio_analysis.prosodic_feature_extractor import extract_word_level_features, extract_prosody_contours
+from utils.tracing import span
 
+# Speech segments classified per emotion batch call; bounds the decoded audio
+# held at once while keeping batches full
+EMOTION_BATCH_SEGMENTS = 32
+# Praat's pitch/intensity analysis needs a few periods of the lowest pitch
+MIN_CONTOUR_SECONDS = 0.1
 
-def voice_file_analysis(audio_path):
+
+def slot_waveforms(base_audio, slots):
+    """
+    Mono float waveforms of timeline slots, sliced from the decoded audio.
+
+    Args:
+        base_audio (AudioSegment): The job's cleaned audio.
+        slots (List[tuple]): (start_ms, end_ms, key, speaker_id) timeline slots.
+
+    Returns:
+        tuple: (list of float32 arrays aligned with slots, sampling rate)
+    """
+    audio = base_audio.set_channels(1)
+    scale = float(1 << (8 * audio.sample_width - 1))
+    waveforms = [
+        np.array(audio[start_ms:end_ms].get_array_of_samples(), dtype=np.float32) / scale
+        for start_ms, end_ms, _, _ in slots
+    ]
+    return waveforms, audio.frame_rate
+
+
+def segment_emotions(base_audio, slots):
+    """
+    Speech emotion of several timeline slots with one batched model pass.
+
+    Returns:
+        list: Emotion results aligned with slots (see perform_emotion_analysis_batch).
+    """
+    waveforms, sampling_rate = slot_waveforms(base_audio, slots)
+    with span("voice.emotion", audio_seconds=sum(len(w) for w in waveforms) / sampling_rate, segments=len(slots)):
+        return perform_emotion_analysis_batch(waveforms, sampling_rate=sampling_rate)
+
+
+def segment_contours(base_audio, slots):
+    """
+    Pitch and intensity contours of every timeline slot, computed once per job.
+    They give each speaker's mean F0 (speaker_attributes.infer_speaker_attributes)
+    and are reused by the word-level prosody analysis of the segment.
+
+    Returns:
+        dict: Slot key -> contours (see extract_prosody_contours); slots shorter
+        than MIN_CONTOUR_SECONDS are left out.
+    """
+    waveforms, sampling_rate = slot_waveforms(base_audio, slots)
+    return {
+        key: extract_prosody_contours(waveform, sampling_rate)
+        for (_, _, key, _), waveform in zip(slots, waveforms)
+        if len(waveform) >= MIN_CONTOUR_SECONDS * sampling_rate
+    }
+
+
+def iter_segment_emotions(base_audio, slots, block_size=EMOTION_BATCH_SEGMENTS):
+    """
+    Yields (slot, emotions) in slot order, classifying block_size slots per batch.
+    """
+    for start in range(0, len(slots), block_size):
+        block = slots[start:start + block_size]
+        yield from zip(block, segment_emotions(base_audio, block))
+
+
+def voice_file_analysis(audio_path, emotions=None, contours=None):
     """
     Performs voice analysis on a video by preprocessing and analyzing each scene audio.
 
     Args:
-        video_path (str): Path to the input video.
-        scene_json (str): Path to scene timestamp JSON file.
-        preprocess_function (function): A function that processes the video and returns list of audio paths.
+        audio_path (str): Segment WAV.
+        emotions (list): Emotions already classified in a batch (segment_emotions);
+            classified here when None.
+        contours (dict): Prosody contours already computed for the segment
+            (segment_contours); computed here when None.
 
     Returns:
-        List[dict]: List of analysis results for each scene.
+        tuple: (emotions, prosodic_features, prosody contours of the whole file)
     """
-    emotions = perform_emotion_analysis(audio_path)
+    if emotions is None:
+        with span("voice.emotion"):
+            emotions = perform_emotion_analysis(audio_path)
 
-    prosodic_features = extract_word_level_features(audio_path)
+    with span("voice.prosody"):
+        # Features are kept next to the segment audio, inside the job's work_dir
+        prosodic_features, contours = extract_word_level_features(
+            audio_path, contours=contours, return_contours=True, artifact_dir=f"{os.path.splitext(audio_path)[0]}_prosody"
+        )
 
-    return emotions, prosodic_features
+    return emotions, prosodic_features, contours
 
 
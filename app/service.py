@@ -0,0 +1,327 @@
+"""
+Asynchronous HTTP job service around complete_pipeline.
+
+Uploads are streamed to disk chunk by chunk, jobs run in a pool of worker
+processes (models are loaded once per worker), progress is written to a
+status file per job and results are served with HTTP range support. The event
+loop only moves bytes, so uploads and status polls stay responsive while the
+workers are busy.
+
+Run:
+    uvicorn app.service:app --host 0.0.0.0 --port 8000
+
+    curl -T sample.mp4 "http://localhost:8000/jobs?target_language=hindi&filename=sample.mp4"
+    curl http://localhost:8000/jobs/<job_id>
+    curl -r 0-1048575 -o part.mp4 http://localhost:8000/jobs/<job_id>/outputs/video
+
+While a job runs, the dub is published progressively and can be played with
+any HLS player from /jobs/<job_id>/stream/playlist.m3u8 (subtitles: subtitles.vtt).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import multiprocessing
+from functools import partial
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from utils.languages import get_language_code
+
+JOBS_DIR = os.path.abspath(os.getenv("SUBHASHIT_JOBS_DIR", os.path.join("output", "jobs")))
+NUM_WORKERS = int(os.getenv("SUBHASHIT_WORKERS", "1"))
+# Concurrent jobs as threads of the API process, sharing one set of models (so
+# the micro-batching queues in models/batching_server.py see requests from all
+# of them); calls into each shared model are serialized by its model_lock, so
+# jobs overlap across stages, not inside one model. 0 runs every job in a
+# worker process instead
+JOB_THREADS = int(os.getenv("SUBHASHIT_JOB_THREADS", "0"))
+# Shared queue database of shard workers (app/distributed.py); when set, every
+# job is split into scene shards and processed by those workers
+SHARD_QUEUE = os.getenv("SUBHASHIT_SHARD_QUEUE")
+MAX_UPLOAD_BYTES = int(os.getenv("SUBHASHIT_MAX_UPLOAD_MB", "4096")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# Output name -> file inside the job directory
+OUTPUT_FILES = {
+    "video": ("output.mp4", "video/mp4"),
+    "audio": ("final_output/final_audio_file.wav", "audio/wav"),
+    "subtitles": ("final_output/final_audio_file.srt", "application/x-subrip"),
+}
+
+# Progressive output (HLS playlist, audio chunks, growing WebVTT)
+STREAM_DIR = os.path.join("final_output", "stream")
+STREAM_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t", ".vtt": "text/vtt"}
+_STREAM_NAME_RE = re.compile(r"(playlist\.m3u8|subtitles\.vtt|chunk_\d{5}\.ts)$")
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+# --- Job status (shared through files, so any process can read or write it) ---
+
+def _status_path(job_id):
+    return os.path.join(JOBS_DIR, job_id, "status.json")
+
+
+def write_status(job_id, **fields):
+    """
+    Merges fields into the job's status file (atomic replace).
+    """
+    path = _status_path(job_id)
+    status = read_status(job_id) or {"job_id": job_id}
+    status.update(fields, updated_at=time.time())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, path)
+    return status
+
+
+def read_status(job_id):
+    try:
+        with open(_status_path(job_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# --- Worker process side ---
+
+def _init_worker():
+    # Importing the pipeline loads every model; do it once per worker, not per job
+    from app.routes import pipeline
+    pipeline.warm_up_models()
+    print(f"[INFO] Worker {os.getpid()} ready")
+
+
+def run_job(job_id, input_path, target_language, burn_subtitles=False, incremental=True):
+    """
+    Runs the full pipeline and the final mux for one job inside a worker process.
+    """
+    from app.routes.pipeline import complete_pipeline
+    from modules.generation.video_muxer import mux_final_video
+
+    job_dir = os.path.join(JOBS_DIR, job_id)
+
+    def report(stage, fraction):
+        write_status(job_id, state="running", stage=stage, stage_progress=round(fraction, 3))
+
+    try:
+        write_status(job_id, state="running", stage="starting", started_at=time.time(), worker_pid=os.getpid())
+        if SHARD_QUEUE:
+            from app.distributed import complete_pipeline_sharded
+
+            final_audio, final_srt = complete_pipeline_sharded(
+                input_path, target_language, queue_path=SHARD_QUEUE, job_id=job_id, work_dir=job_dir,
+                progress_callback=report
+            )
+        else:
+            final_audio, final_srt = complete_pipeline(
+                input_path, target_language, job_id=job_id, work_dir=job_dir, progress_callback=report,
+                incremental=incremental
+            )
+        report("muxing", 0.0)
+        mux_final_video(input_path, final_audio, os.path.join(job_dir, OUTPUT_FILES["video"][0]),
+                        subtitle_path=final_srt, burn_subtitles=burn_subtitles,
+                        language=get_language_code(target_language))
+        write_status(job_id, state="done", stage="done", stage_progress=1.0, finished_at=time.time(),
+                     outputs=sorted(OUTPUT_FILES))
+    except Exception as e:
+        write_status(job_id, state="failed", error=str(e), finished_at=time.time())
+        raise
+
+
+# --- HTTP side ---
+
+def _make_pool():
+    if JOB_THREADS > 0:
+        return ThreadPoolExecutor(max_workers=JOB_THREADS, thread_name_prefix="job")
+    return ProcessPoolExecutor(
+        max_workers=NUM_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+    )
+
+
+def _submit(app, *args):
+    """
+    Queues a call on the job pool. A pool broken by a dead worker process is
+    replaced once, so one crash does not take the service down.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return loop.run_in_executor(app.state.pool, *args)
+    except BrokenExecutor:
+        print("[WARNING] Job pool is broken (a worker died), starting a new one")
+        app.state.pool.shutdown(wait=False, cancel_futures=True)
+        app.state.pool = _make_pool()
+        return loop.run_in_executor(app.state.pool, *args)
+
+
+def _job_finished(job_id, future):
+    """
+    Marks a job failed when its worker never reported an outcome, e.g. the
+    worker process died (BrokenProcessPool) or the job was cancelled.
+    """
+    if future.cancelled():
+        error = "cancelled"
+    elif future.exception() is not None:
+        error = f"{type(future.exception()).__name__}: {future.exception()}"
+    else:
+        return
+    if (read_status(job_id) or {}).get("state") not in ("done", "failed"):
+        write_status(job_id, state="failed", error=error, finished_at=time.time())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    if JOB_THREADS > 0:
+        await asyncio.to_thread(_init_worker)
+        app.state.pool = _make_pool()
+        print(f"[INFO] Job service started with {JOB_THREADS} job thread(s), jobs in {JOBS_DIR}")
+    else:
+        app.state.pool = _make_pool()
+        print(f"[INFO] Job service started with {NUM_WORKERS} worker(s), jobs in {JOBS_DIR}")
+    app.state.tasks = set()
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="SuBhashit", lifespan=lifespan)
+
+
+async def _save_upload(request, path):
+    """
+    Streams the request body to disk without holding it in memory.
+    """
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            await asyncio.to_thread(f.write, chunk)
+    return size
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request, target_language: str, filename: str = "input.mp4",
+                     burn_subtitles: bool = False, incremental: bool = True):
+    """
+    Accepts a raw video body (e.g. `curl -T video.mp4`), stores it and queues a job.
+    """
+    try:
+        get_language_code(target_language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir)
+    input_path = os.path.join(job_dir, "input" + (os.path.splitext(os.path.basename(filename))[1] or ".mp4"))
+
+    try:
+        size = await _save_upload(request, input_path)
+    except BaseException:
+        write_status(job_id, state="failed", error="upload aborted")
+        raise
+    if size == 0:
+        write_status(job_id, state="failed", error="empty upload")
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    write_status(job_id, state="queued", stage="queued", stage_progress=0.0, target_language=target_language,
+                 input_bytes=size, created_at=time.time())
+
+    try:
+        future = _submit(request.app, run_job, job_id, input_path, target_language, burn_subtitles, incremental)
+    except Exception as e:
+        write_status(job_id, state="failed", error=f"could not be scheduled: {e}", finished_at=time.time())
+        raise HTTPException(status_code=503, detail="No job workers available")
+    # Keep a reference so the future is not garbage collected
+    request.app.state.tasks.add(future)
+    future.add_done_callback(request.app.state.tasks.discard)
+    # Failures inside run_job are already in status.json; a dead worker is recorded here
+    future.add_done_callback(partial(_job_finished, job_id))
+
+    response = {"job_id": job_id, "status_url": f"/jobs/{job_id}"}
+    if incremental:
+        response["stream_url"] = f"/jobs/{job_id}/stream/playlist.m3u8"
+    return response
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    status = read_status(job_id) if re.fullmatch(r"[0-9a-f]{32}", job_id) else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return status
+
+
+def _iter_file(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@app.get("/jobs/{job_id}/outputs/{name}")
+async def job_output(job_id: str, name: str, request: Request):
+    """
+    Serves an output file; a single `Range: bytes=start-end` request gets a 206.
+    """
+    status = await job_status(job_id)
+    if name not in OUTPUT_FILES:
+        raise HTTPException(status_code=404, detail=f"Unknown output '{name}', choose from {sorted(OUTPUT_FILES)}")
+    relative_path, media_type = OUTPUT_FILES[name]
+    path = os.path.join(JOBS_DIR, job_id, relative_path)
+    if status.get("state") != "done" or not os.path.exists(path):
+        raise HTTPException(status_code=409, detail=f"Output not ready (state: {status.get('state')})")
+
+    file_size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes",
+               "Content-Disposition": f'attachment; filename="{job_id}_{os.path.basename(relative_path)}"'}
+    range_header = request.headers.get("range")
+    if not range_header:
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(_iter_file(path, 0, file_size - 1), media_type=media_type, headers=headers)
+
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), file_size - 1) if last else file_size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(file_size - int(last), 0), file_size - 1
+    if start >= file_size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+
+    headers.update({"Content-Range": f"bytes {start}-{end}/{file_size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_iter_file(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@app.get("/jobs/{job_id}/stream/{name}")
+async def job_stream(job_id: str, name: str):
+    """
+    Progressive output of a running (or finished) incremental job.
+    """
+    await job_status(job_id)
+    path = os.path.join(JOBS_DIR, job_id, STREAM_DIR, name)
+    if not _STREAM_NAME_RE.fullmatch(name) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Not available yet")
+    media_type = STREAM_MEDIA_TYPES[os.path.splitext(name)[1]]
+    # The playlist and VTT keep growing; chunks never change once listed
+    cache = "no-cache" if not name.endswith(".ts") else "max-age=86400"
+    with open(path, "rb") as f:
+        content = await asyncio.to_thread(f.read)
+    return Response(content, media_type=media_type, headers={"Cache-Control": cache})
@@ -0,0 +1,190 @@
+"""
+Accuracy-and-speed report for the CPU inference backends (fp32 / int8 / onnx).
+
+Every model runs on the same fixed sample set. fp32 is the reference: accuracy
+is reported as agreement with the fp32 outputs (top label for the classifiers,
+character similarity for NLLB, cosine similarity for LaBSE embeddings).
+
+Usage:
+    python -m benchmarks.backend_report --audio-dir samples/emotion --output logs/backend_report.json
+"""
+import os
+import json
+import time
+import argparse
+import difflib
+import numpy as np
+import torch
+import librosa
+from transformers import AutoTokenizer, AutoFeatureExtractor
+from models.inference_backends import (
+    BACKENDS,
+    load_seq2seq_model,
+    load_sequence_classifier,
+    load_audio_classifier,
+    load_sentence_transformer
+)
+
+NLLB_MODEL = "facebook/nllb-200-distilled-600M"
+TEXT_EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+SPEECH_EMOTION_MODEL = "superb/wav2vec2-base-superb-er"
+LABSE_MODEL = "sentence-transformers/LaBSE"
+
+SAMPLE_SENTENCES = [
+    "I'm really frustrated with how things are being handled.",
+    "The weather is lovely today, let's go for a walk.",
+    "Please send me the report before the meeting tomorrow.",
+    "I can't believe we finally won the championship!",
+    "He quietly closed the door and left without a word.",
+    "This is the worst service I have ever experienced.",
+    "Thank you so much for helping me with the move.",
+    "The train was delayed by two hours because of the storm.",
+    "She was afraid to walk home alone in the dark.",
+    "We will announce the results at the end of the week.",
+]
+
+
+def _timed(fn, repeats):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        output = fn()
+    return output, (time.perf_counter() - start) / repeats
+
+
+def _run_nllb(backend, repeats, target_lang="hin_Deva"):
+    tokenizer = AutoTokenizer.from_pretrained(NLLB_MODEL, src_lang="eng_Latn")
+    start = time.perf_counter()
+    model = load_seq2seq_model(NLLB_MODEL, backend)
+    load_time = time.perf_counter() - start
+
+    def translate():
+        inputs = tokenizer(SAMPLE_SENTENCES, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            tokens = model.generate(
+                **inputs, forced_bos_token_id=tokenizer.convert_tokens_to_ids(target_lang), max_length=128
+            )
+        return tokenizer.batch_decode(tokens, skip_special_tokens=True)
+
+    outputs, latency = _timed(translate, repeats)
+    return outputs, load_time, latency
+
+
+def _run_text_emotion(backend, repeats):
+    tokenizer = AutoTokenizer.from_pretrained(TEXT_EMOTION_MODEL)
+    start = time.perf_counter()
+    model = load_sequence_classifier(TEXT_EMOTION_MODEL, backend)
+    load_time = time.perf_counter() - start
+
+    def classify():
+        inputs = tokenizer(SAMPLE_SENTENCES, return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            return model(**inputs).logits.argmax(-1).tolist()
+
+    outputs, latency = _timed(classify, repeats)
+    return outputs, load_time, latency
+
+
+def _run_speech_emotion(backend, repeats, waveforms):
+    feature_extractor = AutoFeatureExtractor.from_pretrained(SPEECH_EMOTION_MODEL)
+    start = time.perf_counter()
+    model = load_audio_classifier(SPEECH_EMOTION_MODEL, backend)
+    load_time = time.perf_counter() - start
+
+    def classify():
+        labels = []
+        for speech in waveforms:
+            inputs = feature_extractor(speech, sampling_rate=16000, return_tensors="pt")
+            with torch.inference_mode():
+                labels.append(int(model(**inputs).logits.argmax(-1)))
+        return labels
+
+    outputs, latency = _timed(classify, repeats)
+    return outputs, load_time, latency
+
+
+def _run_labse(backend, repeats):
+    start = time.perf_counter()
+    model = load_sentence_transformer(LABSE_MODEL, backend)
+    load_time = time.perf_counter() - start
+
+    outputs, latency = _timed(lambda: model.encode(SAMPLE_SENTENCES, normalize_embeddings=True), repeats)
+    return outputs, load_time, latency
+
+
+def _agreement(model_key, reference, outputs):
+    if model_key == "nllb":
+        return float(np.mean([difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, outputs)]))
+    if model_key == "labse":
+        return float(np.mean(np.sum(np.asarray(reference) * np.asarray(outputs), axis=1)))
+    return float(np.mean(np.asarray(reference) == np.asarray(outputs)))
+
+
+def build_report(backends=BACKENDS, audio_dir=None, repeats=3):
+    """
+    Runs every model on every backend and compares against fp32.
+
+    Returns:
+        dict: model -> backend -> {load_seconds, latency_seconds, speedup, agreement}.
+    """
+    runners = {
+        "nllb": lambda b: _run_nllb(b, repeats),
+        "text_emotion": lambda b: _run_text_emotion(b, repeats),
+        "labse": lambda b: _run_labse(b, repeats),
+    }
+    if audio_dir:
+        paths = sorted(os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.lower().endswith(".wav"))
+        waveforms = [librosa.load(path, sr=16000)[0] for path in paths]
+        runners["speech_emotion"] = lambda b: _run_speech_emotion(b, repeats, waveforms)
+
+    backends = ["fp32"] + [b for b in backends if b != "fp32"]
+    report = {}
+    for model_key, run in runners.items():
+        report[model_key] = {}
+        reference = None
+        for backend in backends:
+            try:
+                outputs, load_time, latency = run(backend)
+            except Exception as e:
+                print(f"⚠️ {model_key} [{backend}] failed: {e}")
+                report[model_key][backend] = {"error": str(e)}
+                continue
+
+            if backend == "fp32":
+                reference, reference_latency = outputs, latency
+            report[model_key][backend] = {
+                "load_seconds": round(load_time, 3),
+                "latency_seconds": round(latency, 4),
+                "speedup": round(reference_latency / latency, 2) if reference is not None else None,
+                "agreement": round(_agreement(model_key, reference, outputs), 4) if reference is not None else None,
+            }
+    return report
+
+
+def print_report(report):
+    print(f"{'model':<16}{'backend':<9}{'load s':>9}{'latency s':>12}{'speedup':>9}{'agreement':>11}")
+    for model_key, rows in report.items():
+        for backend, row in rows.items():
+            if "error" in row:
+                print(f"{model_key:<16}{backend:<9}  error: {row['error']}")
+                continue
+            print(f"{model_key:<16}{backend:<9}{row['load_seconds']:>9}{row['latency_seconds']:>12}"
+                  f"{row['speedup']!s:>9}{row['agreement']!s:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fp32 / int8 / onnx inference backends.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--audio-dir", help="Directory of WAV clips for the speech emotion model.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="logs/backend_report.json")
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    result = build_report(args.backends, args.audio_dir, args.repeats)
+    print_report(result)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Report saved to {args.output}")
@@ -0,0 +1,154 @@
+"""
+Tokens-per-second of the autoregressive generators, eager vs compiled
+static-cache decoding (see models/compiled_generation.py).
+
+Each generator is loaded twice, once per mode. The compiled mode is warmed up
+before timing so compilation cost is reported separately.
+
+Usage:
+    python -m benchmarks.generation_throughput --models nllb whisper parler --audio samples/sample.wav
+"""
+import os
+import json
+import time
+import argparse
+import torch
+from models.compiled_generation import (
+    enable_compiled_generation, compile_whisper, tokenize_bucketed
+)
+
+SAMPLE_SENTENCES = [
+    "Please send me the report before the meeting tomorrow.",
+    "The train was delayed by two hours because of the storm.",
+    "I can't believe we finally won the championship!",
+    "We will announce the results at the end of the week.",
+]
+
+
+def _measure(run, repeats):
+    start = time.perf_counter()
+    tokens = 0
+    for _ in range(repeats):
+        tokens += run()
+    elapsed = time.perf_counter() - start
+    return {"tokens": tokens, "seconds": round(elapsed, 3), "tokens_per_second": round(tokens / elapsed, 2)}
+
+
+def bench_nllb(compiled, repeats):
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    name = "facebook/nllb-200-distilled-600M"
+    tokenizer = AutoTokenizer.from_pretrained(name, src_lang="eng_Latn")
+    model = AutoModelForSeq2SeqLM.from_pretrained(name).eval()
+    if compiled:
+        enable_compiled_generation(model)
+    bos = tokenizer.convert_tokens_to_ids("hin_Deva")
+
+    def run():
+        total = 0
+        for sentence in SAMPLE_SENTENCES:
+            if compiled:
+                inputs = tokenize_bucketed(tokenizer, [sentence])
+            else:
+                inputs = tokenizer([sentence], return_tensors="pt")
+            with torch.inference_mode():
+                output = model.generate(**inputs, forced_bos_token_id=bos, max_length=128)
+            total += int((output != tokenizer.pad_token_id).sum())
+        return total
+
+    start = time.perf_counter()
+    run()  # warm-up / compilation
+    warmup = time.perf_counter() - start
+    return {"warmup_seconds": round(warmup, 2), **_measure(run, repeats)}
+
+
+def bench_whisper(compiled, repeats, audio_path, model_name):
+    import whisper
+
+    model = whisper.load_model(model_name, device="cpu")
+    if compiled:
+        compile_whisper(model)
+    audio = whisper.load_audio(audio_path)
+
+    def run():
+        result = model.transcribe(audio, fp16=False)
+        return sum(len(seg["tokens"]) for seg in result["segments"])
+
+    start = time.perf_counter()
+    run()
+    warmup = time.perf_counter() - start
+    return {"warmup_seconds": round(warmup, 2), **_measure(run, repeats)}
+
+
+def bench_parler(compiled, repeats):
+    from parler_tts import ParlerTTSForConditionalGeneration
+    from transformers import AutoTokenizer
+
+    name = "ai4bharat/indic-parler-tts"
+    model = ParlerTTSForConditionalGeneration.from_pretrained(name).eval()
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    description_tokenizer = AutoTokenizer.from_pretrained(model.config.text_encoder._name_or_path)
+    if compiled:
+        enable_compiled_generation(model)
+
+    description = "A male speaker delivers a neutral speech with natural pitch and pacing."
+    prompt = "मुझे सुबह चाय पीना बहुत पसंद है।"
+    tokenize = tokenize_bucketed if compiled else (lambda tok, text: tok(text, return_tensors="pt"))
+    frame_rate = model.audio_encoder.config.frame_rate
+    sampling_rate = model.config.sampling_rate
+
+    def run():
+        description_inputs = tokenize(description_tokenizer, description)
+        prompt_inputs = tokenize(tokenizer, prompt)
+        with torch.no_grad():
+            audio = model.generate(
+                input_ids=description_inputs["input_ids"],
+                attention_mask=description_inputs["attention_mask"],
+                prompt_input_ids=prompt_inputs["input_ids"],
+                prompt_attention_mask=prompt_inputs["attention_mask"]
+            )
+        # One decoding step produces one codec frame
+        return int(audio.shape[-1] / sampling_rate * frame_rate)
+
+    start = time.perf_counter()
+    run()
+    warmup = time.perf_counter() - start
+    return {"warmup_seconds": round(warmup, 2), **_measure(run, repeats)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eager vs compiled static-cache generation throughput.")
+    parser.add_argument("--models", nargs="+", default=["nllb", "whisper", "parler"],
+                        choices=["nllb", "whisper", "parler"])
+    parser.add_argument("--audio", help="Speech WAV for the Whisper benchmark.")
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="logs/generation_throughput.json")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    report = {}
+    for name in args.models:
+        if name == "whisper" and not args.audio:
+            print("Skipping whisper: pass --audio")
+            continue
+        report[name] = {}
+        for compiled in (False, True):
+            mode = "compiled" if compiled else "eager"
+            if name == "nllb":
+                result = bench_nllb(compiled, args.repeats)
+            elif name == "whisper":
+                result = bench_whisper(compiled, args.repeats, args.audio, args.whisper_model)
+            else:
+                result = bench_parler(compiled, args.repeats)
+            report[name][mode] = result
+            print(f"{name:<8}{mode:<10}{result['tokens_per_second']:>10} tok/s  (warm-up {result['warmup_seconds']}s)")
+        report[name]["speedup"] = round(
+            report[name]["compiled"]["tokens_per_second"] / report[name]["eager"]["tokens_per_second"], 2
+        )
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output}")
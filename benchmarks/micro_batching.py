@@ -0,0 +1,92 @@
+"""
+Throughput of single-item model calls from concurrent clients, direct vs
+through the micro-batching queue (models/batching_server.py).
+
+Each client thread stands for one job issuing single-sentence requests back to
+back. In direct mode the calls contend for the model one by one; through the
+batcher they are gathered into shared forward passes.
+
+The stub model costs a fixed overhead per call plus a small cost per item,
+like a batched forward pass; --model emotion uses the real text emotion model.
+
+Usage:
+    python -m benchmarks.micro_batching --clients 1 4 16 --requests 50
+    python -m benchmarks.micro_batching --model emotion --clients 1 8
+"""
+import json
+import time
+import argparse
+import threading
+from models.batching_server import MicroBatcher
+
+SAMPLE_SENTENCES = [
+    "Please send me the report before the meeting tomorrow.",
+    "The train was delayed by two hours because of the storm.",
+    "I can't believe we finally won the championship!",
+    "We will announce the results at the end of the week.",
+]
+
+
+def stub_model(call_ms=20.0, item_ms=0.5):
+    def run(texts):
+        time.sleep((call_ms + item_ms * len(texts)) / 1000.0)
+        return [len(text) for text in texts]
+    return run
+
+
+def emotion_model():
+    from transformers import pipeline
+    classifier = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", top_k=5)
+    return lambda texts: classifier(texts, batch_size=len(texts), truncation=True)
+
+
+def _run_clients(call, clients, requests):
+    def client(index):
+        for i in range(requests):
+            call(SAMPLE_SENTENCES[(index + i) % len(SAMPLE_SENTENCES)])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench(model, clients, requests, max_batch_size, max_wait_ms):
+    lock = threading.Lock()
+
+    def direct(text):
+        with lock:  # one model instance, one forward pass at a time
+            return model([text])[0]
+
+    batcher = MicroBatcher("bench", lambda _, texts: model(texts), max_batch_size=max_batch_size,
+                           max_wait_ms=max_wait_ms)
+
+    total = clients * requests
+    direct_seconds = _run_clients(direct, clients, requests)
+    batched_seconds = _run_clients(batcher.run, clients, requests)
+    return {
+        "clients": clients,
+        "requests": total,
+        "direct_rps": round(total / direct_seconds, 1),
+        "batched_rps": round(total / batched_seconds, 1),
+        "speedup": round(direct_seconds / batched_seconds, 2),
+        "mean_batch": round(batcher.stats["requests"] / max(batcher.stats["batches"], 1), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Direct vs micro-batched single-item model calls.")
+    parser.add_argument("--model", choices=("stub", "emotion"), default="stub")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = stub_model() if args.model == "stub" else emotion_model()
+    model(SAMPLE_SENTENCES)  # warm-up
+    report = [bench(model, clients, args.requests, args.max_batch_size, args.max_wait_ms) for clients in args.clients]
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,489 @@
+"""
+Reproducible per-stage benchmark of complete_pipeline on synthetic fixtures.
+
+The fixture is a generated two-speaker recording (harmonic voices with syllable
+modulation, separated by pauses) muxed into a small video, so every run sees the
+same input. Each stage runs in its own spawned process, which gives a clean
+peak-RSS reading and makes model load time visible as its own number.
+
+Modes:
+    stub  model calls are replaced by deterministic fakes (ground-truth turns,
+          echoed text, tones of the right length). Everything else - segment
+          normalization, the timeline, slicing, duration probes, speed
+          adjustment and sub-turn placement (modules/generation/segment_timeline.py)
+          and progressive mixing - is the pipeline's own code, so this mode
+          measures framework overhead.
+    real  the actual models, loaded from the local cache only (HF offline mode).
+
+Usage:
+    python -m benchmarks.pipeline_stages --mode stub --duration 120
+    python -m benchmarks.pipeline_stages --mode real --output logs/pipeline_stages_real.json
+    python -m benchmarks.pipeline_stages --compare logs/pipeline_stages_stub.json logs/new.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+
+STAGES = (
+    "extraction", "denoise", "diarization", "asr", "text_analysis",
+    "translation", "alignment", "tts", "mixing"
+)
+MODES = ("stub", "real")
+
+FIXTURE_SR = 16000
+FIXTURE_F0 = (120.0, 210.0)  # one fundamental per synthetic speaker
+TARGET_LANGUAGE = "hi"
+
+SAMPLE_SENTENCES = [
+    "Please send me the report before the meeting tomorrow.",
+    "The train was delayed by two hours because of the storm.",
+    "I can't believe we finally won the championship!",
+    "We will announce the results at the end of the week.",
+    "She was afraid to walk home alone in the dark.",
+    "Thank you so much for helping me with the move.",
+]
+
+
+# --- Fixtures ---
+
+def _synthetic_voice(duration, sr, f0, rng):
+    t = np.arange(int(duration * sr)) / sr
+    pitch = f0 * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.3, 0.8) * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voice = sum(np.sin(k * phase) / (1 + abs(k * f0 - 700) / 700) for k in range(1, 20))
+    syllables = (0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3.5, 5.0) * t)) ** 2
+    return (0.04 * voice * syllables).astype(np.float32)
+
+
+def make_fixtures(out_dir, duration=60.0, sr=FIXTURE_SR, seed=0):
+    """
+    Writes fixture.wav, fixture.mp4 and truth.json (speaker turns with text).
+
+    Returns:
+        dict: Paths and duration of the fixture.
+    """
+    from moviepy import AudioFileClip, ColorClip
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    audio = (0.002 * rng.standard_normal(int(duration * sr))).astype(np.float32)
+
+    turns, t, i = [], 0.5, 0
+    while t < duration - 1.5:
+        end = min(t + rng.uniform(2.0, 5.0), duration - 0.5)
+        speaker = i % len(FIXTURE_F0)
+        audio[int(t * sr):int(t * sr) + int((end - t) * sr)] += _synthetic_voice(end - t, sr, FIXTURE_F0[speaker], rng)
+        turns.append({
+            "speaker": f"SPEAKER_{speaker:02d}",
+            "start": round(t, 3),
+            "end": round(end, 3),
+            "text": SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]
+        })
+        t, i = end + rng.uniform(0.4, 1.2), i + 1
+
+    audio_path = os.path.join(out_dir, "fixture.wav")
+    video_path = os.path.join(out_dir, "fixture.mp4")
+    truth_path = os.path.join(out_dir, "truth.json")
+    sf.write(audio_path, audio, sr)
+
+    clip = ColorClip((320, 240), color=(30, 30, 30), duration=duration).with_audio(AudioFileClip(audio_path))
+    clip.write_videofile(video_path, fps=5, codec="libx264", audio_codec="aac", logger=None)
+
+    with open(truth_path, "w") as f:
+        json.dump(turns, f, indent=2)
+
+    print(f"✅ Fixtures written to {out_dir} ({duration:.0f}s, {len(turns)} turns)")
+    return {"video": video_path, "audio": audio_path, "truth": truth_path, "duration": duration}
+
+
+# --- Helpers shared by both modes ---
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(obj, ctx, name):
+    path = os.path.join(ctx["work_dir"], name)
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+    return path
+
+
+def _truth_text(truth, start, end):
+    best = max(truth, key=lambda turn: min(end, turn["end"]) - max(start, turn["start"]))
+    return best["text"]
+
+
+def _write_tone(path, duration, sr=44100):
+    t = np.arange(int(duration * sr)) / sr
+    sf.write(path, (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), sr)
+
+
+# --- Stages: load(mode) -> handle, run(handle, mode, ctx) -> (ctx updates, item count) ---
+
+def load_extraction(mode):
+    from modules.preprocessing.audio_extractor import extract_audio
+    return extract_audio
+
+
+def run_extraction(extract_audio, mode, ctx):
+    path = extract_audio(ctx["video"], audio_path=os.path.join(ctx["work_dir"], "audio.wav"))
+    return {"extracted": path}, 1
+
+
+def load_denoise(mode):
+    from modules.preprocessing.noise_reducer import clean_audio
+    return clean_audio
+
+
+def run_denoise(clean_audio, mode, ctx):
+    path = clean_audio(ctx["extracted"], output_path=os.path.join(ctx["work_dir"], "cleaned_audio.wav"))
+    return {"cleaned": path}, 1
+
+
+def load_diarization(mode):
+    if mode == "stub":
+        return None
+    from modules.audio_analysis.diarization import diarize_and_extract_speakers
+    return diarize_and_extract_speakers
+
+
+def run_diarization(diarize, mode, ctx):
+    if mode == "real":
+        speaker_data = diarize(ctx["cleaned"], output_dir=os.path.join(ctx["work_dir"], "speakers"))
+    else:
+        truth = _load_json(ctx["truth"])
+        speaker_data = {}
+        for turn in truth:
+            speaker_data.setdefault(f"speaker_{turn['speaker']}", {"segments": []})["segments"].append(
+                {"start": turn["start"], "end": turn["end"], "silences": []}
+            )
+        ends = [0.0] + [turn["end"] for turn in truth]
+        starts = [turn["start"] for turn in truth] + [ctx["duration"]]
+        speaker_data["pause_segments"] = [
+            {"start": end, "end": start} for end, start in zip(ends, starts) if start - end >= 0.3
+        ]
+    turns = sum(len(data["segments"]) for speaker_id, data in speaker_data.items() if speaker_id != "pause_segments")
+
+    # Same normalization as complete_pipeline, before the per-segment stages
+    from modules.audio_analysis.segment_normalizer import normalize_segments
+    speaker_data = normalize_segments(speaker_data)
+    return {"speaker_data": _save_json(speaker_data, ctx, "speaker_data.json")}, turns
+
+
+def load_asr(mode):
+    if mode == "stub":
+        return None
+    from modules.text_analysis.asr_transcriber import load_asr_model, transcribe_audio
+    load_asr_model()
+    return transcribe_audio
+
+
+def run_asr(transcribe_audio, mode, ctx):
+    from pydub import AudioSegment
+    from modules.generation.segment_timeline import build_timeline, segment_sub_turns
+
+    speaker_data = _load_json(ctx["speaker_data"])
+    truth = _load_json(ctx["truth"])
+    segment_dir = os.path.join(ctx["work_dir"], "temp_segments")
+    os.makedirs(segment_dir, exist_ok=True)
+
+    # Segments in timeline order, sliced as in iter_dubbed_segments
+    sub_turns = segment_sub_turns(speaker_data)
+    base_audio = AudioSegment.from_wav(ctx["cleaned"])
+    segments = []
+    for start_ms, end_ms, key, speaker_id in build_timeline(speaker_data):
+        if speaker_id is None:
+            continue
+        segment_path = os.path.join(segment_dir, f"{key}.wav")
+        base_audio[start_ms:end_ms].export(segment_path, format="wav")
+
+        if mode == "real":
+            source_text, _ = transcribe_audio(segment_path)
+        else:
+            source_text = _truth_text(truth, start_ms / 1000.0, end_ms / 1000.0)
+        segments.append({"key": key, "speaker": speaker_id, "start_ms": start_ms, "end_ms": end_ms,
+                         "sub_turns": sub_turns.get(key), "path": segment_path, "source_text": source_text})
+    return {"segments": _save_json(segments, ctx, "segments_asr.json")}, len(segments)
+
+
+def load_text_analysis(mode):
+    if mode == "stub":
+        return None, None
+    from modules.text_analysis.phrase_swapping import process_text
+    from modules.text_analysis.text_sentiment_analysis import UnifiedTextAnalysis
+    # The google backend only builds a client, so NLLB load time stays in the translation stage
+    return process_text, UnifiedTextAnalysis(translation_backend="google")
+
+
+def run_text_analysis(handle, mode, ctx):
+    process_text, analyzer = handle
+    segments = _load_json(ctx["segments"])
+    for seg in segments:
+        if mode == "real":
+            # Phrase swapping calls the Gemini API, so it only runs in real mode
+            text = seg["swapped_text"] = process_text(seg["source_text"])
+            emotions = analyzer.get_emotions(text)
+            seg["sentiment"] = analyzer.get_sentiment(text)
+            seg["emotion"] = max(emotions, key=lambda x: x["score"])["label"] if emotions else "neutral"
+            analyzer.extract_rake_keywords(text)
+            analyzer.extract_keybert_keywords(text)
+            analyzer.get_entities(text)
+            analyzer.get_dependency_parse(text)
+            analyzer.get_readability(text)
+        else:
+            seg["swapped_text"], seg["sentiment"], seg["emotion"] = seg["source_text"], "Neutral", "neutral"
+    return {"segments": _save_json(segments, ctx, "segments_text.json")}, len(segments)
+
+
+def load_translation(mode):
+    if mode == "stub":
+        return None
+    from modules.text_analysis.text_sentiment_analysis import UnifiedTextAnalysis
+    return UnifiedTextAnalysis(translation_backend="nllb")
+
+
+def run_translation(analyzer, mode, ctx):
+    segments = _load_json(ctx["segments"])
+    for seg in segments:
+        if mode == "real":
+            seg["translated_text"] = asyncio.run(
+                analyzer.translate_text(seg["swapped_text"], source_lang="en", target_lang=ctx["target_language"])
+            )
+        else:
+            seg["translated_text"] = seg["swapped_text"]
+    return {"segments": _save_json(segments, ctx, "segments_translated.json")}, len(segments)
+
+
+def load_alignment(mode):
+    if mode == "stub":
+        return None
+    from modules.generation.aligner import align_sentences
+    return align_sentences
+
+
+def run_alignment(align_sentences, mode, ctx):
+    segments = _load_json(ctx["segments"])
+    for seg in segments:
+        words = seg["source_text"].split()
+        if mode == "real":
+            seg["alignment"] = align_sentences(words, seg["translated_text"])
+        else:
+            seg["alignment"] = {"alignments": [
+                {"source": src, "target": tgt} for src, tgt in zip(words, seg["translated_text"].split())
+            ]}
+    return {"segments": _save_json(segments, ctx, "segments_aligned.json")}, len(segments)
+
+
+def load_tts(mode):
+    if mode == "stub":
+        return None
+    from modules.generation.speech_synthesizer import generate_tts_audio
+    return generate_tts_audio
+
+
+def run_tts(generate_tts_audio, mode, ctx):
+    from modules.generation.segment_timeline import speech_duration, fit_dubbed_segment
+
+    segments = _load_json(ctx["segments"])
+    for seg in segments:
+        duration = speech_duration(seg["start_ms"], seg["end_ms"], seg["sub_turns"])
+        output_path = os.path.join(os.path.dirname(seg["path"]), f"processed_{seg['key']}.wav")
+        if mode == "real":
+            generate_tts_audio(seg["translated_text"], duration, seg["sentiment"], seg["emotion"],
+                               ctx["target_language"], "Male", output_path)
+        else:
+            # Synthesized speech usually overshoots the slot a little
+            _write_tone(output_path, duration * 1.1)
+
+        # The rest of synthesize_segment: speed adjustment, sub-turn placement, subtitles
+        seg["subtitles"] = fit_dubbed_segment(output_path, seg["translated_text"], seg["start_ms"], seg["end_ms"],
+                                              seg["sub_turns"])
+        seg["output_path"] = output_path
+    return {"segments": _save_json(segments, ctx, "segments_tts.json")}, len(segments)
+
+
+def load_mixing(mode):
+    return None
+
+
+def run_mixing(_, mode, ctx):
+    from modules.generation.segment_timeline import build_timeline
+    from modules.generation.progressive_output import ProgressiveOutput
+
+    segments = {seg["key"]: seg for seg in _load_json(ctx["segments"])}
+    timeline = build_timeline(_load_json(ctx["speaker_data"]))
+
+    # Same progressive assembly as complete_pipeline (WAV and SRT, no HLS)
+    final_path = os.path.join(ctx["work_dir"], "final_audio_file.wav")
+    output = ProgressiveOutput([(start_ms, end_ms, key) for start_ms, end_ms, key, _ in timeline],
+                               os.path.join(ctx["work_dir"], "stream"), final_path,
+                               os.path.join(ctx["work_dir"], "final_audio_file.srt"))
+    for _, _, key, speaker_id in timeline:
+        if speaker_id is None:
+            output.add(key)
+        else:
+            output.add(key, segments[key]["output_path"], segments[key]["subtitles"])
+    output.close()
+    return {"final_audio": final_path}, len(timeline)
+
+
+# --- Runner ---
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _stage_worker(name, mode, ctx):
+    if mode == "real":
+        # Only locally cached weights; a missing model fails the stage instead of downloading
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    module = sys.modules[__name__]
+    load, run = getattr(module, f"load_{name}"), getattr(module, f"run_{name}")
+
+    rss_start = _peak_rss_mb()
+    start = time.perf_counter()
+    handle = load(mode)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    updates, items = run(handle, mode, ctx)
+    wall_seconds = time.perf_counter() - start
+
+    metrics = {
+        "load_seconds": round(load_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "rtf": round(wall_seconds / ctx["duration"], 4),
+        "items": items,
+        "seconds_per_item": round(wall_seconds / items, 4) if items else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "baseline_rss_mb": round(rss_start, 1),
+    }
+    return metrics, updates
+
+
+def run_benchmark(mode="stub", duration=60.0, stages=STAGES, work_dir="output/benchmark",
+                  target_language=TARGET_LANGUAGE, seed=0):
+    """
+    Generates fixtures and runs the stages in order, each in a fresh process.
+
+    Returns:
+        dict: Run metadata plus per-stage metrics.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose from {MODES}.")
+
+    fixtures = make_fixtures(os.path.join(work_dir, "fixtures"), duration=duration, seed=seed)
+    ctx = {**fixtures, "work_dir": work_dir, "target_language": target_language}
+    report = {
+        "mode": mode,
+        "duration_seconds": duration,
+        "seed": seed,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": {},
+    }
+
+    spawn = multiprocessing.get_context("spawn")
+    for name in STAGES:
+        if name not in stages:
+            continue
+        print(f"[INFO] Stage {name} ({mode})")
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            try:
+                metrics, updates = pool.submit(_stage_worker, name, mode, ctx).result()
+            except Exception as e:
+                print(f"❌ Stage {name} failed: {e}")
+                report["stages"][name] = {"error": str(e)}
+                break
+        ctx.update(updates)
+        report["stages"][name] = metrics
+
+    completed = [m for m in report["stages"].values() if "error" not in m]
+    report["total"] = {
+        "load_seconds": round(sum(m["load_seconds"] for m in completed), 3),
+        "wall_seconds": round(sum(m["wall_seconds"] for m in completed), 3),
+        "rtf": round(sum(m["wall_seconds"] for m in completed) / duration, 4),
+        "peak_rss_mb": max((m["peak_rss_mb"] for m in completed), default=0.0),
+    }
+    return report
+
+
+def print_report(report):
+    print(f"{'stage':<15}{'load s':>9}{'wall s':>10}{'rtf':>9}{'items':>7}{'peak MB':>10}")
+    for name, row in report["stages"].items():
+        if "error" in row:
+            print(f"{name:<15}  error: {row['error']}")
+            continue
+        print(f"{name:<15}{row['load_seconds']:>9}{row['wall_seconds']:>10}{row['rtf']:>9}"
+              f"{row['items']:>7}{row['peak_rss_mb']:>10}")
+    total = report["total"]
+    print(f"{'total':<15}{total['load_seconds']:>9}{total['wall_seconds']:>10}{total['rtf']:>9}"
+          f"{'':>7}{total['peak_rss_mb']:>10}")
+
+
+def compare_reports(base, new):
+    """
+    Per-stage wall-time and peak-RSS deltas of `new` relative to `base`.
+    """
+    rows = {}
+    for name in STAGES:
+        a, b = base["stages"].get(name), new["stages"].get(name)
+        if not a or not b or "error" in a or "error" in b:
+            continue
+        rows[name] = {
+            "wall_seconds": (a["wall_seconds"], b["wall_seconds"]),
+            "wall_change_pct": round(100 * (b["wall_seconds"] - a["wall_seconds"]) / max(a["wall_seconds"], 1e-9), 1),
+            "load_seconds": (a["load_seconds"], b["load_seconds"]),
+            "peak_rss_mb": (a["peak_rss_mb"], b["peak_rss_mb"]),
+        }
+
+    print(f"{'stage':<15}{'base s':>9}{'new s':>9}{'change':>9}{'base MB':>10}{'new MB':>9}")
+    for name, row in rows.items():
+        print(f"{name:<15}{row['wall_seconds'][0]:>9}{row['wall_seconds'][1]:>9}{row['wall_change_pct']:>8}%"
+              f"{row['peak_rss_mb'][0]:>10}{row['peak_rss_mb'][1]:>9}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the dubbing pipeline on synthetic fixtures.")
+    parser.add_argument("--mode", default="stub", choices=MODES)
+    parser.add_argument("--duration", type=float, default=60.0, help="Fixture length in seconds.")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES,
+                        help="Subset to run; each stage reads the outputs of the stages before it.")
+    parser.add_argument("--work-dir", default="output/benchmark")
+    parser.add_argument("--target-language", default=TARGET_LANGUAGE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON report path (default: logs/pipeline_stages_<mode>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two saved reports.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(_load_json(args.compare[0]), _load_json(args.compare[1]))
+        sys.exit(0)
+
+    result = run_benchmark(args.mode, args.duration, args.stages, args.work_dir, args.target_language, args.seed)
+    print_report(result)
+
+    output = args.output or f"logs/pipeline_stages_{args.mode}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Report saved to {output}")
@@ -1,8 +1,8 @@
 from simalign import SentenceAligner
-from sentence_transformers import SentenceTransformer
+from models.inference_backends import get_backend, load_sentence_transformer
 
 # Load Simalign aligner with XLM-Roberta
 aligner = SentenceAligner(model="xlm-roberta-base", token_type="bpe")
 
-# Load SentenceTransformer model
-embed_model = SentenceTransformer("sentence-transformers/LaBSE")
+# Load SentenceTransformer model on the configured backend (fp32 / int8 / onnx)
+embed_model = load_sentence_transformer("sentence-transformers/LaBSE", get_backend("labse"))
@@ -0,0 +1,132 @@
+import os
+import time
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+# Dynamic micro-batching for models shared by concurrent jobs of one process
+MICRO_BATCHING = os.getenv("SUBHASHIT_MICRO_BATCHING", "1") == "1"
+MAX_BATCH_SIZE = int(os.getenv("SUBHASHIT_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("SUBHASHIT_MAX_BATCH_WAIT_MS", "5"))
+
+_batchers = {}
+_model_locks = {}
+_registry_lock = threading.Lock()
+
+
+class MicroBatcher:
+    """
+    Request queue in front of one model.
+
+    Callers from any thread submit single items and get a Future back. A worker
+    thread takes the first waiting request, keeps collecting for up to
+    max_wait_ms or until max_batch_size items are queued, then runs one batched
+    call per group key (e.g. one NLLB generate per language pair) and resolves
+    every caller's future. Under concurrent load the number of forward passes
+    grows with the number of batches, not with the number of requests.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        """
+        Args:
+            name (str): Model name, used in logs and stats.
+            batch_fn (callable): batch_fn(key, items) -> list of results aligned with items.
+            max_batch_size (int): Items per batched call.
+            max_wait_ms (float): How long the first request of a batch waits for company.
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item, key=None):
+        """
+        Queues one item; returns a concurrent.futures.Future with its result.
+        Await it from async code with asyncio.wrap_future.
+        """
+        future = Future()
+        self._queue.put((key, item, future))
+        return future
+
+    def run(self, item, key=None):
+        """
+        Blocking single-item call through the batcher.
+        """
+        return self.submit(item, key).result()
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(requests) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                requests.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return requests
+
+    def _run(self):
+        while True:
+            groups = defaultdict(list)
+            for key, item, future in self._collect():
+                if future.set_running_or_notify_cancel():
+                    groups[key].append((item, future))
+
+            for key, entries in groups.items():
+                try:
+                    results = self.batch_fn(key, [item for item, _ in entries])
+                    if len(results) != len(entries):
+                        raise RuntimeError(f"{self.name}: batch returned {len(results)} results for {len(entries)} items")
+                except Exception as e:
+                    for _, future in entries:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(entries, results):
+                    future.set_result(result)
+
+                self.stats["requests"] += len(entries)
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(entries))
+
+
+def get_batcher(name, batch_fn, **kwargs):
+    """
+    Process-wide batcher for a model, created on first use.
+    """
+    with _registry_lock:
+        if name not in _batchers:
+            _batchers[name] = MicroBatcher(name, batch_fn, **kwargs)
+            print(f"[INFO] Micro-batching {name} (max batch {_batchers[name].max_batch_size}, "
+                  f"wait {_batchers[name].max_wait * 1000:.0f} ms)")
+        return _batchers[name]
+
+
+def model_lock(name):
+    """
+    Process-wide lock of a model, created on first use.
+
+    Models loaded once per process are shared by every job thread and by the
+    batcher threads; generate/transcribe calls and tokenizer state (e.g. the
+    NLLB src_lang) are not safe to use from two threads at once, so each call
+    holds the model's lock.
+    """
+    with _registry_lock:
+        return _model_locks.setdefault(name, threading.RLock())
+
+
+def batching_stats():
+    """
+    Requests, batches and mean batch size per model.
+    """
+    return {
+        name: dict(batcher.stats, mean_batch=round(batcher.stats["requests"] / max(batcher.stats["batches"], 1), 2))
+        for name, batcher in _batchers.items()
+    }
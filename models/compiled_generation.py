@@ -0,0 +1,61 @@
+import os
+import torch
+
+# Opt-in: SUBHASHIT_COMPILED_GENERATION=1 enables static-cache, compiled decoding
+COMPILED_GENERATION = os.getenv("SUBHASHIT_COMPILED_GENERATION", "0") == "1"
+
+# Inputs are padded up to one of these lengths so compiled graphs are reused
+INPUT_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+
+def compile_mode():
+    # CUDA graphs only help on GPU; on CPU plain inductor kernels are used
+    return "reduce-overhead" if torch.cuda.is_available() else "default"
+
+
+def bucket_length(length, buckets=INPUT_BUCKETS):
+    """
+    Smallest bucket >= length; beyond the largest bucket, round up to a multiple of it.
+    """
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return -(-length // buckets[-1]) * buckets[-1]
+
+
+def tokenize_bucketed(tokenizer, texts, buckets=INPUT_BUCKETS, **kwargs):
+    """
+    Tokenizes and right-pads to a bucket length, so a compiled encoder sees
+    only a handful of distinct input shapes.
+    """
+    lengths = tokenizer(texts, add_special_tokens=True)["input_ids"]
+    if isinstance(texts, str):
+        lengths = [lengths]
+    max_length = bucket_length(max(len(ids) for ids in lengths), buckets)
+    return tokenizer(texts, return_tensors="pt", padding="max_length", max_length=max_length,
+                     truncation=True, **kwargs)
+
+
+def enable_compiled_generation(model):
+    """
+    Switches a Hugging Face generator to preallocated static KV caches and
+    compiles its forward pass. Models without static cache support keep the
+    dynamic cache and only get the compiled forward.
+    """
+    if getattr(model, "_supports_static_cache", False):
+        model.generation_config.cache_implementation = "static"
+    else:
+        print(f"[INFO] {type(model).__name__} has no static cache support, compiling with dynamic cache.")
+    model.forward = torch.compile(model.forward, mode=compile_mode())
+    return model
+
+
+def compile_whisper(model):
+    """
+    openai-whisper keeps its own hook-based KV cache, so there is no static cache
+    to switch to. The encoder always sees a fixed 30 s mel window and compiles to
+    a single graph; the decoder is compiled with dynamic shapes.
+    """
+    model.encoder = torch.compile(model.encoder, mode=compile_mode())
+    model.decoder.forward = torch.compile(model.decoder.forward, dynamic=True)
+    return model
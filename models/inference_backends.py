@@ -0,0 +1,94 @@
+import os
+import torch
+from transformers import (
+    AutoModelForSeq2SeqLM,
+    AutoModelForSequenceClassification,
+    AutoModelForAudioClassification
+)
+
+# fp32: eager PyTorch, int8: dynamically quantized Linear layers, onnx: exported ONNX Runtime graph
+BACKENDS = ("fp32", "int8", "onnx")
+
+# Per-model backend, overridable with SUBHASHIT_BACKEND_<MODEL> environment variables
+MODEL_BACKENDS = {
+    "nllb": os.getenv("SUBHASHIT_BACKEND_NLLB", "fp32"),
+    "text_emotion": os.getenv("SUBHASHIT_BACKEND_TEXT_EMOTION", "fp32"),
+    "speech_emotion": os.getenv("SUBHASHIT_BACKEND_SPEECH_EMOTION", "fp32"),
+    "labse": os.getenv("SUBHASHIT_BACKEND_LABSE", "fp32"),
+}
+
+# Exported ONNX graphs are cached here so the export only runs once
+ONNX_CACHE_DIR = os.getenv("SUBHASHIT_ONNX_CACHE_DIR", os.path.join("models", "onnx"))
+
+
+def get_backend(model_key, override=None):
+    """
+    Resolves the backend for a model: explicit override first, then MODEL_BACKENDS.
+    """
+    backend = (override or MODEL_BACKENDS.get(model_key, "fp32")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}' for {model_key}. Choose from {BACKENDS}.")
+    return backend
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of all Linear layers (weights int8, activations fp32).
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx(ort_class_name, model_name):
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The 'onnx' backend requires optimum: pip install optimum[onnxruntime]") from e
+
+    ort_class = getattr(ort, ort_class_name)
+    export_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        return ort_class.from_pretrained(export_dir)
+
+    print(f"[INFO] Exporting {model_name} to ONNX (one-time) -> {export_dir}")
+    model = ort_class.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def _load_torch(auto_class, model_name, backend):
+    model = auto_class.from_pretrained(model_name)
+    model.eval()
+    if backend == "int8":
+        model = quantize_int8(model)
+    return model
+
+
+def load_seq2seq_model(model_name, backend="fp32"):
+    if backend == "onnx":
+        return _load_onnx("ORTModelForSeq2SeqLM", model_name)
+    return _load_torch(AutoModelForSeq2SeqLM, model_name, backend)
+
+
+def load_sequence_classifier(model_name, backend="fp32"):
+    if backend == "onnx":
+        return _load_onnx("ORTModelForSequenceClassification", model_name)
+    return _load_torch(AutoModelForSequenceClassification, model_name, backend)
+
+
+def load_audio_classifier(model_name, backend="fp32"):
+    if backend == "onnx":
+        return _load_onnx("ORTModelForAudioClassification", model_name)
+    return _load_torch(AutoModelForAudioClassification, model_name, backend)
+
+
+def load_sentence_transformer(model_name, backend="fp32"):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+
+    model = SentenceTransformer(model_name)
+    model.eval()
+    if backend == "int8":
+        model[0].auto_model = quantize_int8(model[0].auto_model)
+    return model
@@ -1,12 +1,17 @@
 from pyannote.audio import Pipeline
-from resemblyzer import VoiceEncoder, preprocess_wav
 import numpy as np
 import torch
 import os
+import librosa
+import soundfile as sf
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
-from pydub import AudioSegment
-import json
-from modules.audio_analysis.extract_pauses import pause_identification
+from modules.audio_analysis.extract_pauses import pause_identification, detect_silent_regions
+from modules.audio_analysis.speaker_embedding import embed_batch, MODEL_ID, SAME_SPEAKER_DISTANCE
+from modules.audio_analysis.speaker_linking import link_speakers
+from utils.tracing import span
+from utils.artifact_store import save_artifact, load_artifact
 
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
@@ -19,18 +24,28 @@ except Exception as e:
     print(f"Failed to load pyannote pipeline: {e}")
     pipeline = None
 
-encoder = VoiceEncoder()
 SAMPLING_RATE = 16000
 
+# Long recordings are diarized in overlapping windows (seconds)
+CHUNK_DURATION = 600.0
+CHUNK_OVERLAP = 30.0
+# Max cosine distance between two local speakers to be linked as the same person
+SPEAKER_LINK_THRESHOLD = SAME_SPEAKER_DISTANCE
+
 # -------------------------
 # Speaker Diarization
 # -------------------------
-def speaker_diarization(audio_path, output_dir):
+def speaker_diarization(audio_path, output_dir, audio=None):
     """
     Perform speaker diarization and return structured speaker data.
+    When the decoded 16 kHz waveform is passed as `audio`, the file is not read again.
     """
-    diarization = pipeline(audio_path)
-    audio = preprocess_wav(audio_path)
+    if audio is None:
+        audio, _ = librosa.load(audio_path, sr=SAMPLING_RATE, mono=True)
+    diarization = pipeline({
+        "waveform": torch.from_numpy(audio).float().unsqueeze(0),
+        "sample_rate": SAMPLING_RATE
+    })
     audio_duration = len(audio) / SAMPLING_RATE
 
     segments_by_speaker = defaultdict(list)
@@ -45,23 +60,184 @@ def speaker_diarization(audio_path, output_dir):
 
     all_segments.sort()
 
-    speaker_data = {}
-    for speaker, segments in segments_by_speaker.items():
-        speaker_audio = np.concatenate(segments)
-        embedding = encoder.embed_utterance(speaker_audio)
+    # Every speaker embedded in one batch from the decoded waveform
+    speakers = list(segments_by_speaker)
+    speaker_audios = [np.concatenate(segments_by_speaker[speaker]) for speaker in speakers]
+    embeddings = embed_batch(speaker_audios, sr=SAMPLING_RATE)
 
+    speaker_data = {}
+    for speaker, speaker_audio, embedding in zip(speakers, speaker_audios, embeddings):
         speaker_id = f"speaker_{speaker}"
         file_path = os.path.join(output_dir, f"{speaker_id}.wav")
-        AudioSegment(
-            speaker_audio.tobytes(),
-            frame_rate=SAMPLING_RATE,
-            sample_width=2,
-            channels=1
-        ).export(file_path, format="wav")
+        sf.write(file_path, speaker_audio, SAMPLING_RATE)
 
         speaker_data[speaker_id] = {
             "segments": speaker_segments[speaker],
             "embedding": embedding.tolist(),
+            "embedding_model": MODEL_ID,
+            "duration": round(len(speaker_audio) / SAMPLING_RATE, 2)
+        }
+
+    return speaker_data, all_segments, audio_duration
+
+
+# -------------------------
+# Chunked Diarization (long recordings)
+# -------------------------
+def plan_chunks(audio_duration, chunk_duration=CHUNK_DURATION, overlap=CHUNK_OVERLAP):
+    """
+    Splits the timeline into overlapping windows.
+
+    Each window owns a "core" region: turns whose midpoint falls inside it are kept
+    from that window only, so overlapping parts are not counted twice.
+
+    Returns:
+        List[tuple]: (start, end, core_start, core_end) in seconds.
+    """
+    step = chunk_duration - overlap
+    if step <= 0:
+        raise ValueError("chunk_duration must be larger than overlap.")
+
+    starts = np.arange(0.0, max(audio_duration - overlap, 0.0), step)
+    if len(starts) == 0:
+        starts = np.array([0.0])
+
+    chunks = []
+    for i, start in enumerate(starts):
+        end = min(start + chunk_duration, audio_duration)
+        core_start = 0.0 if i == 0 else start + overlap / 2
+        core_end = audio_duration if i == len(starts) - 1 else start + step + overlap / 2
+        chunks.append((float(start), float(end), float(core_start), float(core_end)))
+    return chunks
+
+
+def _diarize_chunk(task):
+    """
+    Diarizes one window and embeds each of its local speakers.
+    Runs in a worker process when num_workers > 1.
+    """
+    chunk_index, waveform, (start, end, core_start, core_end) = task
+
+    diarization = pipeline({
+        "waveform": torch.from_numpy(waveform).float().unsqueeze(0),
+        "sample_rate": SAMPLING_RATE
+    })
+
+    turns = []
+    local_audio = defaultdict(list)
+    for turn, _, label in diarization.itertracks(yield_label=True):
+        seg_start, seg_end = start + turn.start, start + turn.end
+        midpoint = (seg_start + seg_end) / 2
+        if not core_start <= midpoint < core_end:
+            continue
+        turns.append((round(seg_start, 2), round(seg_end, 2), label))
+        local_audio[label].append(waveform[int(turn.start * SAMPLING_RATE):int(turn.end * SAMPLING_RATE)])
+
+    labels = [label for label, pieces in local_audio.items() if sum(len(piece) for piece in pieces) > 0]
+    speaker_audios = [np.concatenate(local_audio[label]) for label in labels]
+    embeddings = embed_batch(speaker_audios, sr=SAMPLING_RATE) if labels else []
+
+    speakers = {}
+    for label, speaker_audio, embedding in zip(labels, speaker_audios, embeddings):
+        speakers[label] = {
+            "embedding": embedding,
+            "duration": len(speaker_audio) / SAMPLING_RATE
+        }
+
+    return chunk_index, turns, speakers
+
+
+def _merge_turns(turns, max_gap=0.0):
+    """
+    Merges overlapping or touching turns of the same speaker (window seams).
+    """
+    merged = []
+    last_by_speaker = {}
+    for start, end, speaker in sorted(turns):
+        last = last_by_speaker.get(speaker)
+        if last is not None and start - merged[last][1] <= max_gap:
+            merged[last] = (merged[last][0], max(merged[last][1], end), speaker)
+            continue
+        last_by_speaker[speaker] = len(merged)
+        merged.append((start, end, speaker))
+    return sorted(merged)
+
+
+def speaker_diarization_chunked(audio_path, output_dir, chunk_duration=CHUNK_DURATION, overlap=CHUNK_OVERLAP,
+                                num_workers=1, link_threshold=SPEAKER_LINK_THRESHOLD, audio=None):
+    """
+    Chunked speaker diarization for long recordings.
+
+    Runs pyannote on overlapping windows (optionally in parallel processes) and
+    links local speaker labels across windows by clustering their embeddings.
+    Returns the same structure as speaker_diarization.
+    """
+    if audio is None:
+        audio, _ = librosa.load(audio_path, sr=SAMPLING_RATE, mono=True)
+    audio_duration = len(audio) / SAMPLING_RATE
+
+    chunks = plan_chunks(audio_duration, chunk_duration, overlap)
+    tasks = [
+        (i, audio[int(chunk[0] * SAMPLING_RATE):int(chunk[1] * SAMPLING_RATE)], chunk)
+        for i, chunk in enumerate(chunks)
+    ]
+    print(f"[INFO] Diarizing {len(chunks)} windows of {chunk_duration:.0f}s with {num_workers} worker(s)...")
+
+    if num_workers > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as pool:
+            results = list(pool.map(_diarize_chunk, tasks))
+    else:
+        results = [_diarize_chunk(task) for task in tasks]
+
+    # Link local labels across windows
+    local_speakers = [
+        (chunk_index, label, info["embedding"])
+        for chunk_index, _, speakers in results
+        for label, info in speakers.items()
+    ]
+    cluster_ids = link_speakers(local_speakers, threshold=link_threshold)
+    global_labels = {
+        (chunk_index, label): f"SPEAKER_{cluster_id:02d}"
+        for (chunk_index, label, _), cluster_id in zip(local_speakers, cluster_ids)
+    }
+
+    turns = [
+        (start, end, global_labels[(chunk_index, label)])
+        for chunk_index, chunk_turns, speakers in results
+        for start, end, label in chunk_turns
+        if (chunk_index, label) in global_labels
+    ]
+    all_segments = _merge_turns(turns)
+
+    # Duration-weighted mean of local embeddings per global speaker
+    embedding_sums = {}
+    for chunk_index, _, speakers in results:
+        for label, info in speakers.items():
+            speaker = global_labels[(chunk_index, label)]
+            weighted = np.asarray(info["embedding"]) * info["duration"]
+            embedding_sums[speaker] = embedding_sums.get(speaker, 0) + weighted
+
+    speaker_segments = defaultdict(list)
+    for start, end, speaker in all_segments:
+        speaker_segments[speaker].append({"start": start, "end": end})
+
+    speaker_data = {}
+    for speaker, segments in speaker_segments.items():
+        speaker_audio = np.concatenate([
+            audio[int(seg["start"] * SAMPLING_RATE):int(seg["end"] * SAMPLING_RATE)] for seg in segments
+        ])
+        embedding = embedding_sums[speaker]
+        embedding = embedding / (np.linalg.norm(embedding) + 1e-9)
+
+        speaker_id = f"speaker_{speaker}"
+        file_path = os.path.join(output_dir, f"{speaker_id}.wav")
+        sf.write(file_path, speaker_audio, SAMPLING_RATE)
+
+        speaker_data[speaker_id] = {
+            "segments": segments,
+            "embedding": embedding.tolist(),
+            "embedding_model": MODEL_ID,
             "duration": round(len(speaker_audio) / SAMPLING_RATE, 2)
         }
 
@@ -71,24 +247,113 @@ def speaker_diarization(audio_path, output_dir):
 # -------------------------
 # Main Function (unchanged name)
 # -------------------------
-def diarize_and_extract_speakers(audio_path, output_dir="output/speakers"):
+def diarize_and_extract_speakers(audio_path, output_dir="output/speakers", chunk_duration=CHUNK_DURATION,
+                                 overlap=CHUNK_OVERLAP, num_workers=1):
     """
     Performs speaker diarization and pause identification, saves results to output.
+    Recordings longer than one window are diarized in overlapping chunks.
+
+    The audio is decoded once; diarization, pause detection and the silent regions
+    attached to every speaker segment ('silences') all reuse the same waveform.
     """
     os.makedirs(output_dir, exist_ok=True)
 
     print(f"\n[INFO] Running diarization on: {audio_path}")
-    speaker_data, all_segments, audio_duration = speaker_diarization(audio_path, output_dir)
+    with span("diarization.decode"):
+        audio, _ = librosa.load(audio_path, sr=SAMPLING_RATE, mono=True)
+    audio_seconds = len(audio) / SAMPLING_RATE
+
+    with span("diarization.speakers", audio_seconds=audio_seconds):
+        if audio_seconds > chunk_duration + overlap:
+            speaker_data, all_segments, audio_duration = speaker_diarization_chunked(
+                audio_path, output_dir, chunk_duration=chunk_duration, overlap=overlap, num_workers=num_workers,
+                audio=audio
+            )
+        else:
+            speaker_data, all_segments, audio_duration = speaker_diarization(audio_path, output_dir, audio=audio)
 
     print("[INFO] Detecting pause segments...")
-    pause_segments = pause_identification(all_segments, audio_duration)
+    with span("diarization.pauses", audio_seconds=audio_seconds):
+        pause_segments = pause_identification(all_segments, audio, sr=SAMPLING_RATE)
+
+        # Silent stretches inside each speaker turn
+        silences = detect_silent_regions(all_segments, audio, sr=SAMPLING_RATE)
+    silences_by_turn = {
+        (f"speaker_{speaker}", start, end): turn_silences
+        for (start, end, speaker), turn_silences in zip(all_segments, silences)
+    }
+    for speaker_id, data in speaker_data.items():
+        for seg in data["segments"]:
+            seg["silences"] = silences_by_turn.get((speaker_id, seg["start"], seg["end"]), [])
+
     speaker_data["pause_segments"] = pause_segments
 
-    json_path = os.path.join(output_dir, "speaker_embeddings.json")
-    with open(json_path, "w") as f:
-        json.dump(speaker_data, f, indent=2)
+    artifact_dir = save_speaker_data(speaker_data, os.path.join(output_dir, "speaker_data"))
 
     print(f"[INFO] Processing complete. Found {len(speaker_data) - 1} speakers and {len(pause_segments)} pauses.")
-    print(f"[INFO] Speaker data saved to {json_path}")
+    print(f"[INFO] Speaker data saved to {artifact_dir}")
+
+    return speaker_data
+
+
+# -------------------------
+# Binary speaker data artifact
+# -------------------------
+def save_speaker_data(speaker_data, artifact_dir):
+    """
+    Stores diarization output as a binary artifact (utils.artifact_store):
+    embeddings as one float32 matrix, turns, silences and pauses as float64
+    time tables, and only speaker ids, durations and the model id in the manifest.
+    """
+    speakers = [speaker_id for speaker_id in speaker_data if speaker_id != "pause_segments"]
+    turns, turn_speaker, silences, silence_turn = [], [], [], []
+    for index, speaker_id in enumerate(speakers):
+        for seg in speaker_data[speaker_id]["segments"]:
+            for silence in seg.get("silences", []):
+                silences.append((silence["start"], silence["end"]))
+                silence_turn.append(len(turns))
+            turns.append((seg["start"], seg["end"]))
+            turn_speaker.append(index)
+
+    embeddings = [speaker_data[speaker_id]["embedding"] for speaker_id in speakers]
+    arrays = {
+        "embeddings": np.asarray(embeddings, dtype=np.float32) if speakers else np.zeros((0, 0), dtype=np.float32),
+        "turns": np.asarray(turns, dtype=np.float64).reshape(-1, 2),
+        "turn_speaker": np.asarray(turn_speaker, dtype=np.int32),
+        "silences": np.asarray(silences, dtype=np.float64).reshape(-1, 2),
+        "silence_turn": np.asarray(silence_turn, dtype=np.int32),
+        "pauses": np.asarray([(p["start"], p["end"]) for p in speaker_data.get("pause_segments", [])],
+                             dtype=np.float64).reshape(-1, 2),
+    }
+    meta = {
+        "speakers": speakers,
+        "durations": [speaker_data[speaker_id]["duration"] for speaker_id in speakers],
+        "embedding_models": [speaker_data[speaker_id].get("embedding_model") for speaker_id in speakers],
+    }
+    return save_artifact(artifact_dir, arrays, meta, keep_dtype=("turns", "silences", "pauses"))
+
+
+def load_speaker_data(artifact_dir):
+    """
+    Rebuilds the speaker_data dict written by save_speaker_data.
+    """
+    arrays, manifest = load_artifact(artifact_dir, mmap=False)
+    if manifest is None:
+        raise FileNotFoundError(f"No speaker data artifact in {artifact_dir}")
+
+    silences_by_turn = defaultdict(list)
+    for (start, end), turn in zip(arrays["silences"].tolist(), arrays["silence_turn"].tolist()):
+        silences_by_turn[turn].append({"start": start, "end": end})
 
+    speaker_data = {
+        speaker_id: {"segments": [], "embedding": embedding, "embedding_model": model, "duration": duration}
+        for speaker_id, embedding, model, duration in zip(
+            manifest["speakers"], arrays["embeddings"].tolist(), manifest["embedding_models"], manifest["durations"]
+        )
+    }
+    for turn, ((start, end), index) in enumerate(zip(arrays["turns"].tolist(), arrays["turn_speaker"].tolist())):
+        speaker_data[manifest["speakers"][index]]["segments"].append(
+            {"start": start, "end": end, "silences": silences_by_turn[turn]}
+        )
+    speaker_data["pause_segments"] = [{"start": start, "end": end} for start, end in arrays["pauses"].tolist()]
     return speaker_data
@@ -1,7 +1,148 @@
-from transformers import pipeline
+from functools import lru_cache
+import numpy as np
+import torch
+from transformers import pipeline, AutoFeatureExtractor
+from models.inference_backends import get_backend, load_audio_classifier
+from utils.tracing import set_cache, lru_cache_hit
 import soundfile as sf
 import librosa
 
+EMOTION_MODEL_NAME = "superb/wav2vec2-base-superb-er"
+SAMPLING_RATE = 16000
+# Long turns are classified in fixed windows to bound attention memory
+WINDOW_SECONDS = 8.0
+MIN_WINDOW_SECONDS = 1.0
+# Piece lengths for models without an attention mask: windows are cut into
+# these so that pieces from different turns can share a batch
+BUCKET_SECONDS = (8.0, 4.0, 2.0, 1.0, 0.5)
+
+
+@lru_cache(maxsize=None)
+def load_emotion_model(backend=None):
+    """
+    Loads the speech emotion model once per process and backend.
+
+    Args:
+        backend (str): 'fp32', 'int8' or 'onnx'; defaults to the configured backend.
+
+    Returns:
+        tuple: (feature_extractor, model)
+    """
+    feature_extractor = AutoFeatureExtractor.from_pretrained(EMOTION_MODEL_NAME)
+    model = load_audio_classifier(EMOTION_MODEL_NAME, get_backend("speech_emotion", backend))
+    return feature_extractor, model
+
+
+def split_into_windows(speech, window_seconds=WINDOW_SECONDS, sampling_rate=SAMPLING_RATE):
+    """
+    Splits a waveform into fixed windows. A trailing remainder shorter than
+    MIN_WINDOW_SECONDS is folded into the previous window.
+    """
+    window = int(window_seconds * sampling_rate)
+    min_window = int(MIN_WINDOW_SECONDS * sampling_rate)
+    if len(speech) <= window:
+        return [speech]
+
+    bounds = list(range(0, len(speech), window))
+    if len(speech) - bounds[-1] < min_window:
+        bounds.pop()
+    bounds.append(len(speech))
+    return [speech[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def split_into_buckets(speech, bucket_seconds=BUCKET_SECONDS, sampling_rate=SAMPLING_RATE):
+    """
+    Cuts a window into pieces of the bucket lengths, longest first. A remainder
+    shorter than the smallest bucket is dropped; a window shorter than the
+    smallest bucket is kept whole.
+    """
+    sizes = sorted((int(seconds * sampling_rate) for seconds in bucket_seconds), reverse=True)
+    if len(speech) < sizes[-1]:
+        return [speech]
+
+    pieces, position = [], 0
+    for size in sizes:
+        while len(speech) - position >= size:
+            pieces.append(speech[position:position + size])
+            position += size
+    return pieces
+
+
+def perform_emotion_analysis_batch(waveforms, sampling_rate=SAMPLING_RATE, batch_size=8,
+                                   window_seconds=WINDOW_SECONDS, top_k=5, backend=None):
+    """
+    Performs emotion analysis on many waveforms with one cached model.
+
+    Long waveforms are split into windows, all windows are run through the model
+    in batches, and the window logits of each waveform are pooled, weighted by
+    window length. Models whose feature extractor returns an attention mask get
+    padded batches (sorted by length) with the mask; the others, like
+    wav2vec2-base, must not see padding or a mask, so their windows are cut
+    into BUCKET_SECONDS pieces and only pieces of equal length share a batch.
+
+    Args:
+        waveforms (List[np.ndarray]): Mono waveforms.
+        sampling_rate (int): Sampling rate of the waveforms.
+        batch_size (int): Windows per forward pass.
+        window_seconds (float): Window length for long waveforms.
+        top_k (int): Number of labels returned per waveform.
+        backend (str): Inference backend override ('fp32', 'int8', 'onnx').
+
+    Returns:
+        List[list]: Per waveform, [{'score', 'label'}, ...] sorted by score
+        (same format as the audio-classification pipeline), or None if empty.
+    """
+    set_cache("emotion_model", lru_cache_hit(load_emotion_model))
+    feature_extractor, model = load_emotion_model(backend)
+    id2label = model.config.id2label
+    use_mask = bool(getattr(feature_extractor, "return_attention_mask", False))
+
+    windows, owners = [], []
+    for index, speech in enumerate(waveforms):
+        speech = np.asarray(speech, dtype=np.float32)
+        if sampling_rate != SAMPLING_RATE:
+            speech = librosa.resample(speech, orig_sr=sampling_rate, target_sr=SAMPLING_RATE)
+        if len(speech) == 0:
+            continue
+        for window in split_into_windows(speech, window_seconds):
+            for piece in ([window] if use_mask else split_into_buckets(window)):
+                windows.append(piece)
+                owners.append(index)
+
+    lengths = np.array([len(window) for window in windows], dtype=np.float32)
+    batches = []
+    for i in np.argsort(lengths, kind="stable"):
+        if batches and len(batches[-1]) < batch_size and (use_mask or lengths[batches[-1][0]] == lengths[i]):
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+
+    logits = np.zeros((len(windows), len(id2label)), dtype=np.float32)
+    for batch in batches:
+        inputs = feature_extractor(
+            [windows[i] for i in batch], sampling_rate=SAMPLING_RATE, padding=True, return_tensors="pt",
+            return_attention_mask=use_mask
+        )
+        with torch.inference_mode():
+            logits[batch] = model(**inputs).logits.float().numpy()
+
+    # Pool window logits per waveform, weighted by window length
+    owners = np.array(owners, dtype=int)
+    results = []
+    for index in range(len(waveforms)):
+        mask = owners == index
+        if not mask.any():
+            results.append(None)
+            continue
+        pooled = np.average(logits[mask], axis=0, weights=lengths[mask])
+        scores = np.exp(pooled - pooled.max())
+        scores /= scores.sum()
+        ranked = np.argsort(scores)[::-1][:top_k]
+        results.append([{"score": float(scores[i]), "label": id2label[int(i)]} for i in ranked])
+
+    return results
+
+
 def perform_emotion_analysis(audio_path):
     """
     Performs emotion analysis on an audio file using a pre-trained model.
@@ -14,13 +155,10 @@ def perform_emotion_analysis(audio_path):
     """
     try:
         # Load audio file
-        speech, sample_rate = librosa.load(audio_path, sr=16000)
-
-        # Initialize emotion recognition pipeline
-        emotion_recognizer = pipeline("audio-classification", model="superb/wav2vec2-base-superb-er")
+        speech, sample_rate = librosa.load(audio_path, sr=SAMPLING_RATE)
 
-        # Perform emotion recognition
-        result = emotion_recognizer(speech, top_k=5)
+        # Perform emotion recognition with the cached model
+        result = perform_emotion_analysis_batch([speech], sampling_rate=sample_rate, top_k=5)[0]
 
         print(f"\nEmotion Analysis Results for {audio_path}:")
         print(result)
@@ -1,22 +1,140 @@
-from pydub import AudioSegment
+import numpy as np
+import librosa
+from numpy.lib.stride_tricks import sliding_window_view
 
-def pause_identification(all_segments, audio_path, min_pause_len=0.3):
+SAMPLING_RATE = 16000
+FRAME_LENGTH = 0.025  # seconds
+HOP_LENGTH = 0.010  # seconds
+SILENCE_THRESHOLD_DB = -35
+
+
+def frame_energy_db(audio, sr=SAMPLING_RATE, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Computes per-frame mean-square energy in dBFS with a single strided pass.
+
+    Args:
+        audio (np.ndarray): Mono float waveform in [-1, 1].
+        sr (int): Sampling rate.
+        frame_length (float): Frame length in seconds.
+        hop_length (float): Hop length in seconds.
+
+    Returns:
+        tuple: (energy, energy_db) float32 arrays, one value per frame.
+    """
+    frame = max(int(frame_length * sr), 1)
+    hop = max(int(hop_length * sr), 1)
+
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < frame:
+        audio = np.pad(audio, (0, frame - len(audio)))
+
+    frames = sliding_window_view(audio, frame)[::hop]  # view, no copy
+    energy = np.einsum("ij,ij->i", frames, frames) / frame
+    energy_db = 10 * np.log10(np.maximum(energy, 1e-10))
+    return energy.astype(np.float32), energy_db.astype(np.float32)
+
+
+def pause_identification(all_segments, audio, sr=SAMPLING_RATE, min_pause_len=0.3,
+                         threshold_db=SILENCE_THRESHOLD_DB, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
     """
     Hybrid pause detection: diarization gaps validated with silence detection.
+
+    Frame energy is computed once and every gap is checked with cumulative sums,
+    so no per-gap slicing or re-decoding takes place.
+
+    Args:
+        all_segments (List[tuple]): Sorted (start, end, speaker) diarization turns.
+        audio (np.ndarray | str): Decoded mono waveform, or a path to decode once.
+        sr (int): Sampling rate of the waveform.
+        min_pause_len (float): Minimum gap length in seconds.
+        threshold_db (float): Gaps with mean energy below this are pauses.
+        frame_length (float): Frame length in seconds.
+        hop_length (float): Frame hop in seconds.
+
+    Returns:
+        List[dict]: Pause segments with 'start' and 'end' in seconds.
     """
-    audio = AudioSegment.from_file(audio_path)
-    pause_segments = []
-    prev_end = 0.0
-
-    for start, end, _ in all_segments:
-        gap = start - prev_end
-        if gap >= min_pause_len:
-            gap_audio = audio[int(prev_end * 1000):int(start * 1000)]
-            if gap_audio.dBFS < -35:  # energy threshold check
-                pause_segments.append({"start": round(prev_end, 2), "end": round(start, 2)})
-        prev_end = max(prev_end, end)
-
-    return pause_segments
+    if isinstance(audio, str):
+        audio, sr = librosa.load(audio, sr=sr, mono=True)
+
+    if not all_segments:
+        return []
+
+    energy, _ = frame_energy_db(audio, sr, frame_length=frame_length, hop_length=hop_length)
+    cumulative = np.concatenate(([0.0], np.cumsum(energy, dtype=np.float64)))
+
+    starts = np.array([seg[0] for seg in all_segments], dtype=np.float64)
+    ends = np.array([seg[1] for seg in all_segments], dtype=np.float64)
+    prev_ends = np.concatenate(([0.0], np.maximum.accumulate(ends)[:-1]))
+
+    candidates = (starts - prev_ends) >= min_pause_len
+    gap_starts, gap_ends = prev_ends[candidates], starts[candidates]
+
+    # Mean energy of the frames lying fully inside each gap. A gap holding no
+    # whole frame is measured by the frame nearest its center; one starting past
+    # the end of the audio is not measured and never reported as a pause.
+    first = np.clip(np.ceil(gap_starts / hop_length).astype(int), 0, len(energy))
+    last = np.clip(np.floor((gap_ends - frame_length) / hop_length).astype(int) + 1, 0, len(energy))
+    no_frames = last <= first
+    nearest = np.clip(np.round(((gap_starts + gap_ends) / 2 - frame_length / 2) / hop_length).astype(int),
+                      0, len(energy) - 1)
+    first = np.where(no_frames, nearest, first)
+    last = np.where(no_frames, nearest + 1, last)
+    measured = ~no_frames | (gap_starts < len(audio) / sr)
+    gap_db = 10 * np.log10(np.maximum((cumulative[last] - cumulative[first]) / (last - first), 1e-10))
+
+    silent = measured & (gap_db < threshold_db)
+    return [
+        {"start": round(float(start), 2), "end": round(float(end), 2)}
+        for start, end in zip(gap_starts[silent], gap_ends[silent])
+    ]
+
+
+def detect_silent_regions(all_segments, audio, sr=SAMPLING_RATE, min_silence_len=0.2,
+                          threshold_db=SILENCE_THRESHOLD_DB, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Finds silent stretches inside speaker turns, e.g. to trim them downstream.
+
+    Args:
+        all_segments (List[tuple]): (start, end, speaker) diarization turns.
+        audio (np.ndarray): Decoded mono waveform.
+        sr (int): Sampling rate of the waveform.
+        min_silence_len (float): Minimum silence length in seconds.
+        threshold_db (float): Frames below this energy are silent.
+
+    Returns:
+        List[List[dict]]: For every turn (same order as all_segments), its silent
+        regions with 'start' and 'end' in seconds.
+    """
+    if not all_segments:
+        return []
+
+    _, energy_db = frame_energy_db(audio, sr, frame_length=frame_length, hop_length=hop_length)
+
+    # Run-length encode silent frames
+    silent = np.concatenate(([0], (energy_db < threshold_db).astype(np.int8), [0]))
+    edges = np.diff(silent)
+    run_starts = np.flatnonzero(edges == 1) * hop_length
+    run_ends = (np.flatnonzero(edges == -1) - 1) * hop_length + frame_length
+
+    turn_starts = np.array([seg[0] for seg in all_segments], dtype=np.float64)
+    turn_ends = np.array([seg[1] for seg in all_segments], dtype=np.float64)
+
+    # Runs overlapping each turn, expanded into flat (turn, run) pairs
+    lo = np.searchsorted(run_ends, turn_starts, side="right")
+    hi = np.searchsorted(run_starts, turn_ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    turn_index = np.repeat(np.arange(len(all_segments)), counts)
+    run_index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+
+    starts = np.maximum(run_starts[run_index], turn_starts[turn_index])
+    ends = np.minimum(run_ends[run_index], turn_ends[turn_index])
+    keep = (ends - starts) >= min_silence_len
+
+    silences = [[] for _ in all_segments]
+    for index, start, end in zip(turn_index[keep], starts[keep], ends[keep]):
+        silences[index].append({"start": round(float(start), 2), "end": round(float(end), 2)})
+    return silences
 
 # # -------------------------
 # # Pause Identification
@@ -1,8 +1,7 @@
 import whisper
 import parselmouth
 import numpy as np
-import json
-from parselmouth.praat import call
+from utils.artifact_store import records_to_artifact
 
 # ----------------------------- Transcribe with Timestamps ----------------------------- #
 def transcribe_words_with_timestamps(wav_path):
@@ -54,22 +53,68 @@ def segment_words_by_time(words_with_timestamps, max_duration=1.5):
 
     return segments
 
-# ----------------------------- Analyze Parselmouth Features ----------------------------- #
-def analyze_parselmouth_features_segment(snd, start_time, end_time):
-    snd_segment = snd.extract_part(from_time=start_time, to_time=end_time, preserve_times=False)
-
-    pitch = snd_segment.to_pitch()
-    pitch_values = pitch.selected_array['frequency']
-    mean_pitch = np.mean(pitch_values[pitch_values > 0]) if np.any(pitch_values > 0) else 0
-
-    intensity = snd_segment.to_intensity()
-    mean_intensity = call(intensity, "Get mean", 0, 0, "energy")
+# ----------------------------- Whole-Buffer Contours ----------------------------- #
+def extract_prosody_contours(audio, sampling_rate=None):
+    """
+    Runs Praat pitch and intensity analysis once over a whole audio buffer.
+
+    Args:
+        audio (str | np.ndarray | parselmouth.Sound): WAV path, mono waveform or Sound.
+        sampling_rate (int): Required when `audio` is a waveform.
+
+    Returns:
+        dict: float32 arrays 'pitch_times', 'pitch' (Hz, 0 = unvoiced),
+        'intensity_times' and 'intensity' (dB).
+    """
+    if isinstance(audio, parselmouth.Sound):
+        snd = audio
+    elif isinstance(audio, str):
+        snd = parselmouth.Sound(audio)
+    else:
+        snd = parselmouth.Sound(np.asarray(audio, dtype=np.float64), sampling_frequency=sampling_rate)
+
+    pitch = snd.to_pitch()
+    intensity = snd.to_intensity()
 
     return {
-        "pitch": round(mean_pitch, 2),
-        "loudness": round(mean_intensity, 2)
+        "pitch_times": np.asarray(pitch.xs(), dtype=np.float32),
+        "pitch": np.asarray(pitch.selected_array['frequency'], dtype=np.float32),
+        "intensity_times": np.asarray(intensity.xs(), dtype=np.float32),
+        "intensity": np.asarray(intensity.values[0], dtype=np.float32)
     }
 
+def aggregate_contours(contours, starts, ends):
+    """
+    Per-segment mean pitch (voiced frames) and energy-averaged intensity,
+    computed for all segments at once from cumulative sums over the contours.
+
+    Returns:
+        tuple: (mean_pitch, mean_intensity, has_frames) arrays, one entry per segment.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+
+    # Pitch: mean over voiced frames, 0 when unvoiced
+    pitch = contours["pitch"].astype(np.float64)
+    voiced = pitch > 0
+    pitch_sum = np.concatenate(([0.0], np.cumsum(np.where(voiced, pitch, 0.0))))
+    voiced_count = np.concatenate(([0], np.cumsum(voiced)))
+    lo = np.searchsorted(contours["pitch_times"], starts, side="left")
+    hi = np.searchsorted(contours["pitch_times"], ends, side="right")
+    counts = voiced_count[hi] - voiced_count[lo]
+    mean_pitch = np.where(counts > 0, (pitch_sum[hi] - pitch_sum[lo]) / np.maximum(counts, 1), 0.0)
+
+    # Intensity: averaged in the energy domain, like Praat's "Get mean ... energy"
+    energy = 10 ** (contours["intensity"].astype(np.float64) / 10)
+    energy_sum = np.concatenate(([0.0], np.cumsum(energy)))
+    lo = np.searchsorted(contours["intensity_times"], starts, side="left")
+    hi = np.searchsorted(contours["intensity_times"], ends, side="right")
+    frames = hi - lo
+    mean_energy = (energy_sum[hi] - energy_sum[lo]) / np.maximum(frames, 1)
+    mean_intensity = 10 * np.log10(np.maximum(mean_energy, 1e-12))
+
+    return mean_pitch, mean_intensity, frames > 0
+
 # ----------------------------- Compute Shifts ----------------------------- #
 def compute_pitch_shift(pitch_value, base_pitch):
     if pitch_value <= 0 or base_pitch <= 0:
@@ -82,29 +127,44 @@ def compute_loudness_shift(loudness_value, base_loudness):
     return int(round(shift))
 
 # ----------------------------- Extract Segment-Level Features ----------------------------- #
-def extract_word_level_features(wav_path, max_duration=1.5):
-    snd = parselmouth.Sound(wav_path)
+def extract_word_level_features(wav_path, max_duration=1.5, contours=None, return_contours=False, artifact_dir=None):
+    """
+    Word-group pitch/loudness features. Pitch and intensity contours are computed
+    once for the whole file (or passed in) and aggregated per word group; each
+    group keeps its word timings under 'words'. With return_contours=True the
+    contours are returned as well, for per-word prosody mapping
+    (prosody_mapper.map_target_to_prosodic_features). With artifact_dir the
+    features are also stored there as a binary artifact.
+    """
+    if contours is None:
+        contours = extract_prosody_contours(wav_path)
     word_timestamps = transcribe_words_with_timestamps(wav_path)
     segments = segment_words_by_time(word_timestamps, max_duration=max_duration)
 
+    mean_pitch, mean_intensity, has_frames = aggregate_contours(
+        contours, [seg['start'] for seg in segments], [seg['end'] for seg in segments]
+    )
+
     features = []
 
-    for segment in segments:
+    for i, segment in enumerate(segments):
         start = segment['start']
         end = segment['end']
         words = [w['word'] for w in segment['words']]
         word_str = " ".join(words)
 
-        try:
-            acoustic_features = analyze_parselmouth_features_segment(snd, start, end)
-            acoustic_features.update({
-                "word": word_str,
-                "start": round(start, 2),
-                "end": round(end, 2)
-            })
-            features.append(acoustic_features)
-        except Exception as e:
-            print(f"⚠️ Error processing segment '{word_str}': {e}")
+        if not has_frames[i]:
+            # Shorter than one intensity frame; nothing to measure
+            continue
+
+        features.append({
+            "pitch": round(float(mean_pitch[i]), 2),
+            "loudness": round(float(mean_intensity[i]), 2),
+            "word": word_str,
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "words": segment['words']
+        })
 
     # Compute baselines
     pitch_vals = [f["pitch"] for f in features if f["pitch"] > 0]
@@ -116,13 +176,15 @@ def extract_word_level_features(wav_path, max_duration=1.5):
         f["pitch_shift"] = compute_pitch_shift(f["pitch"], base_pitch)
         f["loudness_shift"] = compute_loudness_shift(f["loudness"], base_loudness)
 
-    # Save to JSON
-    output_json = "output/segment_features.json"
-    import os
-    os.makedirs("output", exist_ok=True)
-    with open(output_json, "w") as f_out:
-        json.dump(features, f_out, indent=2)
+    # Save as a binary artifact (float32 columns, words in the manifest)
+    if artifact_dir:
+        records_to_artifact(
+            artifact_dir, features,
+            numeric_keys=("pitch", "loudness", "start", "end", "pitch_shift", "loudness_shift"), text_keys=("word",)
+        )
     print(features)
+    if return_contours:
+        return features, contours
     return features
 
 # ----------------------------- Example Usage ----------------------------- #
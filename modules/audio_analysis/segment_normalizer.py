@@ -0,0 +1,134 @@
+import copy
+import math
+
+TARGET_DURATION = 8.0  # seconds; merged segments stop growing here
+MAX_DURATION = 20.0  # seconds; longer turns are split
+MAX_MERGE_GAP = 0.6  # seconds between same-speaker turns that may be merged
+MIN_PIECE_DURATION = 2.0  # seconds; no split piece is shorter than this
+
+
+def _overlaps(a_start, a_end, b_start, b_end):
+    return a_start < b_end and b_start < a_end
+
+
+def merge_adjacent_turns(turns, target_duration=TARGET_DURATION, max_merge_gap=MAX_MERGE_GAP):
+    """
+    Merges consecutive turns of the same speaker (nothing from another speaker in
+    between) while the gap is short and the merged turn stays within target_duration.
+
+    Args:
+        turns (List[tuple]): (start, end, speaker_id, segment) sorted by start.
+
+    Returns:
+        List[tuple]: (start, end, speaker_id, merged_segment) with 'sub_turns' set.
+    """
+    merged = []
+    for start, end, speaker_id, seg in turns:
+        previous = merged[-1] if merged else None
+        if (previous is not None
+                and previous[2] == speaker_id
+                and 0 <= start - previous[1] <= max_merge_gap
+                and end - previous[0] <= target_duration):
+            p_start, p_end, _, p_seg = previous
+            p_seg["sub_turns"].append({"start": seg["start"], "end": seg["end"]})
+            # The gap between the two turns is a silence of the merged segment
+            gap = [{"start": p_end, "end": start}] if start > p_end else []
+            p_seg["silences"] = p_seg.get("silences", []) + gap + seg.get("silences", [])
+            p_seg["end"] = end
+            merged[-1] = (p_start, end, speaker_id, p_seg)
+        else:
+            seg = dict(seg, sub_turns=[{"start": seg["start"], "end": seg["end"]}])
+            seg["silences"] = list(seg.get("silences", []))
+            merged.append((start, end, speaker_id, seg))
+    return merged
+
+
+def split_long_segment(seg, target_duration=TARGET_DURATION, max_duration=MAX_DURATION,
+                       min_piece=MIN_PIECE_DURATION):
+    """
+    Splits a segment longer than max_duration at the midpoints of its silences,
+    preferring cut points close to target_duration. Without a usable silence the
+    remainder is cut into equal pieces of at most max_duration.
+
+    Returns:
+        List[dict]: Pieces with their own start/end, silences and sub_turns.
+    """
+    start, end = seg["start"], seg["end"]
+    if end - start <= max_duration:
+        return [seg]
+
+    candidates = sorted((s["start"] + s["end"]) / 2 for s in seg.get("silences", []))
+    cuts, cursor = [], start
+    while end - cursor > max_duration:
+        usable = [c for c in candidates if cursor + min_piece <= c <= cursor + max_duration and end - c >= min_piece]
+        if usable:
+            cut = min(usable, key=lambda c: abs(c - (cursor + target_duration)))
+        else:
+            # No usable silence: spread the rest evenly, so no piece ends up as a short stub
+            cut = cursor + (end - cursor) / math.ceil((end - cursor) / max_duration)
+        cut = round(cut, 2)
+        cuts.append(cut)
+        cursor = cut
+
+    pieces = []
+    for piece_start, piece_end in zip([start] + cuts, cuts + [end]):
+        piece = {key: value for key, value in seg.items() if key not in ("silences", "sub_turns")}
+        piece["start"], piece["end"] = piece_start, piece_end
+        piece["silences"] = [
+            {"start": max(s["start"], piece_start), "end": min(s["end"], piece_end)}
+            for s in seg.get("silences", []) if _overlaps(s["start"], s["end"], piece_start, piece_end)
+        ]
+        piece["sub_turns"] = [
+            {"start": max(t["start"], piece_start), "end": min(t["end"], piece_end)}
+            for t in seg.get("sub_turns", [{"start": start, "end": end}])
+            if _overlaps(t["start"], t["end"], piece_start, piece_end)
+        ]
+        pieces.append(piece)
+    return pieces
+
+
+def normalize_segments(speaker_data, target_duration=TARGET_DURATION, max_duration=MAX_DURATION,
+                       max_merge_gap=MAX_MERGE_GAP, min_piece=MIN_PIECE_DURATION):
+    """
+    Normalizes diarization output before the per-segment analysis.
+
+    Short same-speaker turns are merged up to target_duration, so the fixed
+    per-call cost of ASR, emotion, translation and TTS is paid fewer times, and
+    turns longer than max_duration are split at detected silences to bound model
+    input length. Every segment keeps its original diarization turns in
+    'sub_turns', over which the dubbed clip is placed (pipeline.synthesize_segment),
+    so pauses now inside a merged segment are dropped from the pause list.
+
+    Args:
+        speaker_data (dict): Output of diarize_and_extract_speakers.
+
+    Returns:
+        dict: Same structure with normalized 'segments' (the input is not modified).
+    """
+    speaker_data = copy.deepcopy(speaker_data)
+    turns = sorted(
+        (seg["start"], seg["end"], speaker_id, seg)
+        for speaker_id, data in speaker_data.items() if speaker_id != "pause_segments"
+        for seg in data["segments"]
+    )
+    before = len(turns)
+
+    merged = merge_adjacent_turns(turns, target_duration, max_merge_gap)
+
+    normalized = {speaker_id: [] for speaker_id in speaker_data if speaker_id != "pause_segments"}
+    for _, _, speaker_id, seg in merged:
+        normalized[speaker_id].extend(split_long_segment(seg, target_duration, max_duration, min_piece))
+
+    for speaker_id, segments in normalized.items():
+        speaker_data[speaker_id]["segments"] = segments
+
+    # Pauses covered by a merged segment would be mixed twice
+    spans = [(seg["start"], seg["end"]) for segments in normalized.values() for seg in segments]
+    speaker_data["pause_segments"] = [
+        pause for pause in speaker_data.get("pause_segments", [])
+        if not any(start <= pause["start"] and pause["end"] <= end for start, end in spans)
+    ]
+
+    after = sum(len(segments) for segments in normalized.values())
+    print(f"[INFO] Normalized {before} diarization turns into {after} segments")
+    return speaker_data
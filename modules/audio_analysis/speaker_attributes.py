@@ -0,0 +1,214 @@
+import os
+import json
+import numpy as np
+
+# Bundled linear classifier: P(female) = sigmoid(w . embedding + f0_weight * (log F0 - log_f0_center) + bias).
+# The shipped file has no embedding weights yet (F0 only); fit them for the configured
+# embedding model with fit_from_reference_voices and save_classifier.
+CLASSIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "speaker_attributes.json")
+GENDERS = ("Male", "Female")
+
+# Typical mean speaking F0 per gender (Hz); pitch range is judged against these
+MEDIAN_F0 = {"Male": 120.0, "Female": 210.0}
+PITCH_RANGE_RATIO = 0.12  # more than 12% away from the median is low / high
+
+_classifiers = {}
+
+
+def load_classifier(path=CLASSIFIER_PATH):
+    """
+    Loads the classifier weights once per process.
+    """
+    if path not in _classifiers:
+        with open(path, "r") as f:
+            _classifiers[path] = json.load(f)
+    return _classifiers[path]
+
+
+def speaker_mean_f0(contours_list):
+    """
+    Mean F0 over the voiced frames of a speaker's segments, from the prosody
+    contours computed for them (prosodic_feature_extractor.extract_prosody_contours).
+
+    Returns:
+        float: Mean F0 in Hz, 0.0 when nothing is voiced.
+    """
+    pitch = np.concatenate([np.asarray(contours["pitch"], dtype=np.float64) for contours in contours_list] or [[]])
+    voiced = pitch[pitch > 0]
+    return float(np.mean(voiced)) if len(voiced) else 0.0
+
+
+def _log_f0_feature(f0, classifier):
+    return np.log(f0) - classifier["log_f0_center"]
+
+
+def classify_speaker(embedding, f0, embedding_model=None, classifier=None):
+    """
+    Infers gender and pitch range of one speaker.
+
+    The embedding term is only used when the classifier has weights fitted on
+    the same embedding model; otherwise (as with the bundled F0-only weights)
+    the decision rests on F0 alone.
+
+    Args:
+        embedding (array-like): Speaker embedding from diarization, or None.
+        f0 (float): Mean F0 in Hz (0 if unknown).
+        embedding_model (str): Model id stored with the embedding.
+
+    Returns:
+        dict: gender, gender_confidence, pitch_range ('low', 'natural', 'high'), mean_f0 and
+        basis ('embedding+f0' or 'f0'), or None when neither feature is usable.
+    """
+    classifier = classifier or load_classifier()
+    weights = classifier.get("embedding_weights") or []
+    use_embedding = (embedding is not None and len(weights) == len(embedding)
+                     and embedding_model == classifier.get("embedding_model"))
+    if not use_embedding and f0 <= 0:
+        return None
+
+    logit = classifier["bias"]
+    if use_embedding:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        logit += float(np.dot(weights, embedding / (np.linalg.norm(embedding) + 1e-9)))
+    if f0 > 0:
+        logit += classifier["f0_weight"] * _log_f0_feature(f0, classifier)
+
+    p_female = 1.0 / (1.0 + np.exp(-logit))
+    gender = GENDERS[int(p_female >= 0.5)]
+
+    pitch_range = "natural"
+    if f0 > 0:
+        ratio = f0 / MEDIAN_F0[gender]
+        if ratio < 1 - PITCH_RANGE_RATIO:
+            pitch_range = "low"
+        elif ratio > 1 + PITCH_RANGE_RATIO:
+            pitch_range = "high"
+
+    return {
+        "gender": gender,
+        "gender_confidence": round(float(max(p_female, 1 - p_female)), 3),
+        "pitch_range": pitch_range,
+        "mean_f0": round(float(f0), 2),
+        "basis": "embedding+f0" if use_embedding else "f0",
+    }
+
+
+def infer_speaker_attributes(speaker_data, timeline, segment_contours):
+    """
+    Infers gender and pitch range of every diarized speaker once, before any
+    segment is dubbed, from the speaker's embedding and the mean F0 of all their
+    segments. The F0 comes from the prosody contours computed once per segment,
+    which the word-level prosody analysis reuses. Stored in
+    speaker_data[speaker_id]['attributes'].
+
+    Args:
+        timeline (List[tuple]): (start_ms, end_ms, key, speaker_id) slots.
+        segment_contours (dict): Slot key -> prosody contours.
+
+    Returns:
+        dict: speaker_data, updated in place.
+    """
+    contours_by_speaker = {}
+    for _, _, key, speaker_id in timeline:
+        if speaker_id is not None and key in segment_contours:
+            contours_by_speaker.setdefault(speaker_id, []).append(segment_contours[key])
+
+    for speaker_id, data in speaker_data.items():
+        if speaker_id == "pause_segments" or "attributes" in data:
+            continue
+        f0 = speaker_mean_f0(contours_by_speaker.get(speaker_id, []))
+        attributes = classify_speaker(data.get("embedding"), f0, embedding_model=data.get("embedding_model"))
+        data["attributes"] = attributes
+        if attributes is not None:
+            print(f"[INFO] {speaker_id}: {attributes['gender']} ({attributes['gender_confidence']:.2f}, "
+                  f"from {attributes['basis']}), {attributes['pitch_range']} pitch, {attributes['mean_f0']} Hz")
+    return speaker_data
+
+
+def speaker_attributes(speaker_data, speaker_id):
+    """
+    Gender and pitch range of a diarized speaker, as inferred by infer_speaker_attributes.
+
+    Returns:
+        dict: See classify_speaker, or None when nothing could be inferred.
+    """
+    data = speaker_data.get(speaker_id) if speaker_data else None
+    return data.get("attributes") if data else None
+
+
+def fit_classifier(embeddings, f0s, genders, embedding_model, l2=1e-2, learning_rate=0.5, epochs=2000):
+    """
+    Fits the linear classifier on labelled speakers (logistic regression).
+
+    Args:
+        embeddings (np.ndarray): (N, E) speaker embeddings from one embedding model.
+        f0s (array-like): Mean F0 per speaker in Hz.
+        genders (List[str]): 'Male' / 'Female' per speaker.
+        embedding_model (str): Model id of the embeddings (speaker_embedding.MODEL_ID).
+
+    Returns:
+        dict: Classifier weights in the format of data/speaker_attributes.json.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9
+    log_f0 = np.log(np.asarray(f0s, dtype=np.float64))
+    center = float(np.mean(log_f0))
+    X = np.hstack([embeddings, (log_f0 - center)[:, None]])
+    y = np.array([GENDERS.index(g.capitalize()) for g in genders], dtype=np.float64)
+
+    w, b = np.zeros(X.shape[1]), 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+        w -= learning_rate * (X.T @ (p - y) / len(y) + l2 * w)
+        b -= learning_rate * float(np.mean(p - y))
+
+    accuracy = float(np.mean(((X @ w + b) >= 0) == (y == 1)))
+    print(f"[INFO] Speaker attribute classifier fitted on {len(y)} speakers, training accuracy {accuracy:.3f}")
+    return {
+        "embedding_model": embedding_model,
+        "embedding_weights": np.round(w[:-1], 6).tolist(),
+        "f0_weight": round(float(w[-1]), 6),
+        "log_f0_center": round(center, 6),
+        "bias": round(b, 6),
+    }
+
+
+def fit_from_reference_voices(voice_wavs, genders, **kwargs):
+    """
+    Fits the classifier on labelled reference recordings (one speaker each)
+    with the configured embedding model, e.g. the voices of the voice store.
+
+    Args:
+        voice_wavs (List[str]): WAV paths.
+        genders (List[str]): 'Male' / 'Female' per WAV.
+
+    Returns:
+        dict: Classifier weights for speaker_embedding.MODEL_ID (see fit_classifier).
+    """
+    from modules.audio_analysis.speaker_embedding import MODEL_ID, embed_file
+    from modules.audio_analysis.prosodic_feature_extractor import extract_prosody_contours
+
+    embeddings = np.stack([embed_file(path) for path in voice_wavs])
+    f0s = np.array([speaker_mean_f0([extract_prosody_contours(path)]) for path in voice_wavs])
+    voiced = f0s > 0
+    if not voiced.all():
+        print(f"⚠️ Skipping {int((~voiced).sum())} reference voice(s) without voiced frames")
+    return fit_classifier(embeddings[voiced], f0s[voiced], [g for g, v in zip(genders, voiced) if v],
+                          embedding_model=MODEL_ID, **kwargs)
+
+
+def save_classifier(classifier, path=CLASSIFIER_PATH):
+    with open(path, "w") as f:
+        json.dump(classifier, f, indent=2)
+    return path
+
+
+# ---------------------------
+# Usage Example
+# ---------------------------
+# if __name__ == "__main__":
+#     # Fit embedding weights for the configured embedding model on labelled reference voices
+#     classifier = fit_from_reference_voices(["voices/a.wav", "voices/b.wav"], ["Female", "Male"])
+#     save_classifier(classifier)
+#
+#     print(classify_speaker(None, 215.0))  # {'gender': 'Female', ...}
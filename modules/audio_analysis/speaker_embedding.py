@@ -0,0 +1,162 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import librosa
+import torch
+from models.batching_server import model_lock
+
+# One speaker embedding model for the whole project: diarization linking,
+# voice matching and speaker attributes all compare vectors from this model.
+EMBEDDING_BACKENDS = {
+    "ecapa": "speechbrain/spkrec-ecapa-voxceleb",
+    "resemblyzer": "resemblyzer/ge2e",
+}
+EMBEDDING_BACKEND = os.getenv("SUBHASHIT_EMBEDDING_BACKEND", "ecapa")
+MODEL_ID = f"{EMBEDDING_BACKEND}:{EMBEDDING_BACKENDS[EMBEDDING_BACKEND]}"
+SAMPLING_RATE = 16000
+
+# Max cosine distance between two embeddings of the same person
+SAME_SPEAKER_DISTANCE = {"ecapa": 0.45, "resemblyzer": 0.25}[EMBEDDING_BACKEND]
+
+# Longer signals are cut; a speaker is well characterized long before this
+MAX_EMBED_SECONDS = 120.0
+BATCH_SIZE = 8
+
+CACHE_SIZE = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()  # jobs may run as threads of one process
+
+
+@lru_cache(maxsize=None)
+def load_embedding_model(backend=EMBEDDING_BACKEND):
+    """
+    Loads the embedding model on first use, once per process and backend, so
+    importing this module (e.g. for MODEL_ID) does not load it.
+    """
+    if backend == "ecapa":
+        from speechbrain.inference.speaker import EncoderClassifier
+        return EncoderClassifier.from_hparams(
+            source=EMBEDDING_BACKENDS["ecapa"], savedir=os.path.join("pretrained_models", "spkrec-ecapa")
+        )
+    if backend == "resemblyzer":
+        from resemblyzer import VoiceEncoder
+        return VoiceEncoder()
+    raise ValueError(f"Unknown embedding backend '{backend}'. Choose from {sorted(EMBEDDING_BACKENDS)}.")
+
+
+def _prepare(y, sr):
+    y = np.asarray(y, dtype=np.float32)
+    if sr != SAMPLING_RATE:
+        y = librosa.resample(y, orig_sr=sr, target_sr=SAMPLING_RATE)
+    return y[:int(MAX_EMBED_SECONDS * SAMPLING_RATE)]
+
+
+def _normalize(embeddings):
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    return embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9)
+
+
+def _cache_key(y):
+    digest = hashlib.sha1(y.tobytes())
+    digest.update(MODEL_ID.encode())
+    return digest.hexdigest()
+
+
+def _encode(signals):
+    """
+    Raw model call for 16 kHz signals; ECAPA runs one padded batch.
+    """
+    model = load_embedding_model(EMBEDDING_BACKEND)
+    if EMBEDDING_BACKEND == "resemblyzer":
+        from resemblyzer import preprocess_wav
+        return np.stack([model.embed_utterance(preprocess_wav(y, source_sr=SAMPLING_RATE)) for y in signals])
+
+    lengths = np.array([len(y) for y in signals], dtype=np.float32)
+    batch = np.zeros((len(signals), int(lengths.max())), dtype=np.float32)
+    for i, y in enumerate(signals):
+        batch[i, :len(y)] = y
+    with torch.no_grad():
+        embeddings = model.encode_batch(torch.from_numpy(batch), wav_lens=torch.from_numpy(lengths / lengths.max()))
+    return embeddings.squeeze(1).cpu().numpy()
+
+
+def embed_batch(signals, sr=SAMPLING_RATE, batch_size=BATCH_SIZE):
+    """
+    Embeds several in-memory signals, e.g. every diarized speaker of a job.
+
+    Signals are resampled to 16 kHz once, grouped by length so padding stays
+    small, and signals already embedded in this process are served from cache.
+
+    Args:
+        signals (List[np.ndarray]): Mono waveforms at `sr`.
+        sr (int): Sampling rate of the signals.
+
+    Returns:
+        np.ndarray: (N, E) float32 L2-normalized embeddings, in input order.
+    """
+    prepared = [_prepare(y, sr) for y in signals]
+    keys = [_cache_key(y) for y in prepared]
+
+    # Results are read from this call's own table; the shared cache is only filled from it
+    found = {}
+    with _cache_lock:
+        for key in keys:
+            if key in _cache:
+                _cache.move_to_end(key)
+                found[key] = _cache[key]
+
+    # One index per distinct signal still to embed, shortest first
+    missing = {key: i for i, key in enumerate(keys) if key not in found and len(prepared[i]) > 0}
+    missing = sorted(missing.values(), key=lambda i: len(prepared[i]))
+    for start in range(0, len(missing), batch_size):
+        indices = missing[start:start + batch_size]
+        with model_lock(f"speaker_embedding:{MODEL_ID}"):
+            encoded = _normalize(_encode([prepared[i] for i in indices]))
+        for i, embedding in zip(indices, encoded):
+            found[keys[i]] = embedding
+
+    with _cache_lock:
+        for i in missing:
+            _cache[keys[i]] = found[keys[i]]
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    embeddings = []
+    for i, key in enumerate(keys):
+        if key not in found:
+            raise ValueError(f"Cannot embed an empty signal (index {i})")
+        embeddings.append(found[key])
+    return np.stack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+
+
+def embed(y, sr=SAMPLING_RATE):
+    """
+    Embedding of one in-memory signal as a float32 L2-normalized vector.
+    """
+    return embed_batch([y], sr=sr)[0]
+
+
+def embed_file(path):
+    y, sr = librosa.load(path, sr=SAMPLING_RATE, mono=True)
+    return embed(y, sr)
+
+
+def speaker_embeddings(speaker_data):
+    """
+    Embeddings already computed for a job's diarized speakers.
+
+    Diarization stores one vector per speaker together with the model that
+    produced it; vectors from another model are left out so callers never mix
+    embedding spaces.
+
+    Returns:
+        dict: speaker_id -> np.ndarray
+    """
+    return {
+        speaker_id: np.asarray(data["embedding"], dtype=np.float32)
+        for speaker_id, data in speaker_data.items()
+        if speaker_id != "pause_segments" and data.get("embedding_model") == MODEL_ID and data.get("embedding")
+    }
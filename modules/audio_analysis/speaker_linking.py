@@ -0,0 +1,54 @@
+import numpy as np
+
+# Kept free of model imports: the shard coordinator links speakers without loading any model
+
+
+def link_speakers(local_speakers, threshold):
+    """
+    Links local speaker labels across diarization windows (or shards) with
+    average-linkage clustering on cosine distance. Labels from the same window
+    are never merged, since pyannote has already separated them.
+
+    Args:
+        local_speakers (List[tuple]): (chunk_index, local_label, embedding) entries.
+        threshold (float): Max cosine distance at which two clusters are merged.
+
+    Returns:
+        List[int]: Cluster id for every entry, numbered by first appearance.
+    """
+    if not local_speakers:
+        return []
+
+    embeddings = np.stack([np.asarray(emb, dtype=np.float32) for _, _, emb in local_speakers])
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9
+    chunk_ids = np.array([chunk for chunk, _, _ in local_speakers])
+
+    n = len(local_speakers)
+    distances = 1.0 - embeddings @ embeddings.T
+    cannot_link = chunk_ids[:, None] == chunk_ids[None, :]
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    members = [[i] for i in range(n)]
+
+    while True:
+        candidates = np.where(cannot_link | ~active[:, None] | ~active[None, :], np.inf, distances)
+        np.fill_diagonal(candidates, np.inf)
+        a, b = np.unravel_index(np.argmin(candidates), candidates.shape)
+        if candidates[a, b] > threshold:
+            break
+
+        # Average linkage update: merge b into a
+        distances[a, :] = (distances[a, :] * sizes[a] + distances[b, :] * sizes[b]) / (sizes[a] + sizes[b])
+        distances[:, a] = distances[a, :]
+        cannot_link[a, :] |= cannot_link[b, :]
+        cannot_link[:, a] = cannot_link[a, :]
+        sizes[a] += sizes[b]
+        active[b] = False
+        members[a].extend(members[b])
+        members[b] = []
+
+    labels = np.empty(n, dtype=int)
+    clusters = sorted((min(m), m) for m in members if m)
+    for cluster_id, (_, m) in enumerate(clusters):
+        labels[m] = cluster_id
+    return labels.tolist()
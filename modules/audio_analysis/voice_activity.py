@@ -0,0 +1,155 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from modules.audio_analysis.extract_pauses import frame_energy_db
+
+SAMPLING_RATE = 16000
+FRAME_LENGTH = 0.032  # seconds (512 samples at 16 kHz)
+HOP_LENGTH = 0.010  # seconds
+SPEECH_BAND = (250.0, 4000.0)  # Hz
+
+# Frame-level thresholds
+ENERGY_MARGIN_DB = 10.0  # above the estimated noise floor
+MIN_BAND_RATIO = 0.3  # share of energy inside SPEECH_BAND
+MAX_FLATNESS = 0.35  # spectral flatness; noise and applause are flat
+
+# Region-level smoothing
+MIN_SPEECH_LEN = 0.25  # seconds
+MAX_MERGE_GAP = 0.3  # seconds
+HANGOVER = 0.1  # seconds kept on both sides of speech frames
+# Speech has frequent syllable dips; steady music beds have almost none
+DIP_DEPTH_DB = 10.0
+MIN_DIP_RATIO = 0.15
+
+
+def _spectral_features(audio, sr, frame, hop, block_frames=8192):
+    """
+    Per-frame speech-band energy ratio and spectral flatness, computed in blocks
+    of frames to bound memory on long recordings.
+    """
+    frames = sliding_window_view(audio, frame)[::hop]
+    window = np.hanning(frame).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame, d=1.0 / sr)
+    in_band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+
+    band_ratio = np.empty(len(frames), dtype=np.float32)
+    flatness = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), block_frames):
+        block = frames[start:start + block_frames] * window
+        power = np.abs(np.fft.rfft(block, axis=1)) ** 2 + 1e-12
+        total = power.sum(axis=1)
+        band_ratio[start:start + block_frames] = power[:, in_band].sum(axis=1) / total
+        flatness[start:start + block_frames] = np.exp(np.mean(np.log(power), axis=1)) / (total / power.shape[1])
+    return band_ratio, flatness
+
+
+def _runs(mask):
+    """
+    (start_index, end_index) pairs of consecutive True values.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech_regions(audio, sr=SAMPLING_RATE, energy_margin_db=ENERGY_MARGIN_DB,
+                          min_band_ratio=MIN_BAND_RATIO, max_flatness=MAX_FLATNESS,
+                          min_speech_len=MIN_SPEECH_LEN, max_merge_gap=MAX_MERGE_GAP,
+                          min_dip_ratio=MIN_DIP_RATIO):
+    """
+    Lightweight energy- and spectrum-based voice activity detection.
+
+    A frame is speech when it is clearly above the noise floor, most of its
+    energy lies in the speech band and its spectrum is not flat. Speech frames
+    are dilated by a short hangover, close gaps are merged, and regions without
+    syllable-like energy dips (steady music beds) are dropped.
+
+    Args:
+        audio (np.ndarray): Mono float waveform.
+        sr (int): Sampling rate.
+
+    Returns:
+        List[tuple]: (start, end) speech regions in seconds.
+    """
+    frame = int(FRAME_LENGTH * sr)
+    hop = int(HOP_LENGTH * sr)
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < frame:
+        return []
+
+    _, energy_db = frame_energy_db(audio, sr, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)
+    band_ratio, flatness = _spectral_features(audio, sr, frame, hop)
+
+    noise_floor = np.percentile(energy_db, 10)
+    speech = (energy_db > noise_floor + energy_margin_db) & (band_ratio >= min_band_ratio) & (flatness <= max_flatness)
+
+    # Hangover: dilate speech frames on both sides
+    hangover = int(HANGOVER / HOP_LENGTH)
+    speech = np.convolve(speech.astype(np.int8), np.ones(2 * hangover + 1, dtype=np.int8), mode="same") > 0
+
+    # Merge regions separated by short gaps
+    starts, ends = _runs(~speech)
+    max_gap_frames = int(max_merge_gap / HOP_LENGTH)
+    for start, end in zip(starts, ends):
+        if end - start <= max_gap_frames and start > 0 and end < len(speech):
+            speech[start:end] = True
+
+    starts, ends = _runs(speech)
+    regions = []
+    for start, end in zip(starts, ends):
+        if (end - start) * HOP_LENGTH < min_speech_len:
+            continue
+        region_db = energy_db[start:end]
+        if np.mean(region_db < np.percentile(region_db, 90) - DIP_DEPTH_DB) < min_dip_ratio:
+            continue
+        regions.append((round(start * HOP_LENGTH, 3), round(min((end - 1) * HOP_LENGTH + FRAME_LENGTH, len(audio) / sr), 3)))
+    return regions
+
+
+def pack_speech_regions(audio, sr, regions, padding=0.1, gap=0.3):
+    """
+    Concatenates speech regions into one waveform, separated by short silences.
+
+    Args:
+        audio (np.ndarray): Mono waveform.
+        sr (int): Sampling rate.
+        regions (List[tuple]): (start, end) speech regions in seconds.
+        padding (float): Seconds of context kept around each region.
+        gap (float): Seconds of silence inserted between packed regions.
+
+    Returns:
+        tuple: (packed_audio, timestamp_map) where timestamp_map is an (N, 3) array of
+        (packed_start, original_start, duration) rows in seconds.
+    """
+    duration = len(audio) / sr
+    padded = sorted((max(start - padding, 0.0), min(end + padding, duration)) for start, end in regions)
+
+    merged = []
+    for start, end in padded:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    silence = np.zeros(int(gap * sr), dtype=np.float32)
+    pieces, rows, cursor = [], [], 0.0
+    for start, end in merged:
+        piece = np.asarray(audio[int(start * sr):int(end * sr)], dtype=np.float32)
+        rows.append((cursor, start, len(piece) / sr))
+        pieces.extend([piece, silence])
+        cursor += (len(piece) + len(silence)) / sr
+
+    packed = np.concatenate(pieces[:-1]) if pieces else np.zeros(0, dtype=np.float32)
+    return packed, np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def map_to_original(times, timestamp_map):
+    """
+    Maps times on the packed timeline back to the original timeline. Times that
+    fall into an inserted gap are clamped to the end of the preceding region.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(timestamp_map) == 0:
+        return times
+
+    index = np.clip(np.searchsorted(timestamp_map[:, 0], times, side="right") - 1, 0, len(timestamp_map) - 1)
+    offset = np.clip(times - timestamp_map[index, 0], 0.0, timestamp_map[index, 2])
+    return timestamp_map[index, 1] + offset
@@ -1,7 +1,9 @@
+import os
 import json
 import numpy as np
-from scipy.spatial.distance import cosine
-from utils.speaker_features import extract_voice_features
+from utils.speaker_features import extract_voice_features, voice_feature_vector
+from utils.existing_speakers import load_voice_store, LEGACY_EMBEDDING_MODEL
+from modules.audio_analysis.speaker_embedding import MODEL_ID
 
 def load_voice_database(json_path="voices_features.json"):
     with open(json_path, "r") as f:
@@ -9,41 +11,155 @@ def load_voice_database(json_path="voices_features.json"):
 
 def feature_vector_from_dict(feat_dict):
     # Combine all features except embeddings, which we treat separately
-    non_embed_features = (
-        feat_dict["mfcc"] +
-        [
-            feat_dict["avg_pitch"], feat_dict["rms"],
-            feat_dict["spectral_centroid"], feat_dict["spectral_bandwidth"],
-            feat_dict["spectral_contrast"], feat_dict["spectral_rolloff"],
-            feat_dict["zero_crossing_rate"], feat_dict["tempo"],
-            feat_dict["duration"], feat_dict["formant1"],
-            feat_dict["formant2"], feat_dict["formant3"],
-            feat_dict["jitter"], feat_dict["shimmer"]
-        ]
-    )
-    return np.array(non_embed_features), np.array(feat_dict["embedding"])
+    return voice_feature_vector(feat_dict)
 
-def find_closest_voice(new_wav, database):
-    new_features = extract_voice_features(new_wav)
-    new_vec, new_embed = feature_vector_from_dict(new_features)
 
-    best_match = None
-    best_score = float("inf")
+class VoiceIndex:
+    """
+    Nearest-voice index over a voice feature database.
 
-    for fname, feats in database.items():
-        vec, embed = feature_vector_from_dict(feats)
+    Acoustic features are kept as one standardized matrix and embeddings as one
+    L2-normalized matrix, so a query against every voice is a pair of matrix
+    products instead of a Python loop.
+    """
 
-        # Combine distances: spectral+prosodic features (Euclidean) and embedding (cosine)
-        dist_features = np.linalg.norm(new_vec - vec)
-        dist_embed = cosine(new_embed, embed)
+    def __init__(self, names, features, embeddings, feature_weight=0.5, embedding_weight=0.5):
+        features = np.asarray(features, dtype=np.float32)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
 
-        total_score = 0.5 * dist_features + 0.5 * dist_embed  # weighting
+        self.names = list(names)
+        self.feature_weight = feature_weight
+        self.embedding_weight = embedding_weight
 
-        if total_score < best_score:
-            best_score = total_score
-            best_match = fname
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0)
+        self.std[self.std < 1e-8] = 1.0
+        self.features = (features - self.mean) / self.std
+        self.feature_sq_norms = np.einsum("ij,ij->i", self.features, self.features)
+        self.embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9)
 
-    return best_match, best_score
+    @classmethod
+    def from_database(cls, database, **kwargs):
+        names = list(database.keys())
+        vectors = [feature_vector_from_dict(database[name]) for name in names]
+        features = np.stack([vec for vec, _ in vectors])
+        embeddings = np.stack([embed for _, embed in vectors])
+        return cls(names, features, embeddings, **kwargs)
+
+    @classmethod
+    def from_store(cls, store_dir, **kwargs):
+        """
+        Builds the index from a binary store written by create_voice_database.
+
+        Raises:
+            FileNotFoundError: If store_dir holds no voice store.
+            ValueError: If the store is empty or built with another embedding model.
+        """
+        manifest, features, embeddings = load_voice_store(store_dir)
+        if features is None or embeddings is None:
+            raise FileNotFoundError(f"No voice store in {store_dir}; build it with create_voice_database.")
+        if not manifest["voices"]:
+            raise ValueError(f"Voice store {store_dir} has no voices; add reference WAVs and rebuild it.")
+        store_model = manifest.get("embedding_model", LEGACY_EMBEDDING_MODEL)
+        if store_model != MODEL_ID:
+            raise ValueError(f"Voice store {store_dir} was built with {store_model}, not {MODEL_ID}; "
+                             "rebuild it with create_voice_database.")
+        names = [voice["name"] for voice in manifest["voices"]]
+        return cls(names, features, embeddings, **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def scores(self, features, embeddings):
+        """
+        Combined distance of every query to every voice.
+
+        Args:
+            features (np.ndarray): (Q, D) raw acoustic feature vectors.
+            embeddings (np.ndarray): (Q, E) speaker embeddings.
+
+        Returns:
+            np.ndarray: (Q, N) scores, lower is closer.
+        """
+        queries = (np.atleast_2d(np.asarray(features, dtype=np.float32)) - self.mean) / self.std
+        query_embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        query_embeddings = query_embeddings / (np.linalg.norm(query_embeddings, axis=1, keepdims=True) + 1e-9)
+
+        # Standardized Euclidean distance: |q|^2 + |x|^2 - 2 q.x
+        sq_dist = (np.einsum("ij,ij->i", queries, queries)[:, None] + self.feature_sq_norms[None, :]
+                   - 2.0 * queries @ self.features.T)
+        dist_features = np.sqrt(np.maximum(sq_dist, 0.0))
+        dist_embed = 1.0 - query_embeddings @ self.embeddings.T
+
+        return self.feature_weight * dist_features + self.embedding_weight * dist_embed
+
+    def query_batch(self, feature_dicts, top_k=1):
+        """
+        Top-k closest voices for several feature dicts at once.
+
+        Returns:
+            List[List[tuple]]: Per query, (voice_name, score) pairs, closest first.
+        """
+        if not feature_dicts or not self.names:
+            return [[] for _ in feature_dicts]
+
+        vectors = [feature_vector_from_dict(feats) for feats in feature_dicts]
+        scores = self.scores(np.stack([vec for vec, _ in vectors]), np.stack([embed for _, embed in vectors]))
+
+        top_k = min(top_k, len(self.names))
+        candidates = np.argpartition(scores, top_k - 1, axis=1)[:, :top_k]
+        results = []
+        for row, cols in zip(scores, candidates):
+            cols = cols[np.argsort(row[cols])]
+            results.append([(self.names[c], float(row[c])) for c in cols])
+        return results
+
+    def query(self, feature_dict, top_k=1):
+        return self.query_batch([feature_dict], top_k=top_k)[0]
+
+
+def load_voice_index(path="speaker_features"):
+    """
+    Loads a VoiceIndex from a binary store directory or a legacy JSON database.
+    """
+    if os.path.isdir(path):
+        return VoiceIndex.from_store(path)
+    return VoiceIndex.from_database(load_voice_database(path))
+
+def find_closest_voice(new_wav, database, embedding=None):
+    """
+    Finds the closest voice to a WAV file.
+
+    Args:
+        new_wav (str): Path to the voice sample.
+        database (VoiceIndex | dict): Prebuilt index, or a feature database to index.
+        embedding (np.ndarray): Speaker embedding already computed for this voice
+            (e.g. from speaker_embedding.speaker_embeddings), reused instead of recomputed.
+
+    Returns:
+        tuple: (voice_name, score)
+    """
+    index = database if isinstance(database, VoiceIndex) else VoiceIndex.from_database(database)
+    new_features = extract_voice_features(new_wav, embedding=embedding)
+
+    matches = index.query(new_features, top_k=1)
+    if not matches:
+        return None, float("inf")
+    return matches[0]
+
+def find_closest_voices(wav_paths, index, top_k=1, embeddings=None):
+    """
+    Batched lookup, e.g. for all diarized speakers of a job at once.
+
+    Args:
+        embeddings (List[np.ndarray]): Known speaker embeddings aligned with wav_paths.
+
+    Returns:
+        dict: wav path -> list of (voice_name, score), closest first.
+    """
+    embeddings = embeddings if embeddings is not None else [None] * len(wav_paths)
+    features = [extract_voice_features(path, embedding=emb) for path, emb in zip(wav_paths, embeddings)]
+    return dict(zip(wav_paths, index.query_batch(features, top_k=top_k)))
 
 
 # ---------------------------
@@ -51,9 +167,15 @@ def find_closest_voice(new_wav, database):
 # ---------------------------
 # if __name__ == "__main__":
 #     # STEP 1: Build database from available voices
-#     # create_voice_database("./available_voices")
+#     # create_voice_database("./available_voices", output_dir="speaker_features")
+#
+#     # STEP 2: Load index once and find match for a new voice sample
+#     index = load_voice_index("speaker_features")
+#     closest, score = find_closest_voice("new_voice.wav", index)
+#     print(f"Closest match: {closest} (Score: {score:.4f})")
 #
-#     # STEP 2: Load database and find match for a new voice sample
-#     db = load_voice_database("voices_features.json")
-#     closest, score = find_closest_voice("new_voice.wav", db)
-#     print(f"Closest match: {closest} (Score: {score:.4f})")
\ No newline at end of file
+#     # STEP 3: Diarized speakers reuse the embeddings computed during diarization
+#     # from modules.audio_analysis.speaker_embedding import speaker_embeddings
+#     # vectors = speaker_embeddings(speaker_data)
+#     # paths = [f"output/speakers/{speaker_id}.wav" for speaker_id in vectors]
+#     # matches = find_closest_voices(paths, index, embeddings=list(vectors.values()))
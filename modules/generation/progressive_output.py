@@ -0,0 +1,183 @@
+import os
+import wave
+from pydub import AudioSegment
+from modules.generation.subtitle_generation import format_time
+
+OUTPUT_SAMPLE_RATE = 44100
+CHUNK_SECONDS = 6.0  # length of one HLS audio chunk
+CHUNK_BITRATE = "128k"
+
+
+class ProgressiveOutput:
+    """
+    Assembles dubbed segments on the original timeline as they finish.
+
+    The timeline (every speaker segment and pause, by start time) is known after
+    diarization. Finished segments may arrive in any order; they wait in a reorder
+    buffer until every earlier slot is done, and each newly completed prefix is
+    written out at once:
+
+    - the final WAV grows incrementally (no repeated concatenation),
+    - with streaming enabled, full CHUNK_SECONDS pieces are encoded as AAC
+      MPEG-TS chunks listed in an HLS EVENT playlist, and subtitle cues are
+      appended to a VTT file, so playback can start after the first segments.
+
+    Segments are placed at their original start time; silence fills the gaps.
+    A segment that overruns the next start pushes later audio back, as before.
+    """
+
+    def __init__(self, timeline, output_dir, final_audio_path, final_srt_path, stream=False,
+                 chunk_seconds=CHUNK_SECONDS, sample_rate=OUTPUT_SAMPLE_RATE):
+        """
+        Args:
+            timeline (List[tuple]): (start_ms, end_ms, key) of every slot.
+            output_dir (str): Directory for the HLS chunks, playlist and VTT.
+            final_audio_path (str): Growing WAV of the complete dub.
+            final_srt_path (str): Growing SRT file.
+            stream (bool): Also write HLS chunks and the VTT file.
+        """
+        self.timeline = sorted(timeline)
+        self.slot_index = {key: i for i, (_, _, key) in enumerate(self.timeline)}
+        self.output_dir = output_dir
+        self.stream = stream
+        self.chunk_ms = int(chunk_seconds * 1000)
+        self.sample_rate = sample_rate
+
+        self._pending = {}
+        self._next = 0
+        self._cursor_ms = 0
+        self._tail = AudioSegment.silent(duration=0, frame_rate=sample_rate)
+        self._chunks = []
+        self._cue_index = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(final_audio_path)), exist_ok=True)
+        self.final_audio_path = final_audio_path
+        self.final_srt_path = final_srt_path
+        self.playlist_path = os.path.join(output_dir, "playlist.m3u8")
+        self.vtt_path = os.path.join(output_dir, "subtitles.vtt")
+
+        self._wav = wave.open(final_audio_path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+        self._srt = open(final_srt_path, "w", encoding="utf-8")
+        self._vtt = None
+        if stream:
+            self._vtt = open(self.vtt_path, "w", encoding="utf-8")
+            self._vtt.write("WEBVTT\n\n")
+            self._vtt.flush()
+            self._write_playlist()
+
+    @property
+    def complete(self):
+        return self._next == len(self.timeline)
+
+    @property
+    def ready_ms(self):
+        """
+        Milliseconds of the timeline already written out.
+        """
+        return self._cursor_ms
+
+    def add(self, key, audio_path=None, subtitles=()):
+        """
+        Registers a finished slot. audio_path=None marks a pause (silence).
+
+        Args:
+            key (str): Slot key from the timeline.
+            audio_path (str): Dubbed audio of the slot.
+            subtitles: Entries from generate_srt_entries_from_text for this slot.
+
+        Returns:
+            int: Number of slots written out by this call.
+        """
+        if key not in self.slot_index:
+            raise ValueError(f"Slot '{key}' is not on the timeline")
+        self._pending[self.slot_index[key]] = (audio_path, list(subtitles))
+
+        written = 0
+        while self._next in self._pending:
+            audio_path, cues = self._pending.pop(self._next)
+            self._write_slot(self.timeline[self._next], audio_path, cues)
+            self._next += 1
+            written += 1
+        if written:
+            self._flush_chunks(final=False)
+        return written
+
+    def _append_audio(self, audio):
+        self._wav.writeframes(audio.raw_data)
+        self._tail += audio
+        self._cursor_ms += len(audio)
+
+    def _write_slot(self, slot, audio_path, cues):
+        start_ms, end_ms, _ = slot
+        if audio_path is None:
+            if end_ms > self._cursor_ms:
+                self._append_audio(AudioSegment.silent(duration=end_ms - self._cursor_ms, frame_rate=self.sample_rate))
+            return
+
+        if start_ms > self._cursor_ms:
+            self._append_audio(AudioSegment.silent(duration=start_ms - self._cursor_ms, frame_rate=self.sample_rate))
+        audio = AudioSegment.from_file(audio_path)
+        self._append_audio(audio.set_frame_rate(self.sample_rate).set_channels(1).set_sample_width(2))
+
+        for cue in cues:
+            self._cue_index += 1
+            start, end = format_time(cue["start_ms"]), format_time(cue["end_ms"])
+            self._srt.write(f"{self._cue_index}\n{start} --> {end}\n{cue['text']}\n\n")
+            if self._vtt is not None:
+                self._vtt.write(f"{start.replace(',', '.')} --> {end.replace(',', '.')}\n{cue['text']}\n\n")
+        self._srt.flush()
+        if self._vtt is not None:
+            self._vtt.flush()
+
+    def _flush_chunks(self, final):
+        if not self.stream:
+            # Only the WAV is written; keep no audio in memory
+            self._tail = AudioSegment.silent(duration=0, frame_rate=self.sample_rate)
+            return
+
+        while len(self._tail) >= self.chunk_ms or (final and len(self._tail) > 0):
+            piece, self._tail = self._tail[:self.chunk_ms], self._tail[self.chunk_ms:]
+            offset = sum(duration for _, duration in self._chunks) / 1000.0
+            name = f"chunk_{len(self._chunks):05d}.ts"
+            path = os.path.join(self.output_dir, name)
+            piece.export(f"{path}.part", format="mpegts", codec="aac", bitrate=CHUNK_BITRATE,
+                         parameters=["-output_ts_offset", f"{offset:.3f}"])
+            os.replace(f"{path}.part", path)
+            self._chunks.append((name, len(piece)))
+        self._write_playlist(final=final)
+
+    def _write_playlist(self, final=False):
+        target = max([self.chunk_ms] + [duration for _, duration in self._chunks]) / 1000.0
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(-(-target // 1))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for name, duration in self._chunks:
+            lines += [f"#EXTINF:{duration / 1000.0:.3f},", name]
+        if final:
+            lines.append("#EXT-X-ENDLIST")
+
+        tmp_path = f"{self.playlist_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
+
+    def close(self):
+        """
+        Flushes the last partial chunk, ends the playlist and closes all files.
+        """
+        if not self.complete:
+            print(f"⚠️  Closing progressive output with {len(self.timeline) - self._next} slots missing")
+        self._flush_chunks(final=True)
+        self._wav.close()
+        self._srt.close()
+        if self._vtt is not None:
+            self._vtt.close()
+        return self.final_audio_path, self.final_srt_path
@@ -1,36 +1,88 @@
 import json
 import string
+from modules.audio_analysis.prosodic_feature_extractor import (
+    aggregate_contours, compute_pitch_shift, compute_loudness_shift
+)
 
-def map_target_to_prosodic_features(alignment_json, source_features_json, target_text, duration_threshold=0.2):
-    target_words = [word.strip(string.punctuation).lower() for word in target_text.split()]
+def _normalize(word):
+    return word.strip(string.punctuation).lower()
+
+def word_features_from_contours(source_features, contours):
+    """
+    Per-word pitch/loudness shifts of the words inside each word group, aggregated
+    from the segment's prosody contours (extract_word_level_features(return_contours=True))
+    against the same baselines as the group shifts.
+
+    Returns:
+        dict: normalized word -> {pitch_shift, loudness_shift, start, end, duration}
+    """
+    words = [word for item in source_features for word in item.get("words", []) if word["word"].strip()]
+    if not words:
+        return {}
+
+    pitch_vals = [item["pitch"] for item in source_features if item.get("pitch", 0) > 0]
+    loudness_vals = [item["loudness"] for item in source_features if item.get("loudness", 0) > 0]
+    base_pitch = sum(pitch_vals) / len(pitch_vals) if pitch_vals else 200.0
+    base_loudness = sum(loudness_vals) / len(loudness_vals) if loudness_vals else 70.0
+
+    mean_pitch, mean_intensity, has_frames = aggregate_contours(
+        contours, [word["start"] for word in words], [word["end"] for word in words]
+    )
+
+    feature_map = {}
+    for word, pitch, loudness, measured in zip(words, mean_pitch, mean_intensity, has_frames):
+        if not measured:
+            continue
+        feature_map[_normalize(word["word"])] = {
+            "pitch_shift": compute_pitch_shift(float(pitch), base_pitch),
+            "loudness_shift": compute_loudness_shift(float(loudness), base_loudness),
+            "start": word["start"],
+            "end": word["end"],
+            "duration": max(word["end"] - word["start"], 0)
+        }
+    return feature_map
+
+def map_target_to_prosodic_features(alignment_json, source_features_json, target_text, duration_threshold=0.2,
+                                    contours=None):
+    """
+    Maps source prosody onto the target words through the word alignment.
+
+    With the segment's prosody contours, aligned source words get their own
+    pitch/loudness shifts and duration instead of those of their word group.
+    """
+    target_words = [_normalize(word) for word in target_text.split()]
 
     # Map target to source
     target_to_source = {
-        entry["target"].strip(string.punctuation).lower(): entry["source"].strip(string.punctuation).lower()
+        _normalize(entry["target"]): _normalize(entry["source"])
         for entry in alignment_json.get("alignments", [])
     }
 
     # Build source feature map
-    source_feature_map = {}
-    for i, item in enumerate(source_features_json):
+    source_features = []
+    for item in source_features_json:
         if isinstance(item, str):
             try:
                 item = json.loads(item)
             except json.JSONDecodeError:
                 continue  # skip malformed entries
-
         if isinstance(item, dict) and "word" in item:
-            key = item["word"].strip(string.punctuation).lower()
-            start = item.get("start", 0)
-            end = item.get("end", 0)
-            duration = max(end - start, 0)
-            source_feature_map[key] = {
-                "pitch_shift": item.get("pitch_shift", 0),
-                "loudness_shift": item.get("loudness_shift", 0),
-                "start": start,
-                "end": end,
-                "duration": duration
-            }
+            source_features.append(item)
+
+    source_feature_map = {}
+    for item in source_features:
+        start = item.get("start", 0)
+        end = item.get("end", 0)
+        duration = max(end - start, 0)
+        source_feature_map[_normalize(item["word"])] = {
+            "pitch_shift": item.get("pitch_shift", 0),
+            "loudness_shift": item.get("loudness_shift", 0),
+            "start": start,
+            "end": end,
+            "duration": duration
+        }
+    if contours is not None:
+        source_feature_map.update(word_features_from_contours(source_features, contours))
 
     # Final mapping
     result = []
@@ -0,0 +1,148 @@
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import mediainfo
+from modules.generation.subtitle_generation import generate_srt_entries_from_text, format_time
+
+# Model-free glue between diarization and mixing: the timeline, fitting a dubbed
+# clip into its slot and its subtitle entries. Shared by the pipeline and the
+# stage benchmark, so both run the same code.
+SUB_TURN_SNAP_MS = 300  # how far a cut between sub-turns may move to find a quiet spot
+
+
+def get_audio_duration(filepath):
+    info = mediainfo(filepath)
+    duration_str = info.get('duration', '0')
+
+    try:
+        return float(duration_str)
+    except ValueError:
+        print(f"⚠️  Warning: Could not get duration for {filepath}. Falling back to 0.")
+        return 0.0
+
+
+def adjust_audio_speed(audio, original_duration, processed_duration):
+    if processed_duration > original_duration and original_duration > 0:
+        speed_factor = processed_duration / original_duration
+        audio = audio.speedup(playback_speed=speed_factor)
+    return audio
+
+
+def place_on_sub_turns(audio, sub_turns, start_ms, window_ms=20):
+    """
+    Lays the dubbed clip of a merged segment over its original diarization turns,
+    so the speech stays where it was spoken and the gaps between turns stay silent.
+
+    The clip is cut into one piece per turn, in proportion to the turn lengths;
+    each cut moves to the quietest window_ms within SUB_TURN_SNAP_MS.
+
+    Returns:
+        tuple: (placed audio starting at start_ms, pieces as (clip_start_ms, clip_end_ms, timeline_start_ms))
+    """
+    turns = [(int(t["start"] * 1000), int(t["end"] * 1000)) for t in sub_turns]
+    durations = [max(end - start, 0) for start, end in turns]
+    total = sum(durations) or 1
+
+    # Mean absolute amplitude per millisecond, summed over sliding windows
+    samples = np.abs(np.array(audio.set_channels(1).get_array_of_samples(), dtype=np.float32))
+    per_ms = max(audio.frame_rate // 1000, 1)
+    energy = samples[:len(samples) // per_ms * per_ms].reshape(-1, per_ms).mean(axis=1)
+    windowed = np.convolve(energy, np.ones(window_ms), mode="same") if len(energy) else energy
+
+    bounds, elapsed = [0], 0
+    for duration in durations[:-1]:
+        elapsed += duration
+        target = int(len(audio) * elapsed / total)
+        low, high = max(bounds[-1], target - SUB_TURN_SNAP_MS), min(len(windowed), target + SUB_TURN_SNAP_MS)
+        bounds.append(low + int(np.argmin(windowed[low:high])) if high > low else max(bounds[-1], target))
+    bounds.append(len(audio))
+
+    placed = AudioSegment.silent(duration=0, frame_rate=audio.frame_rate)
+    pieces = []
+    for clip_start, clip_end, (turn_start, _) in zip(bounds[:-1], bounds[1:], turns):
+        offset = turn_start - start_ms
+        if offset > len(placed):
+            placed += AudioSegment.silent(duration=offset - len(placed), frame_rate=audio.frame_rate)
+        pieces.append((clip_start, clip_end, start_ms + len(placed)))
+        placed += audio[clip_start:clip_end]
+    return placed, pieces
+
+
+def _clip_to_timeline(ms, pieces):
+    for clip_start, clip_end, timeline_start in pieces:
+        if ms <= clip_end:
+            return timeline_start + max(ms - clip_start, 0)
+    clip_start, _, timeline_start = pieces[-1]
+    return timeline_start + ms - clip_start
+
+
+
+def build_timeline(speaker_data_json):
+    """
+    Every speaker segment and pause as (start_ms, end_ms, key, speaker_id), in
+    timeline order. Pauses have speaker_id None.
+    """
+    timeline = []
+    for speaker_id, data in speaker_data_json.items():
+        if speaker_id == "pause_segments":
+            continue
+        for seg in data['segments']:
+            start_ms, end_ms = int(seg['start'] * 1000), int(seg['end'] * 1000)
+            timeline.append((start_ms, end_ms, f'{speaker_id}_{start_ms}_{end_ms}', speaker_id))
+
+    for pause in speaker_data_json.get("pause_segments", []):
+        start_ms, end_ms = int(pause['start'] * 1000), int(pause['end'] * 1000)
+        timeline.append((start_ms, end_ms, f'pause_{start_ms}_{end_ms}', None))
+
+    return sorted(timeline, key=lambda slot: (slot[0], slot[1], slot[2]))
+
+
+def segment_sub_turns(speaker_data_json):
+    """
+    Original diarization turns of every timeline key whose segment merged several turns.
+    """
+    return {
+        f'{speaker_id}_{int(seg["start"] * 1000)}_{int(seg["end"] * 1000)}': seg["sub_turns"]
+        for speaker_id, data in (speaker_data_json or {}).items() if speaker_id != "pause_segments"
+        for seg in data["segments"] if len(seg.get("sub_turns", [])) > 1
+    }
+
+
+def speech_duration(start_ms, end_ms, sub_turns=None):
+    """
+    Seconds the dubbed speech of a segment should fill: the whole slot, or only
+    the turns of a merged segment (not the gaps between them).
+    """
+    if sub_turns:
+        return sum(t["end"] - t["start"] for t in sub_turns)
+    return (end_ms - start_ms) / 1000.0
+
+
+def fit_dubbed_segment(output_path, translated_text, start_ms, end_ms, sub_turns=None):
+    """
+    Fits a synthesized clip into its slot, in place: speeds it up when it overruns
+    the speech duration and, for a merged segment, lays it over its sub_turns
+    with silence in the gaps.
+
+    Returns:
+        list: Subtitle entries on the timeline.
+    """
+    target_duration = speech_duration(start_ms, end_ms, sub_turns)
+    processed_duration = get_audio_duration(output_path)
+    processed_audio = AudioSegment.from_wav(output_path)
+    adjusted_audio = adjust_audio_speed(processed_audio, target_duration, processed_duration)
+    clip_ms = len(adjusted_audio)
+    if sub_turns:
+        adjusted_audio, pieces = place_on_sub_turns(adjusted_audio, sub_turns, start_ms)
+    adjusted_audio.export(output_path, format='wav')
+
+    # 📝 Subtitle info
+    if not sub_turns:
+        return generate_srt_entries_from_text(translated_text, start_ms, end_ms, max_words_per_line=6)
+
+    # Cue times follow the speech pieces onto the timeline
+    entries = generate_srt_entries_from_text(translated_text, 0, clip_ms, max_words_per_line=6)
+    for entry in entries:
+        entry["start_ms"] = _clip_to_timeline(entry["start_ms"], pieces)
+        entry["end_ms"] = _clip_to_timeline(entry["end_ms"], pieces)
+        entry["start"], entry["end"] = format_time(entry["start_ms"]), format_time(entry["end_ms"])
+    return entries
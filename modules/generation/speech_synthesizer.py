@@ -103,6 +103,8 @@ from transformers import AutoTokenizer
 import soundfile as sf
 import os
 import random
+from models.compiled_generation import COMPILED_GENERATION, enable_compiled_generation, tokenize_bucketed
+from models.batching_server import model_lock
 
 # Load model & tokenizers once
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -110,16 +112,25 @@ model = ParlerTTSForConditionalGeneration.from_pretrained("ai4bharat/indic-parle
 tokenizer = AutoTokenizer.from_pretrained("ai4bharat/indic-parler-tts")
 description_tokenizer = AutoTokenizer.from_pretrained(model.config.text_encoder._name_or_path)
 
-# Load speaker mapping
-with open("speakers.json", "r", encoding="utf-8") as f:
+# Opt-in static KV cache + compiled forward (SUBHASHIT_COMPILED_GENERATION=1)
+if COMPILED_GENERATION:
+    enable_compiled_generation(model)
+
+# Speaker pitch range (speaker_attributes) -> wording in the description
+PITCH_DESCRIPTIONS = {"low": "slightly low", "natural": "natural", "high": "slightly high"}
+
+# Load speaker mapping (resolved from the repo, not the working directory)
+SPEAKERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "speakers.json")
+with open(SPEAKERS_PATH, "r", encoding="utf-8") as f:
     SPEAKER_DATA = json.load(f)
 
 
 def generate_tts_audio(input_text: str, secs: int, sentiment: str, emotion: str, target_language: str, gender: str,
-                       output_file: str = "indic_tts_out.wav") -> str:
+                       output_file: str = "indic_tts_out.wav", pitch_range: str = "natural") -> str:
     """
     Generates speech audio dynamically based on input text, sentiment, emotion, language, and gender.
-    Picks a recommended speaker of specified gender from speaker.json.
+    Picks a recommended speaker of specified gender from speaker.json; pitch_range
+    ('low', 'natural' or 'high') is described to the model.
     """
 
     # Get language info
@@ -140,16 +151,20 @@ def generate_tts_audio(input_text: str, secs: int, sentiment: str, emotion: str,
     # Build dynamic description
     description = (
         f"{chosen_speaker}, a {gender.lower()} speaker, delivers a {sentiment.lower()} "
-        f"and {emotion.lower()} speech with natural pitch and pacing. "
+        f"and {emotion.lower()} speech with {PITCH_DESCRIPTIONS.get(pitch_range, 'natural')} pitch and natural pacing. "
         f"The recording is {secs} seconds long, clear and high-quality, in {target_language}."
     )
 
-    # Tokenize
-    description_inputs = description_tokenizer(description, return_tensors="pt").to(device)
-    prompt_inputs = tokenizer(input_text, return_tensors="pt").to(device)
+    # Tokenize (bucket-padded when generation is compiled, to reuse compiled shapes)
+    if COMPILED_GENERATION:
+        description_inputs = tokenize_bucketed(description_tokenizer, description).to(device)
+        prompt_inputs = tokenize_bucketed(tokenizer, input_text).to(device)
+    else:
+        description_inputs = description_tokenizer(description, return_tensors="pt").to(device)
+        prompt_inputs = tokenizer(input_text, return_tensors="pt").to(device)
 
-    # Generate audio
-    with torch.no_grad():
+    # Generate audio (one generate at a time when jobs share the model as threads)
+    with model_lock("parler_tts"), torch.no_grad():
         generation = model.generate(
             input_ids=description_inputs["input_ids"],
             attention_mask=description_inputs["attention_mask"],
@@ -164,6 +179,26 @@ def generate_tts_audio(input_text: str, secs: int, sentiment: str, emotion: str,
     return os.path.abspath(output_file)
 
 
+def warm_up_tts(prompt_buckets=(16, 32, 64)):
+    """
+    Compiles the TTS generator for the common prompt buckets at worker start.
+    """
+    if not COMPILED_GENERATION:
+        return
+    description = "A male speaker delivers a neutral speech with natural pitch and pacing."
+    description_inputs = tokenize_bucketed(description_tokenizer, description).to(device)
+    for bucket in prompt_buckets:
+        prompt_inputs = tokenize_bucketed(tokenizer, "नमस्ते " * max(bucket // 2, 1)).to(device)
+        with model_lock("parler_tts"), torch.no_grad():
+            model.generate(
+                input_ids=description_inputs["input_ids"],
+                attention_mask=description_inputs["attention_mask"],
+                prompt_input_ids=prompt_inputs["input_ids"],
+                prompt_attention_mask=prompt_inputs["attention_mask"]
+            )
+    print(f"[INFO] TTS warm-up done for prompt buckets {list(prompt_buckets)}")
+
+
 # # Example usage
 # if __name__ == "__main__":
 #     text = "ਪਾਕਿਸਤਾਨ ਦਾ ਇਹ ਦਾਅਵਾ ਕਿ ਉਨ੍ਹਾਂ ਨੇ ਕਿਸੇ ਵੀ ਧਾਰਮਿਕ ਸਥਾਨ ਨੂੰ ਨਿਸ਼ਾਨਾ ਨਹੀਂ ਬਣਾਇਆ ਜਾਂ ਹਮਲਾ ਨਹੀਂ ਕੀਤਾ..."
@@ -1,9 +1,10 @@
 import math
-from datetime import timedelta
 
 def format_time(ms):
-    td = timedelta(milliseconds=ms)
-    return str(td)[:-3].replace('.', ',').zfill(12)
+    hours, rest = divmod(int(ms), 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{millis:03}"
 
 def generate_srt_entries_from_text(translated_text, start_ms, end_ms, max_words_per_line=6):
     words = translated_text.strip().split()
@@ -35,6 +36,8 @@ def generate_srt_entries_from_text(translated_text, start_ms, end_ms, max_words_
             "index": len(srt_entries) + 1,
             "start": format_time(current_start),
             "end": format_time(current_end),
+            "start_ms": current_start,
+            "end_ms": current_end,
             "text": ' '.join(chunk)
         }
 
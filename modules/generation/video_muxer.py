@@ -0,0 +1,112 @@
+import os
+import subprocess
+
+# ISO 639-2 codes for the subtitle/audio track language tags
+ISO639_2 = {
+    'en': 'eng', 'hi': 'hin', 'bn': 'ben', 'te': 'tel', 'mr': 'mar', 'ta': 'tam',
+    'ur': 'urd', 'gu': 'guj', 'kn': 'kan', 'ml': 'mal', 'pa': 'pan', 'or': 'ori',
+    'as': 'asm', 'ne': 'nep', 'fr': 'fra', 'de': 'deu', 'es': 'spa'
+}
+
+# Soft subtitle codec per output container
+SUBTITLE_CODECS = {".mp4": "mov_text", ".m4v": "mov_text", ".mov": "mov_text", ".mkv": "srt"}
+
+
+def _subtitles_filter(subtitle_path):
+    # The subtitles filter parses its argument, so ':' and '\' in paths must be escaped
+    path = os.path.abspath(subtitle_path).replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+    return f"subtitles='{path}'"
+
+
+def build_mux_command(video_path, audio_path, output_path, subtitle_path=None, burn_subtitles=False,
+                      language=None, audio_bitrate="192k", crf=20, preset="veryfast"):
+    """
+    Builds the ffmpeg command for the final video.
+
+    Without burn-in the video stream is copied untouched and the subtitles are
+    attached as a soft track; with burn-in the video is encoded exactly once.
+    """
+    cmd = ["ffmpeg", "-y", "-i", video_path, "-i", audio_path]
+    soft_subtitles = subtitle_path is not None and not burn_subtitles
+    if soft_subtitles:
+        cmd += ["-i", subtitle_path]
+
+    cmd += ["-map", "0:v:0", "-map", "1:a:0"]
+    if soft_subtitles:
+        cmd += ["-map", "2:s:0"]
+
+    if subtitle_path is not None and burn_subtitles:
+        cmd += ["-vf", _subtitles_filter(subtitle_path), "-c:v", "libx264", "-crf", str(crf), "-preset", preset]
+    else:
+        cmd += ["-c:v", "copy"]
+
+    cmd += ["-c:a", "aac", "-b:a", audio_bitrate]
+
+    if soft_subtitles:
+        ext = os.path.splitext(output_path)[1].lower()
+        cmd += ["-c:s", SUBTITLE_CODECS.get(ext, "mov_text")]
+
+    if language:
+        tag = ISO639_2.get(language, language)
+        cmd += ["-metadata:s:a:0", f"language={tag}"]
+        if soft_subtitles:
+            cmd += ["-metadata:s:s:0", f"language={tag}", "-disposition:s:0", "default"]
+
+    if os.path.splitext(output_path)[1].lower() in (".mp4", ".m4v", ".mov"):
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(output_path)
+    return cmd
+
+
+def mux_final_video(video_path, audio_path, output_path, subtitle_path=None, burn_subtitles=False,
+                    language=None, audio_bitrate="192k", crf=20, preset="veryfast"):
+    """
+    Produces the final dubbed video in a single ffmpeg pass.
+
+    Args:
+        video_path (str): Original video.
+        audio_path (str): Dubbed audio track (encoded to AAC).
+        output_path (str): Output video; may be the same file as video_path.
+        subtitle_path (str): Optional SRT file.
+        burn_subtitles (bool): Render the subtitles into the picture (one libx264 encode)
+            instead of attaching a soft subtitle track (video stream copied).
+        language (str): Short language code used to tag the audio and subtitle tracks.
+        audio_bitrate (str): AAC bitrate.
+        crf (int): libx264 quality when burning subtitles.
+        preset (str): libx264 preset when burning subtitles.
+
+    Returns:
+        str: Path to the final video.
+    """
+    for path, label in ((video_path, "Video"), (audio_path, "Audio"), (subtitle_path, "Subtitle")):
+        if path is not None and not os.path.exists(path):
+            raise FileNotFoundError(f"❌ {label} file not found: {path}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    # ffmpeg cannot write over one of its inputs, so go through a temporary file
+    in_place = os.path.abspath(output_path) == os.path.abspath(video_path)
+    target = f"{os.path.splitext(output_path)[0]}.muxing{os.path.splitext(output_path)[1]}" if in_place else output_path
+
+    cmd = build_mux_command(video_path, audio_path, target, subtitle_path, burn_subtitles,
+                            language, audio_bitrate, crf, preset)
+    mode = "burning subtitles (single encode)" if subtitle_path and burn_subtitles else "stream copy"
+    print(f"✅ Muxing final video ({mode})...")
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(target) and in_place:
+            os.remove(target)
+        raise RuntimeError(f"❌ ffmpeg error: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+
+    if in_place:
+        os.replace(target, output_path)
+
+    print(f"🎉 Final video saved to: {output_path}")
+    return output_path
+
+
+# Example usage
+# if __name__ == "__main__":
+#     mux_final_video("samples/sample.mp4", "final_output/final_audio_file.wav", "final_output/sample_hi.mp4",
+#                     subtitle_path="final_output/final_audio_file.srt", language="hi")
@@ -1,14 +1,14 @@
 from pydub import AudioSegment
-import json
 import os
+from modules.preprocessing.video_segmenter import load_scene_timestamps
 
 def split_audio_by_scenes(full_audio_path, scene_json, output_dir="output/scenes_audio"):
     """
-    Splits the full audio into scene-based chunks using timestamps from the JSON.
+    Splits the full audio into scene-based chunks using the scene timestamps.
 
     Args:
         full_audio_path (str): Path to the full audio file.
-        scene_json (str): Path to the JSON file containing scene timestamps.
+        scene_json (str): Scene timestamp artifact from extract_scenes (or a legacy JSON file).
         output_dir (str): Directory to save the scene-based audio chunks.
 
     Returns:
@@ -18,11 +18,7 @@ def split_audio_by_scenes(full_audio_path, scene_json, output_dir="output/scenes
     audio = AudioSegment.from_wav(full_audio_path)
     output_files = []
 
-    with open(scene_json, 'r') as f:
-        try:
-            scenes = json.load(f)
-        except json.JSONDecodeError:
-            scenes = []
+    scenes = load_scene_timestamps(scene_json)
 
     if not scenes:
         # No scenes — save full audio as one file
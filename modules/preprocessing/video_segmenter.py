@@ -1,27 +1,47 @@
 from scenedetect import detect, ContentDetector
 import json
 import os
+from utils.artifact_store import save_artifact, load_artifact
 
 
-def extract_scenes(video_path, output_json='output/scene_timestamps.json', threshold=15.0):
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_json), exist_ok=True)
+def extract_scenes(video_path, output_path='output/scene_timestamps', threshold=15.0):
+    """
+    Detects scenes and stores their boundaries as a binary artifact
+    (float64 start_time / end_time arrays, scene names in the manifest).
 
+    Returns:
+        str: Artifact directory, for load_scene_timestamps.
+    """
     # Detect scenes using content-based detection
     scene_list = detect(video_path, ContentDetector(threshold=threshold))
 
-    # Convert scene start/end times to seconds and prepare JSON
-    scene_timestamps = [
-        {
-            "scene": f"scene{i + 1}",
-            "start_time": start.get_seconds(),
-            "end_time": end.get_seconds()
-        }
-        for i, (start, end) in enumerate(scene_list)
-    ]
+    # Scene start/end times in seconds
+    starts = [start.get_seconds() for start, _ in scene_list]
+    ends = [end.get_seconds() for _, end in scene_list]
+    scenes = [f"scene{i + 1}" for i in range(len(scene_list))]
+
+    save_artifact(output_path, {"start_time": starts, "end_time": ends}, meta={"scenes": scenes},
+                  keep_dtype=("start_time", "end_time"))
+
+    return output_path  # Return path to the artifact for chaining or logging
 
-    # Save scene timestamps as JSON
-    with open(output_json, 'w') as f:
-        json.dump(scene_timestamps, f, indent=2)
 
-    return output_json  # Return path to JSON for chaining or logging
+def load_scene_timestamps(path):
+    """
+    Scene list [{scene, start_time, end_time}] from an artifact written by
+    extract_scenes, or from a legacy scene_timestamps.json file.
+    """
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    arrays, manifest = load_artifact(path, mmap=False)
+    if manifest is None:
+        return []
+    return [
+        {"scene": scene, "start_time": start, "end_time": end}
+        for scene, start, end in zip(manifest["scenes"], arrays["start_time"].tolist(), arrays["end_time"].tolist())
+    ]
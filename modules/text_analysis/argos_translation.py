@@ -0,0 +1,129 @@
+"""
+Argos Translate without network access at translation time.
+
+Language pairs are resolved once per process from the locally installed
+packages, and every resolved translator is kept warm, keyed by (from, to).
+Downloading or installing packages is a separate provisioning step that is
+never triggered by a translation call:
+
+    # With network access: fetch the index and install pairs
+    python -m modules.text_analysis.argos_translation --pairs en:hi en:ta --update-index
+
+    # Air-gapped: install .argosmodel files copied to the worker
+    python -m modules.text_analysis.argos_translation --from-dir /mnt/argos_packages
+"""
+import os
+import argparse
+import threading
+import argostranslate.package
+import argostranslate.translate
+
+PIVOT_LANGUAGE = "en"
+
+_translators = {}
+_installed = None
+_lock = threading.Lock()
+
+
+def _installed_languages():
+    global _installed
+    if _installed is None:
+        _installed = {lang.code: lang for lang in argostranslate.translate.get_installed_languages()}
+    return _installed
+
+
+def get_argos_translator(from_code, to_code):
+    """
+    Warm translator for a language pair, resolved from installed packages only.
+
+    A pair without a direct package is composed through PIVOT_LANGUAGE when both
+    halves are installed.
+
+    Raises:
+        ValueError: If the pair is not installed; run the provisioning step.
+    """
+    key = (from_code, to_code)
+    translator = _translators.get(key)
+    if translator is not None:
+        return translator
+
+    with _lock:
+        if key in _translators:
+            return _translators[key]
+        languages = _installed_languages()
+        source, target = languages.get(from_code), languages.get(to_code)
+        translator = source.get_translation(target) if source and target else None
+
+        pivot = languages.get(PIVOT_LANGUAGE)
+        if translator is None and source and target and pivot and PIVOT_LANGUAGE not in key:
+            first, second = source.get_translation(pivot), pivot.get_translation(target)
+            if first and second:
+                translator = argostranslate.translate.CompositeTranslation(first, second)
+
+        if translator is None:
+            raise ValueError(f"Argos package {from_code}->{to_code} is not installed. Provision it with "
+                             f"'python -m modules.text_analysis.argos_translation --pairs {from_code}:{to_code}'.")
+        _translators[key] = translator
+        return translator
+
+
+def translate_argos(text, from_code, to_code):
+    return get_argos_translator(from_code, to_code).translate(text)
+
+
+def installed_pairs():
+    """
+    (from, to) codes of every installed direct package.
+    """
+    return sorted((pkg.from_code, pkg.to_code) for pkg in argostranslate.package.get_installed_packages())
+
+
+def provision_argos_packages(pairs=(), package_dir=None, update_index=False):
+    """
+    Installs Argos packages; the only place where packages are fetched or installed.
+
+    Args:
+        pairs (Iterable[tuple]): (from, to) codes to install from the package index.
+        package_dir (str): Directory of .argosmodel files to install (air-gapped workers).
+        update_index (bool): Download a fresh package index first; otherwise the
+            locally cached index is used.
+
+    Returns:
+        List[tuple]: Installed (from, to) pairs afterwards.
+    """
+    global _installed
+    if package_dir:
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith(".argosmodel"):
+                print(f"[INFO] Installing {name}")
+                argostranslate.package.install_from_path(os.path.join(package_dir, name))
+
+    missing = [pair for pair in pairs if tuple(pair) not in set(installed_pairs())]
+    if missing:
+        if update_index:
+            argostranslate.package.update_package_index()
+        available = {(pkg.from_code, pkg.to_code): pkg for pkg in argostranslate.package.get_available_packages()}
+        for pair in missing:
+            package = available.get(tuple(pair))
+            if package is None:
+                print(f"⚠️  No Argos package for {pair[0]}->{pair[1]} in the local index")
+                continue
+            print(f"[INFO] Downloading and installing {pair[0]}->{pair[1]}")
+            argostranslate.package.install_from_path(package.download())
+
+    # Resolve again on next use
+    with _lock:
+        _installed = None
+        _translators.clear()
+    return installed_pairs()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provision Argos Translate packages.")
+    parser.add_argument("--pairs", nargs="*", default=[], help="Language pairs as from:to, e.g. en:hi")
+    parser.add_argument("--from-dir", help="Install every .argosmodel file in this directory")
+    parser.add_argument("--update-index", action="store_true", help="Download a fresh package index first")
+    args = parser.parse_args()
+
+    pairs = [tuple(pair.split(":", 1)) for pair in args.pairs]
+    print(f"Installed pairs: {provision_argos_packages(pairs, args.from_dir, args.update_index)}")
@@ -1,7 +1,81 @@
 import whisper
+import numpy as np
+from functools import lru_cache
+from models.compiled_generation import COMPILED_GENERATION, compile_whisper
+from models.batching_server import model_lock
+from modules.audio_analysis.voice_activity import detect_speech_regions, pack_speech_regions, map_to_original
+from utils.tracing import span, set_cache, lru_cache_hit
 
-def transcribe_audio(audio_path):
-    model = whisper.load_model("large")  # "large" is a more powerful model compared to "base"
-    result = model.transcribe(audio_path)
-    return result["text"], result["segments"]
+ASR_MODEL_NAME = "large"  # "large" is a more powerful model compared to "base"
 
+
+@lru_cache(maxsize=None)
+def load_asr_model(name=ASR_MODEL_NAME):
+    """
+    Loads the Whisper model once per process (optionally compiled).
+    """
+    model = whisper.load_model(name)
+    if COMPILED_GENERATION:
+        compile_whisper(model)
+    return model
+
+
+def warm_up_asr():
+    """
+    Runs one transcription on silence so compilation happens at worker start.
+    """
+    if COMPILED_GENERATION:
+        with model_lock(f"whisper:{ASR_MODEL_NAME}"):
+            load_asr_model().transcribe(np.zeros(whisper.audio.SAMPLE_RATE * 2, dtype=np.float32))
+        print("[INFO] ASR warm-up done")
+
+
+def _remap_segments(segments, timestamp_map):
+    """
+    Moves segment and word timestamps from the packed timeline back to the original one.
+    """
+    for seg in segments:
+        seg["start"], seg["end"] = map_to_original([seg["start"], seg["end"]], timestamp_map).tolist()
+        for word in seg.get("words", []):
+            word["start"], word["end"] = map_to_original([word["start"], word["end"]], timestamp_map).tolist()
+    return segments
+
+
+def transcribe_audio(audio_path, vad=True, word_timestamps=False):
+    """
+    Transcribes an audio file with Whisper.
+
+    With vad=True only detected speech regions are decoded: they are packed into
+    one waveform and the segment (and word) timestamps are mapped back to the
+    original timeline, so music beds, long silences and applause cost nothing.
+
+    Args:
+        audio_path (str): Path to the audio file.
+        vad (bool): Gate Whisper with voice activity detection.
+        word_timestamps (bool): Also return per-word timings inside each segment.
+
+    Returns:
+        tuple: (text, segments)
+    """
+    set_cache("asr_model", lru_cache_hit(load_asr_model))
+    model = load_asr_model()
+    lock = model_lock(f"whisper:{ASR_MODEL_NAME}")
+    if not vad:
+        with lock:
+            result = model.transcribe(audio_path, word_timestamps=word_timestamps)
+        return result["text"], result["segments"]
+
+    sr = whisper.audio.SAMPLE_RATE
+    audio = whisper.load_audio(audio_path)
+    with span("asr.vad", audio_seconds=len(audio) / sr):
+        regions = detect_speech_regions(audio, sr)
+    if not regions:
+        print(f"[INFO] No speech detected in {audio_path}, skipping ASR")
+        return "", []
+
+    packed, timestamp_map = pack_speech_regions(audio, sr, regions)
+    print(f"[INFO] VAD kept {len(packed) / sr:.1f}s of {len(audio) / sr:.1f}s audio in {len(regions)} regions")
+
+    with span("asr.whisper", audio_seconds=len(packed) / sr), lock:
+        result = model.transcribe(packed, word_timestamps=word_timestamps)
+    return result["text"], _remap_segments(result["segments"], timestamp_map)
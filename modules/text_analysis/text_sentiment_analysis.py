@@ -1,5 +1,5 @@
 import asyncio
-import concurrent.futures
+import torch
 import spacy
 spacy_model = spacy.load("en_core_web_sm")
 import textstat
@@ -7,37 +7,70 @@ from langdetect import detect
 from textblob import TextBlob
 from rake_nltk import Rake
 from keybert import KeyBERT
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-import argostranslate.package
-import argostranslate.translate
+from transformers import pipeline, AutoTokenizer
+from transformers.modeling_outputs import BaseModelOutput
 from googletrans import Translator, LANGUAGES
 from modules.text_analysis.translator import detect_and_translate
+from modules.text_analysis.argos_translation import translate_argos
+from models.inference_backends import get_backend, load_seq2seq_model, load_sequence_classifier
+from models.compiled_generation import (
+    COMPILED_GENERATION, INPUT_BUCKETS, enable_compiled_generation, tokenize_bucketed
+)
+from models.batching_server import MICRO_BATCHING, get_batcher, model_lock
 # NLTK Setup
 import nltk
 nltk.download('stopwords', quiet=True)
 nltk.download('punkt', quiet=True)
 
 # Load NLP models
-emotion_model = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", top_k=5)
+TEXT_EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+NLLB_MODEL = "facebook/nllb-200-distilled-600M"
+
+emotion_model = pipeline(
+    "text-classification",
+    model=load_sequence_classifier(TEXT_EMOTION_MODEL, get_backend("text_emotion")),
+    tokenizer=AutoTokenizer.from_pretrained(TEXT_EMOTION_MODEL),
+    top_k=5
+)
 kw_model = KeyBERT()
 
+# Result fields of analyze / analyze_many
+ANALYSIS_FIELDS = (
+    "language_detected", "sentiment", "emotions", "keywords_rake", "keywords_bert",
+    "entities", "dependency_parse", "readability_score", "translated_text"
+)
+EMOTION_BATCH_SIZE = 32
+SPACY_BATCH_SIZE = 64
+
 class UnifiedTextAnalysis:
-    def __init__(self, translation_backend="nllb"):
+    def __init__(self, translation_backend="nllb", nllb_backend=None, compiled_generation=None, micro_batching=None):
+        """
+        Args:
+            translation_backend (str): 'nllb', 'google' or 'argos'.
+            nllb_backend (str): Inference backend for NLLB ('fp32', 'int8', 'onnx');
+                defaults to the configured models.inference_backends.MODEL_BACKENDS value.
+            compiled_generation (bool): Static-cache compiled NLLB decoding;
+                defaults to models.compiled_generation.COMPILED_GENERATION.
+            micro_batching (bool): Send single get_emotions / NLLB translate_text calls
+                through the shared models.batching_server queues, so concurrent jobs
+                share forward passes; defaults to models.batching_server.MICRO_BATCHING.
+        """
         self.rake = Rake()
         self.spacy_model = spacy_model
         self.emotion_model = emotion_model
         self.kw_model = kw_model
         self.translation_backend = translation_backend
+        self.micro_batching = MICRO_BATCHING if micro_batching is None else micro_batching
 
         # Translation setup
         self.translator_google = Translator()
 
         if translation_backend == "nllb":
-            self.tokenizer = AutoTokenizer.from_pretrained("facebook/nllb-200-distilled-600M")
-            self.model = AutoModelForSeq2SeqLM.from_pretrained("facebook/nllb-200-distilled-600M")
-        elif translation_backend == "argos":
-            argostranslate.package.update_package_index()
-            self.available_packages = argostranslate.package.get_available_packages()
+            self.tokenizer = AutoTokenizer.from_pretrained(NLLB_MODEL)
+            self.model = load_seq2seq_model(NLLB_MODEL, get_backend("nllb", nllb_backend))
+            self.compiled_generation = COMPILED_GENERATION if compiled_generation is None else compiled_generation
+            if self.compiled_generation and isinstance(self.model, torch.nn.Module):
+                enable_compiled_generation(self.model)
 
     # --- Core NLP Methods ---
 
@@ -53,10 +86,17 @@ class UnifiedTextAnalysis:
 
     def get_emotions(self, text):
         try:
-            return self.emotion_model(text)[0]
+            if self.micro_batching:
+                return get_batcher("text_emotion", self._emotion_batch).run(text)
+            with model_lock("text_emotion"):
+                return self.emotion_model(text)[0]
         except Exception:
             return []
 
+    def _emotion_batch(self, _, texts):
+        with model_lock("text_emotion"):
+            return self.emotion_model(texts, batch_size=len(texts), truncation=True)
+
     def extract_rake_keywords(self, text):
         self.rake.extract_keywords_from_text(text)
         return self.rake.get_ranked_phrases()
@@ -70,13 +110,19 @@ class UnifiedTextAnalysis:
     def get_entities(self, text):
         if not self.spacy_model:
             return []
-        doc = self.spacy_model(text)
-        return [(ent.text, ent.label_) for ent in doc.ents]
+        return self._entities_from_doc(self.spacy_model(text))
 
     def get_dependency_parse(self, text):
         if not self.spacy_model:
             return []
-        doc = self.spacy_model(text)
+        return self._dependency_parse_from_doc(self.spacy_model(text))
+
+    @staticmethod
+    def _entities_from_doc(doc):
+        return [(ent.text, ent.label_) for ent in doc.ents]
+
+    @staticmethod
+    def _dependency_parse_from_doc(doc):
         return [{
             "token": token.text,
             "lemma": token.lemma_,
@@ -113,62 +159,272 @@ class UnifiedTextAnalysis:
         }
         return mapping.get(lang, 'eng_Latn')
 
+    def translate_nllb(self, texts, src, tgt, max_length=512):
+        """
+        Batched NLLB generation with NLLB language codes. With compiled generation
+        the inputs are padded to a fixed bucket length.
+        """
+        # src_lang is tokenizer state shared by every caller of this model
+        with self._nllb_lock():
+            self.tokenizer.src_lang = src
+            if self.compiled_generation:
+                inputs = tokenize_bucketed(self.tokenizer, texts)
+            else:
+                inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+
+            with torch.inference_mode():
+                tokens = self.model.generate(
+                    **inputs,
+                    forced_bos_token_id=self.tokenizer.convert_tokens_to_ids(tgt),
+                    max_length=max_length
+                )
+        return self.tokenizer.batch_decode(tokens, skip_special_tokens=True)
+
+    def _nllb_lock(self):
+        return model_lock(f"nllb:{id(self.model)}")
+
+    def translate_nllb_multi(self, texts, src, tgts, max_length=512):
+        """
+        Translates a batch of texts into several target languages in one generate call.
+
+        The source batch is encoded once and the encoder states are repeated per
+        target; every row gets its own target-language token as decoder prefix
+        (instead of a single forced_bos_token_id for the whole batch).
+
+        Returns:
+            dict: NLLB target code -> list of translations aligned with texts.
+        """
+        with self._nllb_lock():
+            self.tokenizer.src_lang = src
+            if self.compiled_generation:
+                inputs = tokenize_bucketed(self.tokenizer, texts)
+            else:
+                inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+
+            n_targets = len(tgts)
+            start_id = self.model.config.decoder_start_token_id
+            decoder_input_ids = torch.tensor(
+                [[start_id, self.tokenizer.convert_tokens_to_ids(tgt)] for tgt in tgts for _ in texts]
+            )
+            attention_mask = inputs["attention_mask"].repeat(n_targets, 1)
+
+            with torch.inference_mode():
+                if isinstance(self.model, torch.nn.Module):
+                    hidden = self.model.get_encoder()(**inputs).last_hidden_state
+                    tokens = self.model.generate(
+                        encoder_outputs=BaseModelOutput(last_hidden_state=hidden.repeat(n_targets, 1, 1)),
+                        attention_mask=attention_mask,
+                        decoder_input_ids=decoder_input_ids,
+                        max_length=max_length
+                    )
+                else:
+                    # Exported ONNX graphs run their own encoder; repeat the inputs instead
+                    tokens = self.model.generate(
+                        input_ids=inputs["input_ids"].repeat(n_targets, 1),
+                        attention_mask=attention_mask,
+                        decoder_input_ids=decoder_input_ids,
+                        max_length=max_length
+                    )
+
+        decoded = self.tokenizer.batch_decode(tokens, skip_special_tokens=True)
+        return {tgt: decoded[i * len(texts):(i + 1) * len(texts)] for i, tgt in enumerate(tgts)}
+
+    def translate_batch(self, texts, target_languages, source_lang='auto', batch_size=16):
+        """
+        Translates many texts into many target languages, batching all targets together.
+
+        Args:
+            texts (List[str]): Source texts.
+            target_languages (List[str]): Short codes, e.g. ['hi', 'ta'].
+            source_lang (str | List[str]): Short code, 'auto' to detect per text, or one code per text.
+            batch_size (int): Source texts per generate call (each is decoded once per target).
+
+        Returns:
+            dict: target language -> list of translations aligned with texts.
+        """
+        results = {lang: [None] * len(texts) for lang in target_languages}
+        if isinstance(source_lang, (list, tuple)):
+            sources = list(source_lang)
+        else:
+            sources = [self.detect_language(text) if source_lang == 'auto' else source_lang for text in texts]
+
+        if self.translation_backend != "nllb":
+            async def _translate_all():
+                for i, (text, src) in enumerate(zip(texts, sources)):
+                    for lang in target_languages:
+                        results[lang][i] = await self.translate_text(text, source_lang=src, target_lang=lang)
+            asyncio.run(_translate_all())
+            return results
+
+        tgt_codes = {lang: self.get_nllb_lang_code(lang) for lang in target_languages}
+        by_source = {}
+        for i, src in enumerate(sources):
+            by_source.setdefault(self.get_nllb_lang_code(src), []).append(i)
+
+        for src, indices in by_source.items():
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                translated = self.translate_nllb_multi([texts[i] for i in batch], src, list(set(tgt_codes.values())))
+                for lang, code in tgt_codes.items():
+                    for i, text in zip(batch, translated[code]):
+                        results[lang][i] = text
+        return results
+
+    def warm_up(self, buckets=INPUT_BUCKETS[:4], tgt='hin_Deva'):
+        """
+        Triggers compilation for the common input buckets at worker start
+        instead of on the first real request.
+        """
+        if self.translation_backend != "nllb" or not self.compiled_generation:
+            return
+        for bucket in buckets:
+            self.translate_nllb(["hello " * max(bucket - 4, 1)], 'eng_Latn', tgt)
+        print(f"[INFO] NLLB warm-up done for buckets {list(buckets)}")
+
     async def translate_text(self, text, source_lang='auto', target_lang='en'):
         if source_lang == 'auto':
             source_lang = self.detect_language(text)
 
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
 
+        # Blocking work goes to the loop's shared default executor
         if self.translation_backend == "google":
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                translation = await loop.run_in_executor(pool, lambda: self.translator_google.translate(text, dest=target_lang, src=source_lang))
-                return translation.text
+            translation = await loop.run_in_executor(None, lambda: self.translator_google.translate(text, dest=target_lang, src=source_lang))
+            return translation.text
 
         elif self.translation_backend == "nllb":
             src = self.get_nllb_lang_code(source_lang)
             tgt = self.get_nllb_lang_code(target_lang)
 
+            if self.micro_batching:
+                # Batched with concurrent requests for the same language pair
+                batcher = get_batcher(f"nllb:{id(self.model)}", self._nllb_batch)
+                return await asyncio.wrap_future(batcher.submit(text, key=(src, tgt)))
+
             def _translate():
-                translator = pipeline("translation", model=self.model, tokenizer=self.tokenizer, src_lang=src, tgt_lang=tgt)
-                result = translator(text, max_length=512)
-                return result[0]['translation_text']
+                return self.translate_nllb([text], src, tgt, max_length=512)[0]
 
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                return await loop.run_in_executor(pool, _translate)
+            return await loop.run_in_executor(None, _translate)
 
         elif self.translation_backend == "argos":
-            def _translate():
-                package = next((pkg for pkg in self.available_packages if pkg.from_code == source_lang and pkg.to_code == target_lang), None)
-                if package and not package.is_installed():
-                    argostranslate.package.install_from_path(package.download())
-                return argostranslate.translate.translate(text, source_lang, target_lang)
-
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                return await loop.run_in_executor(pool, _translate)
+            # Warm translator from installed packages; never downloads here
+            return await loop.run_in_executor(None, translate_argos, text, source_lang, target_lang)
 
         return text  # fallback
 
+    def _nllb_batch(self, key, texts):
+        src, tgt = key
+        return self.translate_nllb(texts, src, tgt, max_length=512)
+
     # --- Full Analysis ---
 
-    async def analyze(self, text, target_language='en'):
+    def analyze_source(self, text):
+        """
+        Language-independent analysis of the source text (everything except translation).
+        """
         if isinstance(text, tuple):
             text = text[0]
 
-        detected_lang = self.detect_language(text)
-        translated_text = await self.translate_text(text, source_lang=detected_lang, target_lang=target_language)
-
         return {
-            "language_detected": detected_lang,
+            "language_detected": self.detect_language(text),
             "sentiment": self.get_sentiment(text),
             "emotions": self.get_emotions(text),
             "keywords_rake": self.extract_rake_keywords(text),
             "keywords_bert": self.extract_keybert_keywords(text),
             "entities": self.get_entities(text),
             "dependency_parse": self.get_dependency_parse(text),
-            "readability_score": self.get_readability(text),
-            "translated_text": translated_text
+            "readability_score": self.get_readability(text)
         }
 
+    async def analyze(self, text, target_language='en'):
+        if isinstance(text, tuple):
+            text = text[0]
+
+        # Blocking models run off the event loop, so concurrent analyses overlap
+        result = await asyncio.get_running_loop().run_in_executor(None, self.analyze_source, text)
+        result["translated_text"] = await self.translate_text(
+            text, source_lang=result["language_detected"], target_lang=target_language
+        )
+        return result
+
+    def analyze_many(self, texts, target_language=None, fields=ANALYSIS_FIELDS, emotion_batch_size=EMOTION_BATCH_SIZE,
+                     spacy_processes=1, translation_batch_size=16):
+        """
+        Corpus version of analyze: the same fields for many texts, with every model batched.
+
+        The emotion classifier runs over the whole list in batches, spaCy streams
+        the texts through nlp.pipe (optionally in several processes) and each doc
+        serves both entities and the dependency parse, KeyBERT embeds all
+        documents in one call, and translation goes through translate_batch.
+
+        Args:
+            texts (List[str]): Texts to analyze.
+            target_language (str): Short code for 'translated_text'; translation is skipped when None.
+            fields (Iterable[str]): Subset of ANALYSIS_FIELDS to compute.
+            emotion_batch_size (int): Texts per emotion classifier forward pass.
+            spacy_processes (int): Worker processes for spacy_model.pipe.
+            translation_batch_size (int): Texts per translation generate call.
+
+        Returns:
+            List[dict]: One result per text, in input order.
+        """
+        texts = [text[0] if isinstance(text, tuple) else text for text in texts]
+        fields = [field for field in ANALYSIS_FIELDS if field in set(fields)]
+        if target_language is None and "translated_text" in fields:
+            fields.remove("translated_text")
+        results = [{} for _ in texts]
+        if not texts:
+            return results
+
+        def _fill(field, values):
+            for result, value in zip(results, values):
+                result[field] = value
+
+        languages = [self.detect_language(text) for text in texts]
+        if "language_detected" in fields:
+            _fill("language_detected", languages)
+        if "sentiment" in fields:
+            _fill("sentiment", [self.get_sentiment(text) for text in texts])
+
+        if "emotions" in fields:
+            try:
+                with model_lock("text_emotion"):
+                    emotions = self.emotion_model(texts, batch_size=emotion_batch_size, truncation=True)
+                _fill("emotions", emotions)
+            except Exception:
+                _fill("emotions", [self.get_emotions(text) for text in texts])
+
+        if "keywords_rake" in fields:
+            _fill("keywords_rake", [self.extract_rake_keywords(text) for text in texts])
+
+        if "keywords_bert" in fields:
+            try:
+                keywords = self.kw_model.extract_keywords(texts, top_n=5)
+                # KeyBERT returns a flat list for a single document
+                keywords = [keywords] if len(texts) == 1 else keywords
+                _fill("keywords_bert", [[kw[0] for kw in doc_keywords] for doc_keywords in keywords])
+            except Exception:
+                _fill("keywords_bert", [self.extract_keybert_keywords(text) for text in texts])
+
+        if "entities" in fields or "dependency_parse" in fields:
+            docs = (self.spacy_model.pipe(texts, batch_size=SPACY_BATCH_SIZE, n_process=spacy_processes)
+                    if self.spacy_model else [None] * len(texts))
+            for result, doc in zip(results, docs):
+                if "entities" in fields:
+                    result["entities"] = self._entities_from_doc(doc) if doc is not None else []
+                if "dependency_parse" in fields:
+                    result["dependency_parse"] = self._dependency_parse_from_doc(doc) if doc is not None else []
+
+        if "readability_score" in fields:
+            _fill("readability_score", [self.get_readability(text) for text in texts])
+
+        if "translated_text" in fields:
+            translations = self.translate_batch(texts, [target_language], source_lang=languages,
+                                                batch_size=translation_batch_size)
+            _fill("translated_text", translations[target_language])
+
+        return [{field: result[field] for field in fields} for result in results]
+
 # # Example Usage
 # if __name__ == "__main__":
 #     async def run():
@@ -177,3 +433,8 @@ class UnifiedTextAnalysis:
 #         print(result)
 #
 #     asyncio.run(run())
+#
+#     # Many texts at once, every model batched
+#     analyzer = UnifiedTextAnalysis(translation_backend="nllb")
+#     results = analyzer.analyze_many(["I love this!", "This is terrible."], target_language="hi",
+#                                     fields=("sentiment", "emotions", "translated_text"))
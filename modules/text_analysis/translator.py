@@ -1,14 +1,16 @@
 import asyncio
 import concurrent.futures
 from langdetect import detect
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-import argostranslate.package
-import argostranslate.translate
+from transformers import pipeline, AutoTokenizer
 from googletrans import Translator
+from modules.text_analysis.argos_translation import translate_argos
+from models.inference_backends import get_backend, load_seq2seq_model
+from models.batching_server import model_lock
 
 # --- Setup Translation Models ---
+# NLLB runs on the configured backend (fp32 / int8 / onnx), see models.inference_backends
 nllb_tokenizer = AutoTokenizer.from_pretrained("facebook/nllb-200-distilled-600M")
-nllb_model = AutoModelForSeq2SeqLM.from_pretrained("facebook/nllb-200-distilled-600M")
+nllb_model = load_seq2seq_model("facebook/nllb-200-distilled-600M", get_backend("nllb"))
 translator_google = Translator()
 
 # --- Language mapping for NLLB ---
@@ -56,27 +58,18 @@ async def detect_and_translate(text: str, target_lang: str = 'en', backend: str
         tgt = get_nllb_lang_code(target_lang)
 
         def _translate():
-            translator = pipeline("translation", model=nllb_model, tokenizer=nllb_tokenizer, src_lang=src, tgt_lang=tgt)
-            result = translator(text, max_length=512)
+            # The pipeline sets src_lang on the shared tokenizer
+            with model_lock(f"nllb:{id(nllb_model)}"):
+                translator = pipeline("translation", model=nllb_model, tokenizer=nllb_tokenizer, src_lang=src, tgt_lang=tgt)
+                result = translator(text, max_length=512)
             return result[0]['translation_text']
 
         with concurrent.futures.ThreadPoolExecutor() as pool:
             translated_text = await loop.run_in_executor(pool, _translate)
 
     elif backend == "argos":
-        argostranslate.package.update_package_index()
-        available_packages = argostranslate.package.get_available_packages()
-
-        def _translate():
-            package = next(
-                (pkg for pkg in available_packages if pkg.from_code == detected_lang and pkg.to_code == target_lang),
-                None)
-            if package and not package.is_installed():
-                argostranslate.package.install_from_path(package.download())
-            return argostranslate.translate.translate(text, detected_lang, target_lang)
-
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            translated_text = await loop.run_in_executor(pool, _translate)
+        # Installed packages only; provisioning is a separate step (see argos_translation)
+        translated_text = await loop.run_in_executor(None, translate_argos, text, detected_lang, target_lang)
 
     else:
         translated_text = text  # fallback
@@ -1,36 +1,243 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
 import librosa
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from pydub import AudioSegment
+from utils.artifact_store import save_artifact, load_artifact
 
-def get_pitch_and_loudness(audio_path):
+PITCH_BACKENDS = ("pyin", "yin", "praat")
+DEFAULT_PITCH_BACKEND = os.getenv("SUBHASHIT_PITCH_BACKEND", "pyin")
+SAMPLING_RATE = 22050
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+FMIN = 65.41  # C2
+FMAX = 2093.0  # C7
+YIN_THRESHOLD = 0.15
+YIN_MIN_RMS = 1e-4  # -80 dBFS; quieter frames are unvoiced (their difference function is all zero)
+
+# Contours keyed by a hash of the waveform and the tracker settings
+CONTOUR_CACHE_SIZE = 64
+CONTOUR_CACHE_DIR = os.getenv("SUBHASHIT_PITCH_CACHE_DIR")  # optional on-disk cache (memory-mapped artifacts)
+_contour_cache = OrderedDict()
+
+
+def _frame_times(n_frames, sr, hop_length):
+    return (np.arange(n_frames) * hop_length / sr).astype(np.float32)
+
+
+def _pitch_pyin(y, sr, fmin, fmax, frame_length, hop_length):
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        y, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length, hop_length=hop_length
+    )
+    return _frame_times(len(f0), sr, hop_length), f0, voiced_flag, voiced_probs
+
+
+def _pitch_yin(y, sr, fmin, fmax, frame_length, hop_length, threshold=YIN_THRESHOLD, block_frames=4096):
+    """
+    Vectorized YIN: FFT cross-correlation for the difference function of all
+    frames of a block at once, cumulative mean normalization, first dip below
+    the threshold and parabolic refinement. The CMND minimum doubles as an
+    aperiodicity measure, giving a voicing probability like pyin. Frames below
+    YIN_MIN_RMS are unvoiced with probability 0.
     """
-    Extracts pitch (F0) and loudness (RMS energy) from an audio file.
+    window = frame_length // 2
+    tau_min = max(int(np.floor(sr / fmax)), 2)
+    tau_max = min(int(np.ceil(sr / fmin)), window - 1)
+    # Center the integration window (not the whole frame) on the frame time
+    y = np.pad(np.asarray(y, dtype=np.float32), (window // 2, frame_length - window // 2))
+    frames = sliding_window_view(y, frame_length)[::hop_length]
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+    taus = np.arange(window, dtype=np.float32)
+
+    f0 = np.full(len(frames), np.nan, dtype=np.float32)
+    probs = np.zeros(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), block_frames):
+        block = frames[start:start + block_frames].astype(np.float32)
+        # r(tau) = sum_j x[j] x[j + tau] over the first `window` samples
+        spectrum = np.fft.rfft(block, n_fft, axis=1)
+        head = np.fft.rfft(block[:, :window], n_fft, axis=1)
+        r = np.fft.irfft(spectrum * np.conj(head), n_fft, axis=1)[:, :window]
+
+        energy = np.concatenate([np.zeros((len(block), 1), np.float32), np.cumsum(block ** 2, axis=1)], axis=1)
+        e0 = energy[:, window][:, None]
+        e_tau = energy[:, window:window * 2] - energy[:, :window]
+        diff = np.maximum(e0 + e_tau - 2 * r, 0.0)
+
+        cmnd = np.ones_like(diff)
+        cumulative = np.cumsum(diff[:, 1:], axis=1)
+        cmnd[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(cumulative, 1e-12)
+
+        search = cmnd[:, tau_min:tau_max + 1]
+        local_min = np.zeros_like(search, dtype=bool)
+        local_min[:, 1:-1] = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+        candidates = local_min & (search < threshold)
+        audible = np.sqrt(e0[:, 0] / window) > YIN_MIN_RMS
+        has_dip = candidates.any(axis=1) & audible
+        index = np.where(has_dip, candidates.argmax(axis=1), search.argmin(axis=1))
+
+        # Parabolic interpolation around the chosen lag
+        rows = np.arange(len(block))
+        tau = index + tau_min
+        left = cmnd[rows, np.clip(tau - 1, 0, window - 1)]
+        mid = cmnd[rows, tau]
+        right = cmnd[rows, np.clip(tau + 1, 0, window - 1)]
+        denom = left - 2 * mid + right
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+        refined = tau + np.clip(shift, -1, 1)
+
+        block_f0 = sr / refined
+        block_probs = np.where(audible, np.clip(1.0 - mid, 0.0, 1.0), 0.0)
+        f0[start:start + len(block)] = np.where(has_dip, block_f0, np.nan)
+        probs[start:start + len(block)] = block_probs
+
+    voiced_flag = ~np.isnan(f0)
+    return _frame_times(len(f0), sr, hop_length), f0, voiced_flag, probs
+
+
+def _pitch_praat(y, sr, fmin, fmax, frame_length, hop_length):
+    import parselmouth
+
+    pitch = parselmouth.Sound(np.asarray(y, dtype=np.float64), sampling_frequency=sr).to_pitch_ac(
+        time_step=hop_length / sr, pitch_floor=fmin, pitch_ceiling=fmax
+    )
+    selected = pitch.selected_array
+    f0 = selected["frequency"].astype(np.float32)
+    voiced_flag = f0 > 0
+    f0[~voiced_flag] = np.nan
+    return pitch.xs().astype(np.float32), f0, voiced_flag, selected["strength"].astype(np.float32)
+
+
+_PITCH_TRACKERS = {"pyin": _pitch_pyin, "yin": _pitch_yin, "praat": _pitch_praat}
+
+
+def _cache_key(y, sr, backend, fmin, fmax, frame_length, hop_length):
+    digest = hashlib.sha1(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    digest.update(f"{sr}:{backend}:{fmin}:{fmax}:{frame_length}:{hop_length}".encode())
+    return digest.hexdigest()
+
+
+def _cache_get(key):
+    if key in _contour_cache:
+        _contour_cache.move_to_end(key)
+        return _contour_cache[key]
+    if CONTOUR_CACHE_DIR:
+        contours, _ = load_artifact(os.path.join(CONTOUR_CACHE_DIR, key))
+        if contours is not None:
+            return _cache_put(key, contours, persist=False)
+    return None
+
+
+def _cache_put(key, contours, persist=True):
+    _contour_cache[key] = contours
+    _contour_cache.move_to_end(key)
+    while len(_contour_cache) > CONTOUR_CACHE_SIZE:
+        _contour_cache.popitem(last=False)
+    if CONTOUR_CACHE_DIR and persist:
+        save_artifact(os.path.join(CONTOUR_CACHE_DIR, key), contours)
+    return contours
+
+
+def get_pitch_and_loudness(audio, sr=SAMPLING_RATE, backend=None, decimate=1, fmin=FMIN, fmax=FMAX,
+                           frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, use_cache=True):
+    """
+    Extracts pitch (F0) and loudness (RMS energy) from an audio file or waveform.
 
     Args:
-        audio_path (str): Path to the input audio file.
+        audio (str | np.ndarray): Path to the input audio file, or a mono waveform at `sr`.
+        sr (int): Analysis sampling rate.
+        backend (str): 'pyin' (probabilistic, slowest), 'yin' (vectorized) or 'praat'
+            (parselmouth autocorrelation); defaults to DEFAULT_PITCH_BACKEND.
+        decimate (int): Keep every n-th frame of the returned contours.
+        use_cache (bool): Reuse contours of identical audio and settings.
 
     Returns:
-        dict: A dictionary containing pitch and loudness information.
+        dict: float32 arrays 'times', 'pitch_f0' (NaN when unvoiced), 'pitch_voiced_probs',
+        'loudness_rms' and the boolean 'pitch_voiced_flag', or None on failure.
     """
+    backend = backend or DEFAULT_PITCH_BACKEND
+    if backend not in PITCH_BACKENDS:
+        raise ValueError(f"Unknown pitch backend '{backend}'. Choose from {PITCH_BACKENDS}.")
+
     try:
-        y, sr = librosa.load(audio_path)
+        if isinstance(audio, str):
+            y, sr = librosa.load(audio, sr=sr)
+        else:
+            y = np.asarray(audio, dtype=np.float32)
 
-        # Pitch (F0) estimation
-        f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=librosa.note_to_hz('C2'), fmax=librosa.note_to_hz('C7'))
+        key = _cache_key(y, sr, backend, fmin, fmax, frame_length, hop_length) if use_cache else None
+        contours = _cache_get(key) if use_cache else None
+        if contours is None:
+            times, f0, voiced_flag, voiced_probs = _PITCH_TRACKERS[backend](y, sr, fmin, fmax, frame_length, hop_length)
 
-        # Loudness (RMS energy)
-        rms = librosa.feature.rms(y=y)[0]
+            # Loudness (RMS energy) on the pitch frame grid
+            rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+            rms_times = _frame_times(len(rms), sr, hop_length)
+            if len(rms) != len(times) or backend == "praat":
+                rms = np.interp(times, rms_times, rms)
 
-        return {
-            "pitch_f0": f0.tolist(),
-            "pitch_voiced_flag": voiced_flag.tolist(),
-            "pitch_voiced_probs": voiced_probs.tolist(),
-            "loudness_rms": rms.tolist()
-        }
+            contours = {
+                "times": np.asarray(times, dtype=np.float32),
+                "pitch_f0": np.asarray(f0, dtype=np.float32),
+                "pitch_voiced_flag": np.asarray(voiced_flag, dtype=bool),
+                "pitch_voiced_probs": np.asarray(voiced_probs, dtype=np.float32),
+                "loudness_rms": np.asarray(rms, dtype=np.float32),
+            }
+            if use_cache:
+                contours = _cache_put(key, contours)
+
+        if decimate > 1:
+            return {name: values[::decimate] for name, values in contours.items()}
+        return dict(contours)
     except Exception as e:
         print(f"Error extracting pitch and loudness: {e}")
         return None
 
+
+def compare_pitch_backends(audio_path, backends=PITCH_BACKENDS, reference="pyin", repeats=1, sr=SAMPLING_RATE):
+    """
+    Speed and agreement of the pitch backends against a reference backend.
+
+    Accuracy per backend: voicing agreement with the reference, gross pitch error
+    rate (frames voiced in both whose F0 differs by more than 20%) and median
+    absolute deviation in cents on the remaining frames.
+
+    Returns:
+        dict: backend -> {seconds, realtime_factor, voicing_agreement, gross_error_rate, median_cents}
+    """
+    y, sr = librosa.load(audio_path, sr=sr)
+    duration = len(y) / sr
+    results, contours = {}, {}
+    for backend in [reference] + [b for b in backends if b != reference]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            contours[backend] = get_pitch_and_loudness(y, sr=sr, backend=backend, use_cache=False)
+        seconds = (time.perf_counter() - start) / repeats
+        results[backend] = {"seconds": round(seconds, 4), "realtime_factor": round(seconds / duration, 4)}
+
+    ref = contours[reference]
+    for backend, result in results.items():
+        if backend == reference:
+            continue
+        current = contours[backend]
+        # Praat frames sit on their own time grid
+        f0 = np.interp(ref["times"], current["times"], np.nan_to_num(current["pitch_f0"]), left=0, right=0)
+        voiced = np.interp(ref["times"], current["times"], current["pitch_voiced_flag"].astype(np.float32)) > 0.5
+        ref_voiced = ref["pitch_voiced_flag"]
+        both = voiced & ref_voiced & (f0 > 0)
+
+        cents = np.abs(1200 * np.log2(f0[both] / ref["pitch_f0"][both])) if both.any() else np.array([])
+        gross = np.abs(f0[both] / ref["pitch_f0"][both] - 1) > 0.2 if both.any() else np.array([])
+        result.update({
+            "voicing_agreement": round(float(np.mean(voiced == ref_voiced)), 4),
+            "gross_error_rate": round(float(np.mean(gross)), 4) if gross.size else None,
+            "median_cents": round(float(np.median(cents[~gross])), 2) if gross.size and (~gross).any() else None,
+        })
+    return results
+
+
 def get_speaking_rate(audio_path, transcription_text):
     """
     Estimates speaking rate (words per minute) from an audio file and its transcription.
@@ -85,6 +292,10 @@ if __name__ == "__main__":
     pitch_loudness = get_pitch_and_loudness(audio_file)
     print(f"Pitch and Loudness: {pitch_loudness}")
 
+    # Speed and accuracy of the pitch backends against pyin
+    for backend, result in compare_pitch_backends(audio_file, backends=("pyin", "yin")).items():
+        print(f"{backend}: {result}")
+
     transcription = "This is an example sentence for speaking rate calculation."
     speaking_rate = get_speaking_rate(audio_file, transcription)
     print(f"Speaking Rate: {speaking_rate} words per minute")
@@ -0,0 +1,123 @@
+import os
+import json
+import uuid
+import numpy as np
+
+# Binary artifact layout: <artifact_dir>/manifest.json + one <name>.<generation>.npy
+# per array. Arrays load memory-mapped; the manifest holds small metadata only.
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_VERSION = 1
+
+
+def _atomic_write(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_artifact(artifact_dir, arrays, meta=None, keep_dtype=()):
+    """
+    Writes named arrays and a JSON manifest.
+
+    Arrays are written under file names of a fresh generation and the manifest,
+    replaced last, points at them, so a reader always sees one consistent
+    generation. The previous generation's files are kept for readers that loaded
+    the old manifest; older ones are removed.
+
+    Args:
+        artifact_dir (str): Directory of the artifact.
+        arrays (dict): name -> array-like. Floating-point arrays are stored as float32.
+        meta (dict): JSON-serializable metadata (kept small: ids, labels, settings).
+        keep_dtype (Iterable[str]): Arrays stored with their own dtype, e.g. float64
+            timestamps of long recordings.
+
+    Returns:
+        str: artifact_dir
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    keep_dtype = set(keep_dtype)
+    previous = load_manifest(artifact_dir) or {}
+    generation = uuid.uuid4().hex[:12]
+
+    entries = {}
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype.kind == "f" and name not in keep_dtype:
+            array = array.astype(np.float32)
+        array = np.ascontiguousarray(array)
+        file_name = f"{name}.{generation}.npy"
+        _atomic_write(os.path.join(artifact_dir, file_name), lambda f, a=array: np.save(f, a))
+        entries[name] = {"file": file_name, "dtype": str(array.dtype), "shape": list(array.shape)}
+
+    manifest = dict(meta or {}, artifact_version=ARTIFACT_VERSION, generation=generation, arrays=entries)
+    _atomic_write(os.path.join(artifact_dir, MANIFEST_FILE), lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+
+    live = {entry["file"] for entry in entries.values()}
+    live |= {entry.get("file") for entry in previous.get("arrays", {}).values()}
+    for file_name in os.listdir(artifact_dir):
+        if file_name.endswith(".npy") and file_name not in live:
+            try:
+                os.remove(os.path.join(artifact_dir, file_name))
+            except OSError:
+                pass
+    return artifact_dir
+
+
+def load_manifest(artifact_dir):
+    """
+    The artifact's manifest, or None if the artifact does not exist.
+    """
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_artifact(artifact_dir, names=None, mmap=True):
+    """
+    Loads an artifact written by save_artifact.
+
+    Args:
+        names (Iterable[str]): Arrays to load; defaults to all listed in the manifest.
+        mmap (bool): Memory-map the arrays (read-only) instead of reading them.
+
+    Returns:
+        tuple: (arrays dict, manifest), or (None, None) if the artifact does not exist.
+    """
+    manifest = load_manifest(artifact_dir)
+    if manifest is None:
+        return None, None
+
+    entries = manifest.get("arrays", {})
+    names = list(entries) if names is None else list(names)
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(artifact_dir, entries.get(name, {}).get("file", f"{name}.npy")), mmap_mode=mmap_mode)
+        for name in names
+    }
+    return arrays, manifest
+
+
+def records_to_artifact(artifact_dir, records, numeric_keys, text_keys=(), meta=None, keep_dtype=()):
+    """
+    Stores a list of flat dicts column-wise: numeric fields as arrays (float32
+    unless listed in keep_dtype), short text fields in the manifest.
+    """
+    arrays = {key: np.array([record[key] for record in records], dtype=np.float64) for key in numeric_keys}
+    meta = dict(meta or {}, text={key: [record[key] for record in records] for key in text_keys})
+    return save_artifact(artifact_dir, arrays, meta, keep_dtype=keep_dtype)
+
+
+def artifact_to_records(artifact_dir):
+    """
+    Inverse of records_to_artifact.
+    """
+    arrays, manifest = load_artifact(artifact_dir, mmap=False)
+    if manifest is None:
+        return []
+    columns = {key: values.tolist() for key, values in arrays.items()}
+    columns.update(manifest.get("text", {}))
+    count = len(next(iter(columns.values()), []))
+    return [{key: values[i] for key, values in columns.items()} for i in range(count)]
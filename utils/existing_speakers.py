@@ -1,17 +1,180 @@
-from utils.speaker_features import extract_voice_features
+from utils.speaker_features import extract_voice_features, voice_feature_vector, SCALAR_FEATURE_KEYS
+from modules.audio_analysis.speaker_embedding import MODEL_ID
+from utils.artifact_store import save_artifact, load_artifact
 import os
 import json
+import hashlib
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Binary voice store layout (utils.artifact_store): <store_dir>/manifest.json + features and embeddings arrays
+STORE_VERSION = 1
+# Stores written before the embedding model was recorded used ECAPA
+LEGACY_EMBEDDING_MODEL = "ecapa:speechbrain/spkrec-ecapa-voxceleb"
+FEATURE_KEYS = [f"mfcc_{i}" for i in range(13)] + SCALAR_FEATURE_KEYS
+
+
+def file_content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---------------------------
+# Binary Voice Store
+# ---------------------------
+def load_voice_store(store_dir, mmap=True):
+    """
+    Loads a voice store written by create_voice_database.
+
+    Returns:
+        tuple: (manifest, features, embeddings). Matrices are float32 with one row
+        per entry of manifest['voices'], memory-mapped when mmap=True.
+    """
+    arrays, manifest = load_artifact(store_dir, names=("features", "embeddings"), mmap=mmap)
+    if manifest is None:
+        return {"version": STORE_VERSION, "feature_keys": FEATURE_KEYS, "embedding_model": MODEL_ID,
+                "voices": []}, None, None
+    return manifest, arrays["features"], arrays["embeddings"]
+
+
+def save_voice_store(store_dir, manifest, features, embeddings):
+    """
+    Writes the store as one artifact generation, so readers never mix the
+    features of one build with the manifest of another.
+    """
+    save_artifact(store_dir, {"features": features, "embeddings": embeddings}, meta=manifest)
+
+
+def _extract_vectors(path):
+    """
+    Worker: feature and embedding vectors for one file, or None on failure.
+    """
+    try:
+        return voice_feature_vector(extract_voice_features(path))
+    except Exception as e:
+        print(f"⚠️ Skipping {os.path.basename(path)}: {e}")
+        return None
+
+
 # ---------------------------
 # Create Database from Available Voices
 # ---------------------------
-def create_voice_database(voice_dir, output_json="speaker_features.json"):
-    voices_json = {}
-    for fname in os.listdir(voice_dir):
-        if fname.lower().endswith(".wav"):
-            path = os.path.join(voice_dir, fname)
-            print(f"Processing {fname}...")
-            features = extract_voice_features(path)
-            voices_json[fname] = features
-    with open(output_json, "w") as f:
-        json.dump(voices_json, f, indent=2)
-    print(f"Saved to {output_json}")
+def create_voice_database(voice_dir, output_dir="speaker_features", num_workers=None):
+    """
+    Incrementally builds the binary voice store for all WAVs in voice_dir.
+
+    Files whose size and mtime are unchanged are reused without reading them;
+    otherwise the content hash decides whether features are re-extracted. New or
+    changed files are extracted in a process pool. Files that disappeared from
+    voice_dir are dropped.
+
+    Args:
+        voice_dir (str): Directory of reference voice WAVs.
+        output_dir (str): Store directory (manifest.json plus the features and embeddings arrays).
+        num_workers (int): Extraction processes (default: CPU count).
+
+    Returns:
+        str: Path to the store directory.
+    """
+    manifest, features, embeddings = load_voice_store(output_dir, mmap=False)
+    known = {voice["name"]: (row, voice) for row, voice in enumerate(manifest["voices"])}
+    if manifest.get("embedding_model", LEGACY_EMBEDDING_MODEL) != MODEL_ID:
+        # Embeddings from another model are not comparable; extract everything again
+        print(f"Embedding model changed to {MODEL_ID}, re-extracting all voices...")
+        known = {}
+
+    voices, kept_rows, pending = [], [], []
+    for fname in sorted(os.listdir(voice_dir)):
+        if not fname.lower().endswith(".wav"):
+            continue
+        path = os.path.join(voice_dir, fname)
+        stat = os.stat(path)
+        entry = {"name": fname, "size": stat.st_size, "mtime": stat.st_mtime}
+
+        row, previous = known.get(fname, (None, None))
+        if previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+            entry["sha1"] = previous["sha1"]
+        else:
+            entry["sha1"] = file_content_hash(path)
+
+        if previous and previous["sha1"] == entry["sha1"]:
+            voices.append(entry)
+            kept_rows.append(row)
+        else:
+            pending.append((entry, path))
+
+    print(f"Reusing {len(voices)} voices, extracting {len(pending)} new or changed files...")
+
+    new_entries, new_features, new_embeddings = [], [], []
+    if pending:
+        num_workers = num_workers or os.cpu_count() or 1
+        paths = [path for _, path in pending]
+        if num_workers > 1 and len(pending) > 1:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as pool:
+                results = list(pool.map(_extract_vectors, paths))
+        else:
+            results = [_extract_vectors(path) for path in paths]
+
+        for (entry, _), result in zip(pending, results):
+            if result is None:
+                continue
+            new_entries.append(entry)
+            new_features.append(result[0])
+            new_embeddings.append(result[1])
+
+    feature_blocks = [features[kept_rows]] if kept_rows else []
+    embedding_blocks = [embeddings[kept_rows]] if kept_rows else []
+    if new_entries:
+        feature_blocks.append(np.stack(new_features))
+        embedding_blocks.append(np.stack(new_embeddings))
+
+    if feature_blocks:
+        features = np.concatenate(feature_blocks).astype(np.float32)
+        embeddings = np.concatenate(embedding_blocks).astype(np.float32)
+    else:
+        features = np.zeros((0, len(FEATURE_KEYS)), dtype=np.float32)
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    manifest = {
+        "version": STORE_VERSION,
+        "feature_keys": FEATURE_KEYS,
+        "embedding_dim": int(embeddings.shape[1]),
+        "embedding_model": MODEL_ID,
+        "voices": voices + new_entries
+    }
+    save_voice_store(output_dir, manifest, features, embeddings)
+    print(f"Saved {len(manifest['voices'])} voices to {output_dir}")
+    return output_dir
+
+
+def import_voice_database(json_path, output_dir="speaker_features"):
+    """
+    Converts a legacy JSON voice feature database ({name: feature dict}) into the
+    binary store, so it loads memory-mapped instead of being parsed.
+
+    Entries carry no file size or hash; create_voice_database re-extracts them
+    when it next sees the original WAVs.
+    """
+    with open(json_path, "r") as f:
+        database = json.load(f)
+
+    names = sorted(database)
+    vectors = [voice_feature_vector(database[name]) for name in names]
+    features = np.stack([vec for vec, _ in vectors]) if vectors else np.zeros((0, len(FEATURE_KEYS)))
+    embeddings = np.stack([emb for _, emb in vectors]) if vectors else np.zeros((0, 0))
+
+    manifest = {
+        "version": STORE_VERSION,
+        "feature_keys": FEATURE_KEYS,
+        "embedding_dim": int(embeddings.shape[1]),
+        "embedding_model": LEGACY_EMBEDDING_MODEL,
+        "voices": [{"name": name, "size": None, "mtime": None, "sha1": None} for name in names]
+    }
+    save_voice_store(output_dir, manifest, features, embeddings)
+    print(f"Imported {len(names)} voices from {json_path} into {output_dir}")
+    return output_dir
@@ -0,0 +1,20 @@
+from difflib import get_close_matches
+
+# Language name to short code mapping
+LANGUAGE_MAP = {
+    'hindi': 'hi', 'bengali': 'bn', 'telugu': 'te', 'marathi': 'mr', 'tamil': 'ta',
+    'urdu': 'ur', 'gujarati': 'gu', 'kannada': 'kn', 'malayalam': 'ml',
+    'punjabi': 'pa', 'odia': 'or', 'oriya': 'or', 'assamese': 'as',
+}
+
+
+def get_language_code(input_language):
+    input_language = input_language.strip().lower()
+    if input_language in LANGUAGE_MAP:
+        return LANGUAGE_MAP[input_language]
+
+    match = get_close_matches(input_language, LANGUAGE_MAP.keys(), n=1, cutoff=0.6)
+    if match:
+        return LANGUAGE_MAP[match[0]]
+
+    raise ValueError(f"Language '{input_language}' is not supported or misspelled.")
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+from contextlib import closing
+
+# SQLite task queue shared by the shard coordinator and its workers. Workers on
+# other hosts open the same database file on a shared filesystem; every state
+# change is one short IMMEDIATE transaction, so no server process is needed.
+LEASE_SECONDS = float(os.getenv("SUBHASHIT_SHARD_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.getenv("SUBHASHIT_SHARD_MAX_ATTEMPTS", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, kind, shard);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardQueue:
+    """
+    Durable queue of shard tasks.
+
+    A worker claims the oldest queued task and holds it under a lease that it
+    renews with heartbeat(). A task whose lease runs out (worker died, host
+    lost) is handed to the next worker, up to max_attempts claims in total.
+    Payloads and results are small JSON documents; audio and artifacts stay on
+    the shared filesystem and are referenced by path.
+    """
+
+    def __init__(self, db_path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.db_path = os.path.abspath(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _task(row):
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def enqueue(self, job_id, kind, shard, payload):
+        """
+        Adds one task; returns its id.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO tasks (job_id, kind, shard, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, shard, json.dumps(payload), now, now),
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id=None, kinds=None):
+        """
+        Takes the oldest runnable task (queued, or running with an expired lease).
+
+        Args:
+            worker_id (str): Recorded with the task; defaults to host:pid.
+            kinds (Iterable[str]): Only claim tasks of these kinds.
+
+        Returns:
+            dict: The task (payload decoded), or None when nothing is runnable.
+        """
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        kind_filter, params = "", [now]
+        if kinds:
+            kinds = list(kinds)
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params += kinds
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Leases that ran out on the last allowed attempt fail for good
+            conn.execute(
+                "UPDATE tasks SET state = 'failed', error = 'lease expired', updated_at = ? "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE (state = 'queued' OR (state = 'running' AND lease_until < ?))"
+                f"{kind_filter} ORDER BY id LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET state = 'running', worker = ?, attempts = attempts + 1, lease_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        task = self._task(row)
+        task.update(state="running", worker=worker_id, attempts=task["attempts"] + 1)
+        return task
+
+    def heartbeat(self, task_id, worker_id=None):
+        """
+        Renews the lease of a running task. Returns False if the task was lost
+        to another worker after the lease ran out.
+        """
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'running' AND worker = ?",
+                (now + self.lease_seconds, now, task_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, result=None, worker_id=None):
+        worker_id = worker_id or default_worker_id()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ?",
+                (json.dumps(result), time.time(), task_id, worker_id),
+            )
+
+    def fail(self, task_id, error, worker_id=None):
+        """
+        Records a failed attempt; the task is queued again until max_attempts is reached.
+        """
+        worker_id = worker_id or default_worker_id()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, error = ?, "
+                "lease_until = NULL, updated_at = ? WHERE id = ? AND worker = ?",
+                (self.max_attempts, str(error), time.time(), task_id, worker_id),
+            )
+
+    def tasks(self, job_id, kind=None):
+        """
+        Tasks of a job (optionally of one kind), in shard order.
+        """
+        query, params = "SELECT * FROM tasks WHERE job_id = ?", [job_id]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY shard, id", params).fetchall()
+        return [self._task(row) for row in rows]
+
+    def wait(self, job_id, kind, poll_interval=1.0, timeout=None, on_progress=None):
+        """
+        Blocks until every task of the job and kind is done.
+
+        Args:
+            on_progress (callable): Called as on_progress(done, total) when the count changes.
+
+        Returns:
+            List[dict]: The tasks in shard order.
+
+        Raises:
+            RuntimeError: If a task failed for good.
+            TimeoutError: If timeout seconds pass first.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        last_done = None
+        while True:
+            tasks = self.tasks(job_id, kind)
+            failed = [task for task in tasks if task["state"] == "failed"]
+            if failed:
+                raise RuntimeError(f"{kind} shard {failed[0]['shard']} of job {job_id} failed: {failed[0]['error']}")
+
+            done = sum(task["state"] == "done" for task in tasks)
+            if on_progress is not None and done != last_done:
+                on_progress(done, len(tasks))
+                last_done = done
+            if done == len(tasks):
+                return tasks
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f"{len(tasks) - done} {kind} shard(s) of job {job_id} still pending")
+            time.sleep(poll_interval)
@@ -1,20 +1,23 @@
 import os
 import json
+import time
 import numpy as np
 import librosa
 import soundfile as sf
 import parselmouth  # Praat
-from speechbrain import EncoderClassifier
+from modules.audio_analysis import speaker_embedding
 
-# Load pretrained speaker embedding model once
-speaker_model = EncoderClassifier.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb")
+# STFT settings shared by every spectral feature (librosa defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+EMBEDDING_SAMPLING_RATE = speaker_embedding.SAMPLING_RATE
 
 # ---------------------------
 # Feature Extraction Functions
 # ---------------------------
 
-def extract_formants_praat(y, sr):
-    snd = parselmouth.Sound(y, sr)
+def extract_formants_praat(y, sr, snd=None):
+    snd = snd if snd is not None else parselmouth.Sound(y, sr)
     formant = snd.to_formant_burg()
     formants = []
     for i in range(1, 4):  # first 3 formants
@@ -26,54 +29,138 @@ def extract_formants_praat(y, sr):
             formants.append(0)
     return formants
 
-def extract_jitter_shimmer(y, sr):
-    snd = parselmouth.Sound(y, sr)
+def extract_jitter_shimmer(y, sr, snd=None):
+    snd = snd if snd is not None else parselmouth.Sound(y, sr)
     pt = snd.to_point_process_cc()
     jitter = parselmouth.praat.call(pt, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
     shimmer = parselmouth.praat.call([snd, pt], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
     return jitter, shimmer
 
+def extract_embedding_from_signal(y, sr):
+    # Shared embedding service (one configured model, resampled to 16kHz once)
+    return speaker_embedding.embed(y, sr)
+
 def extract_embedding(wav_path):
-    signal, fs = librosa.load(wav_path, sr=16000)  # Speechbrain prefers 16kHz
-    embedding = speaker_model.encode_batch(torch.tensor(signal).unsqueeze(0))
-    return embedding.squeeze().detach().cpu().numpy()
+    return speaker_embedding.embed_file(wav_path)
 
-def extract_voice_features(wav_path):
-    y, sr = librosa.load(wav_path, sr=None)
+def compute_voice_features(y, sr, embedding=None):
+    """
+    Feature engine for an already decoded waveform.
+
+    One magnitude spectrogram feeds every spectral feature (MFCC, piptrack,
+    centroid, bandwidth, contrast, rolloff and the onset envelope for tempo),
+    and the Praat analyses share a single Sound object. Results match the
+    per-feature librosa calls, which each recompute their own STFT.
+
+    A speaker embedding computed earlier in the job (e.g. by diarization) can be
+    passed as `embedding` instead of being recomputed.
+    """
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr))
 
     # MFCC
-    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13).T, axis=0)
+    mfcc = np.mean(librosa.feature.mfcc(S=mel_db, n_mfcc=13).T, axis=0)
 
     # Pitch
-    pitch, mag = librosa.piptrack(y=y, sr=sr)
+    pitch, mag = librosa.piptrack(S=S, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
     pitches = pitch[pitch > 0]
     avg_pitch = np.mean(pitches) if len(pitches) > 0 else 0
 
-    # RMS Energy
-    rms = np.mean(librosa.feature.rms(y=y))
+    # RMS Energy (time domain, no STFT needed)
+    rms = np.mean(librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH))
 
     # Spectral Features
-    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-    spectral_bandwidth = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
-    spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=y, sr=sr))
-    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    spectral_centroid = np.mean(librosa.feature.spectral_centroid(S=S, sr=sr))
+    spectral_bandwidth = np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr))
+    spectral_contrast = np.mean(librosa.feature.spectral_contrast(S=S, sr=sr))
+    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(S=S, sr=sr))
 
     # Zero Crossing Rate
-    zcr = np.mean(librosa.feature.zero_crossing_rate(y))
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH))
 
-    # Tempo
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    # Tempo from the shared log-mel spectrogram
+    onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr, hop_length=HOP_LENGTH)
 
     # Duration
     duration = librosa.get_duration(y=y, sr=sr)
 
-    # Formants
-    formants = extract_formants_praat(y, sr)
+    # Formants and Jitter/Shimmer from one Praat Sound
+    snd = parselmouth.Sound(y, sr)
+    formants = extract_formants_praat(y, sr, snd=snd)
+    jitter, shimmer = extract_jitter_shimmer(y, sr, snd=snd)
 
-    # Jitter/Shimmer
-    jitter, shimmer = extract_jitter_shimmer(y, sr)
+    # Speaker Embedding from the in-memory signal, unless already known
+    if embedding is None:
+        embedding = extract_embedding_from_signal(y, sr)
+    embedding = np.asarray(embedding, dtype=np.float32).tolist()
+
+    return {
+        "mfcc": mfcc.tolist(),
+        "avg_pitch": float(avg_pitch),
+        "rms": float(rms),
+        "spectral_centroid": float(spectral_centroid),
+        "spectral_bandwidth": float(spectral_bandwidth),
+        "spectral_contrast": float(spectral_contrast),
+        "spectral_rolloff": float(spectral_rolloff),
+        "zero_crossing_rate": float(zcr),
+        "tempo": float(np.atleast_1d(tempo)[0]),
+        "duration": float(duration),
+        "formant1": float(formants[0]),
+        "formant2": float(formants[1]),
+        "formant3": float(formants[2]),
+        "jitter": float(jitter),
+        "shimmer": float(shimmer),
+        "embedding": embedding
+    }
 
-    # Speaker Embedding
+def extract_voice_features(wav_path, embedding=None):
+    y, sr = librosa.load(wav_path, sr=None)
+    return compute_voice_features(y, sr, embedding=embedding)
+
+# Scalar features following the 13 MFCCs in a voice feature vector
+SCALAR_FEATURE_KEYS = [
+    "avg_pitch", "rms",
+    "spectral_centroid", "spectral_bandwidth",
+    "spectral_contrast", "spectral_rolloff",
+    "zero_crossing_rate", "tempo",
+    "duration", "formant1",
+    "formant2", "formant3",
+    "jitter", "shimmer"
+]
+
+def voice_feature_vector(feat_dict):
+    """
+    Splits a feature dict into its acoustic vector (MFCCs + scalar features)
+    and its speaker embedding, both as float32 arrays.
+    """
+    non_embed_features = list(feat_dict["mfcc"]) + [feat_dict[key] for key in SCALAR_FEATURE_KEYS]
+    return np.asarray(non_embed_features, dtype=np.float32), np.asarray(feat_dict["embedding"], dtype=np.float32)
+
+# ---------------------------
+# Reference Implementation & Timing
+# ---------------------------
+
+def _extract_voice_features_reference(wav_path):
+    """
+    Previous per-feature implementation, kept to validate compute_voice_features.
+    """
+    y, sr = librosa.load(wav_path, sr=None)
+
+    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13).T, axis=0)
+    pitch, mag = librosa.piptrack(y=y, sr=sr)
+    pitches = pitch[pitch > 0]
+    avg_pitch = np.mean(pitches) if len(pitches) > 0 else 0
+    rms = np.mean(librosa.feature.rms(y=y))
+    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    spectral_bandwidth = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
+    spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=y, sr=sr))
+    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y))
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    duration = librosa.get_duration(y=y, sr=sr)
+    formants = extract_formants_praat(y, sr)
+    jitter, shimmer = extract_jitter_shimmer(y, sr)
     embedding = extract_embedding(wav_path).tolist()
 
     return {
@@ -85,7 +172,7 @@ def extract_voice_features(wav_path):
         "spectral_contrast": float(spectral_contrast),
         "spectral_rolloff": float(spectral_rolloff),
         "zero_crossing_rate": float(zcr),
-        "tempo": float(tempo),
+        "tempo": float(np.atleast_1d(tempo)[0]),
         "duration": float(duration),
         "formant1": float(formants[0]),
         "formant2": float(formants[1]),
@@ -95,5 +182,39 @@ def extract_voice_features(wav_path):
         "embedding": embedding
     }
 
+def compare_feature_engines(wav_path, repeats=3):
+    """
+    Times the shared-STFT engine against the reference implementation and
+    reports the largest relative difference per feature.
+
+    Returns:
+        dict: Timings in seconds, speedup and per-feature max relative difference.
+    """
+    timings = {}
+    outputs = {}
+    for name, fn in (("reference", _extract_voice_features_reference), ("engine", extract_voice_features)):
+        fn(wav_path)  # warm-up (model, caches)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            outputs[name] = fn(wav_path)
+        timings[name] = (time.perf_counter() - start) / repeats
+
+    differences = {}
+    for key, ref_value in outputs["reference"].items():
+        ref = np.atleast_1d(np.asarray(ref_value, dtype=np.float64))
+        new = np.atleast_1d(np.asarray(outputs["engine"][key], dtype=np.float64))
+        differences[key] = float(np.max(np.abs(ref - new) / np.maximum(np.abs(ref), 1e-9)))
+
+    report = {
+        "reference_seconds": round(timings["reference"], 4),
+        "engine_seconds": round(timings["engine"], 4),
+        "speedup": round(timings["reference"] / max(timings["engine"], 1e-9), 2),
+        "max_relative_difference": differences
+    }
+    print(json.dumps(report, indent=2))
+    return report
 
 
+if __name__ == "__main__":
+    import sys
+    compare_feature_engines(sys.argv[1] if len(sys.argv) > 1 else "output.wav")
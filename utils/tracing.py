@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import threading
+import traceback
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+TRACE_DIR = os.getenv("SUBHASHIT_TRACE_DIR", os.path.join("logs", "traces"))
+PROFILE_INTERVAL = 0.01  # seconds between profiler samples
+PROFILE_MAX_DEPTH = 64
+
+_current_tracer = contextvars.ContextVar("subhashit_tracer", default=None)
+_current_span = contextvars.ContextVar("subhashit_span", default=None)
+
+
+def _rss_mb():
+    """
+    Current resident set size in MB (Linux /proc; falls back to the peak on other systems).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _torch_threads():
+    # Only report when torch is already imported; tracing must not pull it in
+    torch = sys.modules.get("torch")
+    return torch.get_num_threads() if torch is not None else None
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a daemon thread snapshots every other thread's
+    stack at a fixed interval and counts collapsed stacks.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = traceback.extract_stack(frame, limit=PROFILE_MAX_DEPTH)
+                frames = ";".join(f"{os.path.basename(f.filename)}:{f.name}" for f in stack)
+                self.stacks[f"{names.get(thread_id, thread_id)};{frames}"] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path):
+        """
+        Writes collapsed stacks (flamegraph.pl / speedscope format).
+        """
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_frames(self, n=20):
+        """
+        Leaf frames ranked by sample count (self time).
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": frame, "samples": count, "share": round(count / max(self.samples, 1), 4)}
+                for frame, count in leaves.most_common(n)]
+
+
+class Tracer:
+    """
+    Collects spans for one job and writes them as a Chrome trace
+    (chrome://tracing, Perfetto) plus an aggregated metrics summary.
+    """
+
+    def __init__(self, job_id, output_dir=TRACE_DIR, profile=False, profile_interval=PROFILE_INTERVAL):
+        self.job_id = job_id
+        self.output_dir = output_dir
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self.profiler = SamplingProfiler(profile_interval) if profile else None
+
+    def _now_us(self):
+        return (time.perf_counter_ns() - self._origin) / 1000.0
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """
+        Per-span-name totals: count, wall time, audio seconds, real-time factor,
+        largest peak-RSS growth and cache hits/misses.
+        """
+        rows = defaultdict(lambda: {
+            "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "audio_seconds": 0.0,
+            "peak_rss_delta_mb": 0.0, "cache_hits": 0, "cache_misses": 0
+        })
+        for event in self.events:
+            row, args = rows[event["name"]], event["args"]
+            seconds = event["dur"] / 1e6
+            row["count"] += 1
+            row["total_seconds"] += seconds
+            row["max_seconds"] = max(row["max_seconds"], seconds)
+            row["audio_seconds"] += args.get("audio_seconds") or 0.0
+            row["peak_rss_delta_mb"] = max(row["peak_rss_delta_mb"], args.get("peak_rss_delta_mb", 0.0))
+            for status in (args.get("cache") or {}).values():
+                row["cache_hits" if status == "hit" else "cache_misses"] += 1
+
+        for row in rows.values():
+            row["mean_seconds"] = row["total_seconds"] / row["count"]
+            row["rtf"] = row["total_seconds"] / row["audio_seconds"] if row["audio_seconds"] else None
+            for key, value in row.items():
+                if isinstance(value, float):
+                    row[key] = round(value, 4)
+
+        summary = {"job_id": self.job_id, "peak_rss_mb": round(_peak_rss_mb(), 1), "spans": dict(rows)}
+        if self.profiler is not None:
+            summary["profile"] = {"samples": self.profiler.samples, "top_frames": self.profiler.top_frames()}
+        return summary
+
+    def write(self):
+        """
+        Returns:
+            dict: Paths of the written trace, metrics and (when profiling) folded-stack files.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, self.job_id)
+        paths = {"trace": f"{base}.trace.json", "metrics": f"{base}.metrics.json"}
+
+        with open(paths["trace"], "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        with open(paths["metrics"], "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        if self.profiler is not None:
+            paths["profile"] = f"{base}.profile.folded"
+            self.profiler.write_folded(paths["profile"])
+        return paths
+
+
+@contextmanager
+def trace_job(job_id=None, output_dir=TRACE_DIR, profile=False, profile_interval=PROFILE_INTERVAL):
+    """
+    Activates a tracer for everything run inside the block and writes its files on exit.
+
+    Args:
+        job_id (str): Name of the output files; defaults to a timestamp.
+        profile (bool): Also run the sampling profiler for this job.
+
+    Yields:
+        Tracer
+    """
+    tracer = Tracer(job_id or time.strftime("job_%Y%m%d_%H%M%S"), output_dir, profile, profile_interval)
+    token = _current_tracer.set(tracer)
+    if tracer.profiler is not None:
+        tracer.profiler.start()
+    try:
+        with span("job", job_id=tracer.job_id):
+            yield tracer
+    finally:
+        if tracer.profiler is not None:
+            tracer.profiler.stop()
+        _current_tracer.reset(token)
+        paths = tracer.write()
+        print(f"[INFO] Trace saved to {paths['trace']}, metrics to {paths['metrics']}")
+
+
+@contextmanager
+def span(name, audio_seconds=None, **attrs):
+    """
+    Times a block as a span of the active job. Without an active job this is a no-op.
+
+    Args:
+        name (str): Span name; spans with the same name are aggregated in the summary.
+        audio_seconds (float): Seconds of input audio the block processes.
+        **attrs: Extra values stored in the span args.
+
+    Yields:
+        dict: The span args; callers may add values (e.g. set_cache) while it runs.
+    """
+    tracer = _current_tracer.get()
+    args = {"audio_seconds": audio_seconds, **attrs}
+    if tracer is None:
+        yield args
+        return
+
+    token = _current_span.set(args)
+    rss_start, peak_start = _rss_mb(), _peak_rss_mb()
+    start = tracer._now_us()
+    try:
+        yield args
+    finally:
+        end = tracer._now_us()
+        _current_span.reset(token)
+        args.update({
+            "rss_delta_mb": round(_rss_mb() - rss_start, 1),
+            "peak_rss_delta_mb": round(_peak_rss_mb() - peak_start, 1),
+            "torch_threads": _torch_threads(),
+        })
+        tracer.record({
+            "name": name, "cat": name.split(".")[0], "ph": "X", "ts": start, "dur": end - start,
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args
+        })
+
+
+def set_cache(cache_name, hit):
+    """
+    Marks a cache lookup as hit or miss on the current span.
+    """
+    args = _current_span.get()
+    if args is not None:
+        args.setdefault("cache", {})[cache_name] = "hit" if hit else "miss"
+
+
+def lru_cache_hit(cached_fn):
+    """
+    Whether an lru_cache'd zero-argument loader already holds its value.
+    """
+    return cached_fn.cache_info().currsize > 0